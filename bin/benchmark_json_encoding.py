@@ -0,0 +1,74 @@
+#!/bin/env python3
+"""
+Measures the throughput of `redash.utils.json_dumps` on a synthetic query result, with
+the fast (orjson) encoder and with simplejson.
+
+Usage: bin/benchmark_json_encoding.py [rows] [repeat]
+"""
+import datetime
+import decimal
+import sys
+import timeit
+
+import pytz
+
+from redash import settings
+from redash.utils import json_dumps, orjson_enabled
+
+
+def query_result(rows):
+    now = datetime.datetime(2020, 1, 2, 3, 4, 5, 678901, tzinfo=pytz.utc)
+    return {
+        "columns": [
+            {"name": name, "friendly_name": name, "type": type}
+            for name, type in [
+                ("id", "integer"),
+                ("name", "string"),
+                ("price", "float"),
+                ("amount", "float"),
+                ("created_at", "datetime"),
+                ("day", "date"),
+                ("active", "boolean"),
+            ]
+        ],
+        "rows": [
+            {
+                "id": i,
+                "name": "row number {}".format(i),
+                "price": i * 1.25,
+                "amount": decimal.Decimal(i) / 100,
+                "created_at": now + datetime.timedelta(seconds=i),
+                "day": (now + datetime.timedelta(days=i % 365)).date(),
+                "active": i % 2 == 0,
+            }
+            for i in range(rows)
+        ],
+    }
+
+
+def benchmark(data, repeat):
+    size = len(json_dumps(data).encode("utf-8"))
+    seconds = min(timeit.repeat(lambda: json_dumps(data), number=1, repeat=repeat))
+    return seconds, size / seconds / 1024 / 1024
+
+
+def main(rows=100000, repeat=5):
+    data = query_result(rows)
+    encoders = [("simplejson", False)]
+    if orjson_enabled:
+        encoders.append(("orjson", True))
+    else:
+        print("orjson isn't installed, only measuring simplejson.")
+
+    for name, fast in encoders:
+        settings.JSON_FAST_ENCODER_ENABLED = fast
+        seconds, throughput = benchmark(data, repeat)
+        print(
+            "{:<12} {:>8.3f}s for {} rows ({:.1f} MB/s)".format(
+                name, seconds, rows, throughput
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -87,6 +87,9 @@ export function Manager({ info }) {
         <List.Item extra={<span className="badge">{info.outdatedQueriesCount}</span>}>
           Outdated Queries Count
         </List.Item>,
+        <List.Item extra={<span className="badge">{info.dueBacklogCount}</span>}>
+          Due Backlog Count
+        </List.Item>,
       ]
     : [];
 
@@ -49,9 +49,10 @@ class SystemStatus extends React.Component {
             startedAt: data.manager.started_at * 1000,
             lastRefreshAt: data.manager.last_refresh_at * 1000,
             outdatedQueriesCount: data.manager.outdated_queries_count,
+            dueBacklogCount: data.manager.due_backlog_count,
           },
           databaseMetrics: data.database_metrics.metrics || [],
-          status: omit(data, ["workers", "manager", "database_metrics"]),
+          status: omit(data, ["workers", "manager", "database_metrics", "collected_at"]),
         });
       })
       .catch(error => this.props.onError(error));
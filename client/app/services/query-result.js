@@ -100,8 +100,44 @@ function sleep(ms) {
   return new Promise(resolve => setTimeout(resolve, ms));
 }
 
+// Jobs watched by the query results being refreshed at the same time (like the widgets of
+// a dashboard) are fetched together, with a single request.
+const MAX_WATCHED_JOBS = 100;
+const JOBS_BATCH_DELAY = 100;
+let watchedJobs = {};
+let jobsBatchTimer = null;
+
+function fetchWatchedJobs() {
+  const batch = watchedJobs;
+  watchedJobs = {};
+  jobsBatchTimer = null;
+
+  const jobIds = Object.keys(batch);
+  for (let i = 0; i < jobIds.length; i += MAX_WATCHED_JOBS) {
+    const ids = jobIds.slice(i, i + MAX_WATCHED_JOBS);
+    axios
+      .get("api/jobs", { params: { ids: ids.join(",") } })
+      .then(({ jobs }) => {
+        each(jobs, job => each(batch[job.job.id], ({ resolve }) => resolve(job)));
+      })
+      .catch(error => {
+        each(ids, id => each(batch[id], ({ reject }) => reject(error)));
+      });
+  }
+}
+
+function fetchJob(jobId) {
+  return new Promise((resolve, reject) => {
+    watchedJobs[jobId] = watchedJobs[jobId] || [];
+    watchedJobs[jobId].push({ resolve, reject });
+    if (jobsBatchTimer === null) {
+      jobsBatchTimer = setTimeout(fetchWatchedJobs, JOBS_BATCH_DELAY);
+    }
+  });
+}
+
 export function fetchDataFromJob(jobId, interval = 1000) {
-  return axios.get(`api/jobs/${jobId}`).then(data => {
+  return fetchJob(jobId).then(data => {
     const status = statuses[data.job.status];
     if (status === ExecutionStatus.WAITING || status === ExecutionStatus.PROCESSING) {
       return sleep(interval).then(() => fetchDataFromJob(data.job.id));
@@ -402,7 +438,7 @@ class QueryResult {
       Auth.isAuthenticated() ? this.loadResult() : this.loadLatestCachedResult(query, parameters);
 
     const request = Auth.isAuthenticated()
-      ? axios.get(`api/jobs/${this.job.id}`)
+      ? fetchJob(this.job.id)
       : axios.get(`api/queries/${query}/jobs/${this.job.id}`);
 
     request
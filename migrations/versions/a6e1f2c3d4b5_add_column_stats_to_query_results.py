@@ -0,0 +1,23 @@
+"""Add column stats to query results.
+
+Revision ID: a6e1f2c3d4b5
+Revises: fd4fc850d7ea
+Create Date: 2026-10-19 10:12:41.231452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "a6e1f2c3d4b5"
+down_revision = "fd4fc850d7ea"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("query_results", sa.Column("column_stats", sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("query_results", "column_stats")
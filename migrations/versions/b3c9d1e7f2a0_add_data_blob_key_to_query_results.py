@@ -0,0 +1,34 @@
+"""Add data blob key and size to query results.
+
+Revision ID: b3c9d1e7f2a0
+Revises: a6e1f2c3d4b5
+Create Date: 2026-10-19 11:02:17.804126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "b3c9d1e7f2a0"
+down_revision = "a6e1f2c3d4b5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "query_results", sa.Column("data_blob_key", sa.String(length=255), nullable=True)
+    )
+    op.add_column("query_results", sa.Column("data_size", sa.BigInteger(), nullable=True))
+    op.create_index(
+        op.f("ix_query_results_data_blob_key"),
+        "query_results",
+        ["data_blob_key"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_query_results_data_blob_key"), table_name="query_results")
+    op.drop_column("query_results", "data_size")
+    op.drop_column("query_results", "data_blob_key")
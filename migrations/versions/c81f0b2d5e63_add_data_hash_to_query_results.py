@@ -0,0 +1,46 @@
+"""Add data hash and data result reference to query results.
+
+Revision ID: c81f0b2d5e63
+Revises: b3c9d1e7f2a0
+Create Date: 2026-10-19 12:20:45.116093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c81f0b2d5e63"
+down_revision = "b3c9d1e7f2a0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "query_results", sa.Column("data_hash", sa.String(length=64), nullable=True)
+    )
+    op.add_column(
+        "query_results", sa.Column("data_result_id", sa.Integer(), nullable=True)
+    )
+    op.create_foreign_key(
+        "query_results_data_result_id_fkey",
+        "query_results",
+        "query_results",
+        ["data_result_id"],
+        ["id"],
+    )
+    op.create_index(
+        op.f("ix_query_results_data_result_id"),
+        "query_results",
+        ["data_result_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_query_results_data_result_id"), table_name="query_results")
+    op.drop_constraint(
+        "query_results_data_result_id_fkey", "query_results", type_="foreignkey"
+    )
+    op.drop_column("query_results", "data_result_id")
+    op.drop_column("query_results", "data_hash")
@@ -0,0 +1,27 @@
+"""Add an index on queries.latest_query_data_id.
+
+Revision ID: d4a7e9b1c350
+Revises: c81f0b2d5e63
+Create Date: 2026-10-19 13:48:09.551870
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d4a7e9b1c350"
+down_revision = "c81f0b2d5e63"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        op.f("ix_queries_latest_query_data_id"),
+        "queries",
+        ["latest_query_data_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_queries_latest_query_data_id"), table_name="queries")
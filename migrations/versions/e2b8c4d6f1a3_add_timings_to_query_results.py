@@ -0,0 +1,23 @@
+"""Add timings to query results.
+
+Revision ID: e2b8c4d6f1a3
+Revises: d4a7e9b1c350
+Create Date: 2026-10-19 16:42:08.517203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e2b8c4d6f1a3"
+down_revision = "d4a7e9b1c350"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("query_results", sa.Column("timings", sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("query_results", "timings")
@@ -0,0 +1,196 @@
+"""
+Object stores for query result payloads.
+
+Payloads are stored content addressed: their key is the SHA-256 of their content, so
+storing the same payload twice writes it once. Storing a payload again updates the
+modification time of its blob, which tells the clean up not to delete blobs about to be
+referenced by new results (see `delete_unreferenced_blobs`).
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from functools import lru_cache
+from urllib.parse import urlparse
+
+from redash import settings
+
+try:
+    import boto3
+
+    s3_enabled = True
+except ImportError:
+    s3_enabled = False
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def content_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore(object):
+    def put(self, key, data):
+        raise NotImplementedError()
+
+    def get(self, key):
+        raise NotImplementedError()
+
+    def get_range(self, key, start, end=None):
+        """Returns the bytes of the blob from `start` up to (but excluding) `end`."""
+        raise NotImplementedError()
+
+    def iter_chunks(self, key, chunk_size=DEFAULT_CHUNK_SIZE):
+        raise NotImplementedError()
+
+    def modified_at(self, key):
+        """Returns when the blob was last stored (as a Unix timestamp), or None when it
+        doesn't exist."""
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+
+class FileSystemBlobStore(BlobStore):
+    """Stores blobs as files under `root` and reads them through memory maps."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def put(self, key, data):
+        path = self.path(key)
+        try:
+            os.utime(path)
+            return
+        except FileNotFoundError:
+            pass
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first, so readers never see partial blobs
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _map(self, key):
+        with open(self.path(key), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files can't be mapped
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, key):
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def get_range(self, key, start, end=None):
+        mapped = self._map(key)
+        try:
+            return mapped[start:end]
+        finally:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def iter_chunks(self, key, chunk_size=DEFAULT_CHUNK_SIZE):
+        mapped = self._map(key)
+        try:
+            for start in range(0, len(mapped), chunk_size):
+                yield mapped[start : start + chunk_size]
+        finally:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def modified_at(self, key):
+        try:
+            return os.path.getmtime(self.path(key))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore(BlobStore):
+    """Stores blobs in an S3 bucket, or any service compatible with its API (like MinIO)
+    when `endpoint_url` is set."""
+
+    def __init__(self, bucket, prefix="", endpoint_url=None):
+        if not s3_enabled:
+            raise Exception("boto3 is required to store query results in S3.")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def object_key(self, key):
+        return self.prefix + key
+
+    def put(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self.object_key(key), Body=data)
+
+    def _get_object(self, key, **kwargs):
+        return self.client.get_object(
+            Bucket=self.bucket, Key=self.object_key(key), **kwargs
+        )["Body"]
+
+    def get(self, key):
+        return self._get_object(key).read()
+
+    def get_range(self, key, start, end=None):
+        if end is not None and end <= start:
+            return b""
+
+        byte_range = "bytes={}-{}".format(start, "" if end is None else end - 1)
+        return self._get_object(key, Range=byte_range).read()
+
+    def iter_chunks(self, key, chunk_size=DEFAULT_CHUNK_SIZE):
+        return self._get_object(key).iter_chunks(chunk_size)
+
+    def modified_at(self, key):
+        try:
+            response = self.client.head_object(
+                Bucket=self.bucket, Key=self.object_key(key)
+            )
+        except self.client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return response["LastModified"].timestamp()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+
+@lru_cache(maxsize=None)
+def get_blob_store(url=None):
+    """Returns the blob store configured by `url` (settings.QUERY_RESULTS_BLOB_STORE by
+    default): a `file://` URL or path for FileSystemBlobStore, or `s3://bucket/prefix`
+    for S3BlobStore. Returns None when it's empty."""
+    url = settings.QUERY_RESULTS_BLOB_STORE if url is None else url
+    if not url:
+        return None
+
+    parsed = urlparse(url)
+    if parsed.scheme in ("", "file"):
+        return FileSystemBlobStore(parsed.path)
+    if parsed.scheme == "s3":
+        prefix = parsed.path.strip("/")
+        return S3BlobStore(
+            parsed.netloc,
+            prefix + "/" if prefix else "",
+            endpoint_url=settings.QUERY_RESULTS_BLOB_STORE_S3_ENDPOINT_URL,
+        )
+
+    raise ValueError("Unsupported query results blob store: {}".format(url))
@@ -5,7 +5,16 @@ from flask.cli import FlaskGroup, run_command, with_appcontext
 from rq import Connection
 
 from redash import __version__, create_app, settings, rq_redis_connection
-from redash.cli import data_sources, database, groups, organization, queries, users, rq
+from redash.cli import (
+    data_sources,
+    database,
+    groups,
+    organization,
+    partitions,
+    queries,
+    users,
+    rq,
+)
 from redash.monitor import get_status
 
 
@@ -34,6 +43,7 @@ manager.add_command(data_sources.manager, "ds")
 manager.add_command(organization.manager, "org")
 manager.add_command(queries.manager, "queries")
 manager.add_command(rq.manager, "rq")
+manager.add_command(partitions.manager, "partitions")
 manager.add_command(run_command, "runserver")
 
 
@@ -0,0 +1,42 @@
+from click import argument, option
+from flask.cli import AppGroup
+
+manager = AppGroup(help="Manage partitioned tables.")
+
+
+@manager.command(name="list")
+def list_partitions():
+    """List the partitions of the tables that can be partitioned."""
+    from redash.models import partitioning
+
+    for table in partitioning.PARTITIONED_TABLES:
+        if not partitioning.is_partitioned(table):
+            print("{}: not partitioned".format(table.name))
+            continue
+
+        print("{} (by {}):".format(table.name, table.column))
+        for name, start, end in partitioning.partitions(table):
+            print("  {}: {} to {}".format(name, start, end))
+        print("  {}: rows outside of the partitions".format(table.default_partition))
+
+
+@manager.command()
+@argument("table")
+@option(
+    "--batch-size",
+    "batch_size",
+    default=10000,
+    help="Number of rows (by id) copied at a time (default: 10000).",
+)
+def convert(table, batch_size):
+    """Convert TABLE (query_results or events) to a table partitioned by time, while
+    Redash keeps running. The original table is kept as TABLE_unpartitioned."""
+    from redash.models import partitioning
+
+    try:
+        table = partitioning.get_partitioned_table(table)
+    except ValueError as e:
+        print(e)
+        exit(1)
+
+    partitioning.convert_table(table, batch_size=batch_size, log=print)
@@ -4,7 +4,7 @@ import sys
 import datetime
 from itertools import chain
 
-from click import argument
+from click import argument, option
 from flask.cli import AppGroup
 from rq import Connection
 from rq.worker import WorkerStatus
@@ -12,13 +12,14 @@ from sqlalchemy.orm import configure_mappers
 from supervisor_checks import check_runner
 from supervisor_checks.check_modules import base
 
-from redash import rq_redis_connection
+from redash import rq_redis_connection, settings
 from redash.tasks import (
     Worker,
     rq_scheduler,
     schedule_periodic_jobs,
     periodic_job_definitions,
 )
+from redash.tasks.worker import PreforkingWorker
 from redash.worker import default_queues
 
 manager = AppGroup(help="RQ management commands.")
@@ -33,7 +34,13 @@ def scheduler():
 
 @manager.command()
 @argument("queues", nargs=-1)
-def worker(queues):
+@option(
+    "--pooled",
+    is_flag=True,
+    help="Execute jobs in a pool of long-lived work horses instead of forking a "
+    "work horse per job. Pool sizes are set with REDASH_RQ_WORKER_POOL_SIZE(S).",
+)
+def worker(queues, pooled):
     # Configure any SQLAlchemy mappers loaded until now so that the mapping configuration
     # will already be available to the forked work horses and they won't need
     # to spend valuable time re-doing that on every fork.
@@ -42,10 +49,19 @@ def worker(queues):
     if not queues:
         queues = default_queues
     else:
-        queues = chain(*[queue.split(",") for queue in queues])
+        queues = list(chain(*[queue.split(",") for queue in queues]))
 
     with Connection(rq_redis_connection):
-        w = Worker(queues, log_job_description=False, job_monitoring_interval=5)
+        if pooled:
+            w = PreforkingWorker(
+                queues,
+                pool_sizes=settings.RQ_WORKER_POOL_SIZES,
+                default_pool_size=settings.RQ_WORKER_POOL_SIZE,
+                log_job_description=False,
+                job_monitoring_interval=5,
+            )
+        else:
+            w = Worker(queues, log_job_description=False, job_monitoring_interval=5)
         w.work()
 
 
@@ -65,11 +65,14 @@ from redash.handlers.queries import (
     QueryRegenerateApiKeyResource,
 )
 from redash.handlers.query_results import (
+    JobListResource,
     JobResource,
     QueryResultDropdownResource,
     QueryDropdownsResource,
     QueryResultListResource,
     QueryResultResource,
+    QueryResultRowsResource,
+    QueryResultStatsResource,
 )
 from redash.handlers.query_snippets import (
     QuerySnippetListResource,
@@ -274,6 +277,17 @@ api.add_org_resource(
     "/api/queries/<query_id>/results/<query_result_id>.<filetype>",
     endpoint="query_result",
 )
+api.add_org_resource(
+    QueryResultRowsResource,
+    "/api/query_results/<query_result_id>/rows",
+    endpoint="query_result_rows",
+)
+api.add_org_resource(
+    QueryResultStatsResource,
+    "/api/query_results/<query_result_id>/stats",
+    endpoint="query_result_stats",
+)
+api.add_org_resource(JobListResource, "/api/jobs", endpoint="jobs")
 api.add_org_resource(
     JobResource,
     "/api/jobs/<job_id>",
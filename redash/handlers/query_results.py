@@ -1,12 +1,14 @@
+import hashlib
 import logging
 import time
+import zlib
 
 import unicodedata
-from flask import make_response, request
+from flask import Response, make_response, request, stream_with_context
 from flask_login import current_user
 from flask_restful import abort
 from werkzeug.urls import url_quote
-from redash import models, settings
+from redash import models, redis_connection, rq_redis_connection, settings
 from redash.handlers.base import BaseResource, get_object_or_404, record_event
 from redash.permissions import (
     has_access,
@@ -16,14 +18,17 @@ from redash.permissions import (
     require_any_of_permission,
     view_only,
 )
-from redash.tasks import Job
+from redash.tasks import Job, job_status, store_column_stats
 from redash.tasks.queries import enqueue_query
 from redash.utils import (
     collect_parameters_from_request,
     json_dumps,
+    json_loads,
     utcnow,
     to_filename,
 )
+from redash.utils.columnar import get_columnar_result
+from redash.utils.downsampling import downsample
 from redash.models.parameterized_query import (
     ParameterizedQuery,
     InvalidParameterError,
@@ -33,10 +38,18 @@ from redash.models.parameterized_query import (
 from redash.serializers import (
     serialize_query_result,
     serialize_query_result_to_dsv,
+    serialize_query_result_to_json,
     serialize_query_result_to_xlsx,
     serialize_job,
+    serialize_job_status,
 )
 
+# Maximum number of jobs a client can watch with a single request
+MAX_WATCHED_JOBS = 100
+# Requests for stats that aren't computed yet enqueue a single job in this many seconds
+COLUMN_STATS_JOB_KEY = "query_result:{}:column_stats_job"
+COLUMN_STATS_JOB_TTL = 600
+
 
 def error_response(message, http_status=400):
     return {"job": {"status": 4, "error": message}}, http_status
@@ -209,6 +222,7 @@ class QueryResultListResource(BaseResource):
 
 
 ONE_YEAR = 60 * 60 * 24 * 365.25
+MAX_DOWNSAMPLING_WIDTH = 10000
 
 
 class QueryResultDropdownResource(BaseResource):
@@ -242,6 +256,78 @@ class QueryDropdownsResource(BaseResource):
         return dropdown_values(dropdown_query_id, self.current_org)
 
 
+def gzipped_query_result(query_result):
+    """Returns the gzipped JSON response body of `query_result`. Query results never
+    change, so bodies are kept in Redis for `settings.QUERY_RESULTS_GZIP_CACHE_TTL`
+    seconds rather than compressed on every request."""
+    # The RQ connection doesn't decode responses, so it can store binary values
+    key = "query_result:{}:json.gz".format(query_result.id)
+    body = rq_redis_connection.get(key)
+
+    if body is None:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        body = b"".join(
+            compressor.compress(chunk)
+            for chunk in serialize_query_result_to_json(query_result)
+        )
+        body += compressor.flush()
+
+        if len(body) <= settings.QUERY_RESULTS_GZIP_CACHE_MAX_SIZE:
+            rq_redis_connection.set(
+                key, body, ex=settings.QUERY_RESULTS_GZIP_CACHE_TTL
+            )
+
+    return body
+
+
+def streamed_json_response(query_result, headers):
+    """Returns a response streaming the JSON of `query_result`. The body is sent after
+    the view returns, so the request context (and with it the database session the
+    result is loaded with) is kept until it's sent."""
+    return Response(
+        stream_with_context(serialize_query_result_to_json(query_result)), 200, headers
+    )
+
+
+def downsampled_query_result(query_result, visualization, width):
+    """Returns the JSON response body of `query_result` with only the rows needed to draw
+    `visualization` in `width` pixels, or None when it can't be downsampled. Bodies are
+    cached for every result, visualization (options) and width."""
+    key = "query_result:{}:downsampled:{}:{}:{}".format(
+        query_result.id,
+        visualization.id,
+        width,
+        hashlib.sha1(visualization.options.encode("utf-8")).hexdigest(),
+    )
+    body = redis_connection.get(key)
+
+    if body is None:
+        result = get_columnar_result(query_result)
+        indices = downsample(result, json_loads(visualization.options), width)
+        if indices is None:
+            return None
+
+        response = query_result.to_dict(include_data=False)
+        response["data"] = {
+            "columns": result.columns,
+            "rows": [
+                {name: result.values[name][i] for name in result.column_names}
+                for i in indices
+            ],
+        }
+        response["downsampling"] = {
+            "visualization_id": visualization.id,
+            "width": width,
+            "row_count": result.row_count,
+        }
+        body = json_dumps({"query_result": response})
+        redis_connection.set(
+            key, body, ex=settings.QUERY_RESULTS_DOWNSAMPLING_CACHE_TTL
+        )
+
+    return body
+
+
 class QueryResultResource(BaseResource):
     @staticmethod
     def add_cors_headers(headers):
@@ -345,9 +431,12 @@ class QueryResultResource(BaseResource):
         query_result = None
         query = None
 
+        # The data of the result is only loaded once it's certain it needs to be sent
+        get_query_result = models.QueryResult.get_by_id_and_org_without_data
+
         if query_result_id:
             query_result = get_object_or_404(
-                models.QueryResult.get_by_id_and_org, query_result_id, self.current_org
+                get_query_result, query_result_id, self.current_org
             )
 
         if query_id is not None:
@@ -361,9 +450,7 @@ class QueryResultResource(BaseResource):
                 and query.latest_query_data_id is not None
             ):
                 query_result = get_object_or_404(
-                    models.QueryResult.get_by_id_and_org,
-                    query.latest_query_data_id,
-                    self.current_org,
+                    get_query_result, query.latest_query_data_id, self.current_org
                 )
 
             if (
@@ -397,13 +484,25 @@ class QueryResultResource(BaseResource):
 
                 self.record_event(event)
 
-            response_builders = {
-                "json": self.make_json_response,
-                "xlsx": self.make_excel_response,
-                "csv": self.make_csv_response,
-                "tsv": self.make_tsv_response,
-            }
-            response = response_builders[filetype](query_result)
+            visualization, width = self.get_downsampling_target(filetype)
+
+            etag = self.make_etag(query_result, filetype, visualization, width)
+            if request.if_none_match.contains(etag):
+                response = make_response("", 304)
+            elif visualization is not None:
+                response = self.make_downsampled_json_response(
+                    query_result, visualization, width
+                )
+            else:
+                response_builders = {
+                    "json": self.make_json_response,
+                    "xlsx": self.make_excel_response,
+                    "csv": self.make_csv_response,
+                    "tsv": self.make_tsv_response,
+                }
+                response = response_builders[filetype](query_result)
+
+            response.set_etag(etag)
 
             if len(settings.ACCESS_CONTROL_ALLOW_ORIGIN) > 0:
                 self.add_cors_headers(response.headers)
@@ -424,10 +523,66 @@ class QueryResultResource(BaseResource):
             abort(404, message="No cached result found for this query.")
 
     @staticmethod
-    def make_json_response(query_result):
-        data = json_dumps({"query_result": query_result.to_dict()})
+    def serves_gzip():
+        return bool(settings.QUERY_RESULTS_GZIP_CACHE_TTL) and (
+            "gzip" in request.accept_encodings
+        )
+
+    def get_downsampling_target(self, filetype):
+        """Returns the visualization and width (in pixels) JSON results were requested to
+        be downsampled for, if any."""
+        visualization_id = request.args.get("visualization_id")
+        if filetype != "json" or visualization_id is None:
+            return None, None
+
+        width = request.args.get("width", type=int)
+        if width is None or not 0 < width <= MAX_DOWNSAMPLING_WIDTH:
+            abort(
+                400,
+                message="width must be between 1 and {}.".format(MAX_DOWNSAMPLING_WIDTH),
+            )
+
+        visualization = get_object_or_404(
+            models.Visualization.get_by_id_and_org, visualization_id, self.current_org
+        )
+        return visualization, width
+
+    def make_etag(self, query_result, filetype, visualization=None, width=None):
+        """Query results never change, so a response is identified by the result it
+        represents, its format (and the organization's date/time formats it's rendered
+        with), its content encoding and the chart it was downsampled for."""
+        representation = [
+            query_result.id,
+            filetype,
+            self.current_org.get_setting("date_format"),
+            self.current_org.get_setting("time_format"),
+            filetype == "json" and visualization is None and self.serves_gzip(),
+        ]
+        if visualization is not None:
+            representation.extend([visualization.id, visualization.options, width])
+        return hashlib.sha1(json_dumps(representation).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def make_json_response(cls, query_result):
         headers = {"Content-Type": "application/json"}
-        return make_response(data, 200, headers)
+
+        if settings.QUERY_RESULTS_GZIP_CACHE_TTL:
+            headers["Vary"] = "Accept-Encoding"
+
+            if cls.serves_gzip():
+                headers["Content-Encoding"] = "gzip"
+                return make_response(gzipped_query_result(query_result), 200, headers)
+
+        return streamed_json_response(query_result, headers)
+
+    @staticmethod
+    def make_downsampled_json_response(query_result, visualization, width):
+        headers = {"Content-Type": "application/json"}
+        body = downsampled_query_result(query_result, visualization, width)
+        if body is None:
+            return streamed_json_response(query_result, headers)
+
+        return make_response(body, 200, headers)
 
     @staticmethod
     def make_csv_response(query_result):
@@ -451,6 +606,174 @@ class QueryResultResource(BaseResource):
         return make_response(serialize_query_result_to_xlsx(query_result), 200, headers)
 
 
+class QueryResultRowsResource(BaseResource):
+    DEFAULT_LIMIT = 25
+    MAX_LIMIT = 10000
+
+    @staticmethod
+    def parse_sort(sort, columns):
+        result = []
+        for name in filter(None, sort.split(",")):
+            descending = name.startswith("-")
+            name = name.lstrip("-")
+            if name not in columns:
+                abort(400, message="Can't sort by unknown column {}.".format(name))
+            result.append((name, descending))
+
+        return result
+
+    @staticmethod
+    def parse_filters(filters, columns):
+        result = []
+        for f in filters:
+            name, _, text = f.partition(":")
+            if name not in columns:
+                abort(400, message="Can't filter by unknown column {}.".format(name))
+            result.append((name, text))
+
+        return result
+
+    @require_any_of_permission(("view_query", "execute_query"))
+    def get(self, query_result_id):
+        """
+        Retrieve a page of the rows of a query result.
+
+        :param number query_result_id: The ID of the query result
+        :qparam number offset: Number of (sorted and filtered) rows to skip
+        :qparam number limit: Maximum number of rows to return
+        :qparam string sort: Comma separated column names to sort by, prefixed with `-`
+                             for descending order
+        :qparam string filter: `<column>:<text>` to only return rows whose value in the
+                               column contains the text (case insensitive). Can be repeated.
+
+        :>json number total: Number of rows matching the filters
+        :>json array rows: The requested rows
+        """
+        query_result = get_object_or_404(
+            models.QueryResult.get_by_id_and_org_without_data,
+            query_result_id,
+            self.current_org,
+        )
+        require_access(query_result.data_source, self.current_user, view_only)
+
+        offset = request.args.get("offset", 0, type=int)
+        limit = request.args.get("limit", self.DEFAULT_LIMIT, type=int)
+        if offset < 0 or not 0 < limit <= self.MAX_LIMIT:
+            abort(
+                400,
+                message="offset must be positive and limit between 1 and {}.".format(
+                    self.MAX_LIMIT
+                ),
+            )
+
+        result = get_columnar_result(query_result)
+        sort = self.parse_sort(request.args.get("sort", ""), result.values)
+        filters = self.parse_filters(request.args.getlist("filter"), result.values)
+
+        total, rows = result.rows(offset, limit, sort, filters)
+
+        return {
+            "query_result_id": query_result.id,
+            "columns": result.columns,
+            "rows": rows,
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "total_rows": result.row_count,
+        }
+
+
+class QueryResultStatsResource(BaseResource):
+    @require_any_of_permission(("view_query", "execute_query"))
+    def get(self, query_result_id):
+        """
+        Retrieve the per column stats of a query result.
+
+        :param number query_result_id: The ID of the query result
+
+        Results whose stats weren't computed yet get them computed by a job, and respond
+        with a 202 status until they're available.
+
+        :>json number row_count: Number of rows of the result
+        :>json object columns: Stats of each column, by name: `null_count`, `min`, `max`,
+                               `distinct_count` and `top_values` (pairs of value and
+                               count)
+        """
+        query_result = get_object_or_404(
+            models.QueryResult.get_by_id_and_org_without_data,
+            query_result_id,
+            self.current_org,
+        )
+        require_access(query_result.data_source, self.current_user, view_only)
+
+        # Results referencing the data of another one share its stats
+        payload = query_result.payload
+        if payload.column_stats is None:
+            # Results stored before stats were computed, or whose job didn't run yet
+            key = COLUMN_STATS_JOB_KEY.format(payload.id)
+            if redis_connection.set(key, 1, nx=True, ex=COLUMN_STATS_JOB_TTL):
+                store_column_stats.delay(payload.id)
+            return {"query_result_id": query_result.id, "column_stats": None}, 202
+
+        return dict(payload.column_stats, query_result_id=query_result.id)
+
+
+def parse_job_ids():
+    job_ids = [job_id for job_id in request.args.get("ids", "").split(",") if job_id]
+    if not job_ids or len(job_ids) > MAX_WATCHED_JOBS:
+        abort(
+            400,
+            message="ids must list between 1 and {} job ids.".format(MAX_WATCHED_JOBS),
+        )
+    return job_ids
+
+
+def serialize_jobs(job_ids):
+    jobs = Job.fetch_many(job_ids, connection=rq_redis_connection)
+    return [
+        serialize_job(job)
+        if job is not None
+        else serialize_job_status(job_id, job_status.FAILED, error="Job not found.")
+        for job_id, job in zip(job_ids, jobs)
+    ]
+
+
+class JobListResource(BaseResource):
+    def get(self):
+        """
+        Retrieve info about several query jobs.
+
+        :qparam string ids: Comma separated IDs of the jobs
+        :qparam number wait: When none of the jobs is done, wait up to this many seconds
+                             for one of them to change before responding (long polling)
+
+        :>json array jobs: The jobs, like `/api/jobs/<job_id>` responses
+        """
+        job_ids = parse_job_ids()
+        wait = min(
+            request.args.get("wait", 0, type=float), settings.JOB_STATUS_MAX_WAIT
+        )
+        if wait <= 0:
+            return {"jobs": serialize_jobs(job_ids)}
+
+        # Subscribing first, so changes made after fetching the jobs aren't missed
+        with job_status.subscribe(job_ids) as pubsub:
+            jobs = serialize_jobs(job_ids)
+            if any(job_status.is_done(job) for job in jobs):
+                return {"jobs": jobs}
+
+            change = job_status.wait_for_status(pubsub, wait)
+
+        jobs = serialize_jobs(job_ids)
+        if change is not None:
+            # Jobs' results are saved after they publish their last change
+            jobs = [
+                change if job["job"]["id"] == change["job"]["id"] else job
+                for job in jobs
+            ]
+        return {"jobs": jobs}
+
+
 class JobResource(BaseResource):
     def get(self, job_id, query_id=None):
         """
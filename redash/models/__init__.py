@@ -3,13 +3,14 @@ import calendar
 import logging
 import time
 import numbers
+import zlib
 import pytz
 
 from sqlalchemy import distinct, or_, and_, UniqueConstraint, cast
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import backref, contains_eager, joinedload, subqueryload, load_only
+from sqlalchemy.orm import aliased, backref, contains_eager, defer, joinedload, subqueryload, load_only
 from sqlalchemy.orm.exc import NoResultFound  # noqa: F401
 from sqlalchemy import func
 from sqlalchemy_utils import generic_relationship
@@ -18,6 +19,7 @@ from sqlalchemy_utils.models import generic_repr
 from sqlalchemy_utils.types.encrypted.encrypted_type import FernetEngine
 
 from redash import redis_connection, utils, settings
+from redash.blob_store import content_key, get_blob_store
 from redash.destinations import (
     get_configuration_schema_for_destination_type,
     get_destination,
@@ -227,6 +229,17 @@ class DataSource(BelongsToOrgMixin, db.Model):
     def paused(self):
         return redis_connection.exists(self._pause_key)
 
+    @classmethod
+    def pause_reasons(cls, data_sources):
+        """Returns the pause reasons of `data_sources` by id (None for those which aren't
+        paused), fetched with a single Redis call."""
+        data_sources = list(data_sources)
+        if not data_sources:
+            return {}
+
+        reasons = redis_connection.mget([ds._pause_key for ds in data_sources])
+        return {ds.id: reason for ds, reason in zip(data_sources, reasons)}
+
     @property
     def pause_reason(self):
         return redis_connection.get(self._pause_key)
@@ -297,8 +310,17 @@ DESERIALIZED_DATA_ATTR = "_deserialized_data"
 
 
 class DBPersistence(object):
+    @property
+    def payload(self):
+        """The result the data is stored with: this one, or the earlier result with the
+        same data it references (see `QueryResult.store_result`)."""
+        return getattr(self, "data_result", None) or self
+
     @property
     def data(self):
+        if self.payload is not self:
+            return self.payload.data
+
         if self._data is None:
             return None
 
@@ -311,11 +333,97 @@ class DBPersistence(object):
     def data(self, data):
         if hasattr(self, DESERIALIZED_DATA_ATTR):
             delattr(self, DESERIALIZED_DATA_ATTR)
+        self.data_result = None
         self._data = data
 
+    @property
+    def raw_data(self):
+        """The stored JSON text of `data`, without decoding it."""
+        if self.payload is not self:
+            return self.payload.raw_data
+
+        return self._data
+
+    def iter_raw_data(self, chunk_size):
+        """Returns an iterator of the stored JSON of `data` (`null` when there's none) in
+        UTF-8 encoded chunks. The data is read before returning, so the iterator can be
+        consumed once the result is detached from its session (like in a streamed
+        response)."""
+        if self.payload is not self:
+            return self.payload.iter_raw_data(chunk_size)
+
+        return _iter_text_chunks(self._data, chunk_size)
+
+
+def _iter_text_chunks(text, chunk_size):
+    if text is None:
+        yield b"null"
+        return
+
+    for start in range(0, len(text), chunk_size):
+        yield text[start : start + chunk_size].encode("utf-8")
+
+
+class BlobStorePersistence(DBPersistence):
+    """Stores the JSON of `data` in the blob store configured by
+    settings.QUERY_RESULTS_BLOB_STORE, keeping only its key and size in the database.
+    Results stored before it was enabled are still read from the database."""
+
+    @property
+    def data(self):
+        if self.payload is not self:
+            return self.payload.data
+
+        if self.data_blob_key is None:
+            return super().data
 
-QueryResultPersistence = (
-    settings.dynamic_settings.QueryResultPersistence or DBPersistence
+        if not hasattr(self, DESERIALIZED_DATA_ATTR):
+            setattr(self, DESERIALIZED_DATA_ATTR, json_loads(self.raw_data))
+
+        return self._deserialized_data
+
+    @data.setter
+    def data(self, data):
+        if hasattr(self, DESERIALIZED_DATA_ATTR):
+            delattr(self, DESERIALIZED_DATA_ATTR)
+        self.data_result = None
+
+        if data is None:
+            self._data = None
+            self.data_blob_key = None
+            self.data_size = None
+            return
+
+        encoded = data.encode("utf-8")
+        key = content_key(encoded)
+        get_blob_store().put(key, encoded)
+        # The data column isn't nullable in databases created by old versions
+        self._data = ""
+        self.data_blob_key = key
+        self.data_size = len(encoded)
+
+    @property
+    def raw_data(self):
+        if self.payload is not self:
+            return self.payload.raw_data
+
+        if self.data_blob_key is None:
+            return self._data
+
+        return get_blob_store().get(self.data_blob_key).decode("utf-8")
+
+    def iter_raw_data(self, chunk_size):
+        if self.payload is not self:
+            return self.payload.iter_raw_data(chunk_size)
+
+        if self.data_blob_key is None:
+            return super().iter_raw_data(chunk_size)
+
+        return get_blob_store().iter_chunks(self.data_blob_key, chunk_size)
+
+
+QueryResultPersistence = settings.dynamic_settings.QueryResultPersistence or (
+    BlobStorePersistence if settings.QUERY_RESULTS_BLOB_STORE else DBPersistence
 )
 
 
@@ -331,30 +439,74 @@ class QueryResult(db.Model, QueryResultPersistence, BelongsToOrgMixin):
     _data = Column("data", db.Text)
     runtime = Column(postgresql.DOUBLE_PRECISION)
     retrieved_at = Column(db.DateTime(True))
+    column_stats = Column(MutableDict.as_mutable(PseudoJSON), nullable=True)
+    # Time spent (in seconds) in each stage of the execution that produced the result
+    timings = Column(PseudoJSON, nullable=True)
+    # Where the data is kept when it's stored in a blob store, and its size in bytes
+    data_blob_key = Column(db.String(255), nullable=True, index=True)
+    data_size = Column(db.BigInteger, nullable=True)
+    # SHA-256 of the data, and the earlier result holding it when it's the same
+    data_hash = Column(db.String(64), nullable=True)
+    data_result_id = Column(
+        key_type("QueryResult"),
+        db.ForeignKey("query_results.id"),
+        nullable=True,
+        index=True,
+    )
+    data_result = db.relationship("QueryResult", remote_side=[id])
 
     __tablename__ = "query_results"
 
     def __str__(self):
         return "%d | %s | %s" % (self.id, self.query_hash, self.retrieved_at)
 
-    def to_dict(self):
-        return {
+    def to_dict(self, include_data=True):
+        result = {
             "id": self.id,
             "query_hash": self.query_hash,
             "query": self.query_text,
-            "data": self.data,
             "data_source_id": self.data_source_id,
             "runtime": self.runtime,
             "retrieved_at": self.retrieved_at,
+            # Results referencing the data of another one share its stats
+            "column_stats": self.payload.column_stats,
+            "timings": self.timings,
         }
 
+        if include_data:
+            result["data"] = self.data
+
+        return result
+
+    @classmethod
+    def get_by_id_and_org_without_data(cls, object_id, org):
+        """Like `get_by_id_and_org`, but the (potentially big) data column is only loaded
+        when it's accessed. The result holding its data, if it's another one, is loaded
+        along (without its data)."""
+        return (
+            cls.query.options(
+                defer(cls._data), joinedload(cls.data_result).defer(cls._data)
+            )
+            .filter(cls.id == object_id, cls.org == org)
+            .one()
+        )
+
     @classmethod
     def unused(cls, days=7):
         age_threshold = datetime.datetime.now() - datetime.timedelta(days=days)
-        return (
-            cls.query.filter(
-                Query.id.is_(None), cls.retrieved_at < age_threshold
-            ).outerjoin(Query)
+        # Anti-joins, supported by the indexes of the referencing columns
+        is_latest = (
+            db.session.query(Query.id).filter(Query.latest_query_data_id == cls.id).exists()
+        )
+        # Results holding the data of other results are kept as long as they are
+        referencing = aliased(cls)
+        is_referenced = (
+            db.session.query(referencing.id)
+            .filter(referencing.data_result_id == cls.id)
+            .exists()
+        )
+        return cls.query.filter(
+            cls.retrieved_at < age_threshold, ~is_latest, ~is_referenced
         ).options(load_only("id"))
 
     @classmethod
@@ -389,22 +541,90 @@ class QueryResult(db.Model, QueryResultPersistence, BelongsToOrgMixin):
             runtime=run_time,
             data_source=data_source,
             retrieved_at=retrieved_at,
-            data=data,
         )
 
+        data_hash = data and content_key(data.encode("utf-8"))
+        data_result = cls.get_data_result(data_source, query_hash, data_hash)
+        if data_result is None:
+            query_result.data = data
+        else:
+            # Same data as the previous execution: reference it instead of storing it
+            # again. The data column isn't nullable in databases created by old versions.
+            query_result._data = ""
+            query_result.data_result = data_result
+        query_result.data_hash = data_hash
+
         db.session.add(query_result)
         logging.info("Inserted query (%s) data; id=%s", query_hash, query_result.id)
 
         return query_result
 
+    @classmethod
+    def get_data_result(cls, data_source, query_hash, data_hash):
+        """Returns the result holding the data of the latest result of `query_hash`, if
+        it's the same as `data_hash`.
+
+        The clean up of unused results (and the drop of old partitions) can't see the
+        reference to it until the new result is committed, so results that could be
+        deleted meanwhile (older than the clean up's max age, less a day) aren't reused.
+        """
+        if (
+            data_hash is None
+            or not settings.QUERY_RESULTS_DEDUPLICATION_ENABLED
+            or not issubclass(cls, DBPersistence)
+        ):
+            return None
+
+        latest = (
+            cls.query.filter(cls.query_hash == query_hash, cls.data_source == data_source)
+            .options(load_only("id", "data_hash", "data_result_id"))
+            .order_by(cls.retrieved_at.desc())
+            .first()
+        )
+        if latest is None or latest.data_hash != data_hash:
+            return None
+
+        payload = latest.payload
+        reusable_since = utils.utcnow() - datetime.timedelta(
+            days=settings.QUERY_RESULTS_CLEANUP_MAX_AGE - 1
+        )
+        if payload.retrieved_at < reusable_since:
+            return None
+
+        return payload
+
     @property
     def groups(self):
         return self.data_source.groups
 
 
-def should_schedule_next(
-    previous_iteration, now, interval, time=None, day_of_week=None, failures=0
+def schedule_jitter(query_id, interval, time=None):
+    """
+    Returns the deterministic offset (in seconds) of the scheduled executions of a query,
+    so the queries with the same schedule don't all run in the same tick.
+
+    Queries scheduled at a time of the day run up to the jitter window after it. Queries
+    scheduled at an interval are aligned to their previous execution, so their offset is
+    up to the window before it: their period gets slightly shorter (spreading queries
+    that were executed together), but never longer than their interval, so their results
+    are never older than it.
+    """
+    window = min(
+        float(interval) * settings.SCHEDULE_JITTER_FRACTION, settings.SCHEDULE_JITTER_MAX
+    )
+    if window <= 0:
+        return 0
+
+    position = zlib.crc32(str(query_id).encode()) / 2 ** 32
+    if time is None:
+        return -position * window
+    return position * window
+
+
+def next_iteration_at(
+    previous_iteration, interval, time=None, day_of_week=None, failures=0, jitter=0
 ):
+    """Returns when the next scheduled execution is due, or None if it never is."""
     # if time exists then interval > 23 hours (82800s)
     # if day_of_week exists then interval > 6 days (518400s)
     if time is None:
@@ -445,8 +665,17 @@ def should_schedule_next(
         try:
             next_iteration += datetime.timedelta(minutes=2 ** failures)
         except OverflowError:
-            return False
-    return now > next_iteration
+            return None
+    return next_iteration + datetime.timedelta(seconds=jitter)
+
+
+def should_schedule_next(
+    previous_iteration, now, interval, time=None, day_of_week=None, failures=0, jitter=0
+):
+    next_iteration = next_iteration_at(
+        previous_iteration, interval, time, day_of_week, failures, jitter
+    )
+    return next_iteration is not None and now > next_iteration
 
 
 @gfk_type
@@ -473,7 +702,10 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
     data_source_id = Column(key_type("DataSource"), db.ForeignKey("data_sources.id"), nullable=True)
     data_source = db.relationship(DataSource, backref="queries")
     latest_query_data_id = Column(
-        key_type("QueryResult"), db.ForeignKey("query_results.id"), nullable=True
+        key_type("QueryResult"),
+        db.ForeignKey("query_results.id"),
+        nullable=True,
+        index=True,
     )
     latest_query_data = db.relationship(QueryResult)
     name = Column(db.String(255))
@@ -635,7 +867,10 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
     def outdated_queries(cls):
         queries = (
             Query.query.options(
-                joinedload(Query.latest_query_data).load_only("retrieved_at")
+                joinedload(Query.latest_query_data).load_only("retrieved_at"),
+                # Used to decide whether to refresh the queries, see `refresh_queries`
+                joinedload(Query.org),
+                joinedload(Query.data_source),
             )
             .filter(Query.schedule.isnot(None))
             .order_by(Query.id)
@@ -644,6 +879,7 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
 
         now = utils.utcnow()
         outdated_queries = {}
+        due_at = {}
         scheduled_queries_executions.refresh()
 
         for query in queries:
@@ -663,16 +899,20 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
                     query.latest_query_data and query.latest_query_data.retrieved_at
                 )
 
-                if should_schedule_next(
+                next_iteration = next_iteration_at(
                     retrieved_at or now,
-                    now,
                     query.schedule["interval"],
                     query.schedule["time"],
                     query.schedule["day_of_week"],
                     query.schedule_failures,
-                ):
+                    schedule_jitter(
+                        query.id, query.schedule["interval"], query.schedule["time"]
+                    ),
+                )
+                if next_iteration is not None and now > next_iteration:
                     key = "{}:{}".format(query.query_hash, query.data_source_id)
                     outdated_queries[key] = query
+                    due_at[query.id] = next_iteration
             except Exception as e:
                 query.schedule["disabled"] = True
                 db.session.commit()
@@ -686,7 +926,9 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
                     type(e)(message).with_traceback(e.__traceback__)
                 )
 
-        return list(outdated_queries.values())
+        # The longest overdue first, so queries left for later ticks (see
+        # `refresh_queries`) are the first ones enqueued then.
+        return sorted(outdated_queries.values(), key=lambda query: due_at[query.id])
 
     @classmethod
     def search(
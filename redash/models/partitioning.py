@@ -0,0 +1,332 @@
+"""
+Range partitioning of the big, append mostly tables by time.
+
+Tables are converted to partitioned tables with `redash partitions convert` (models don't
+change, Redash works the same way whether they're partitioned or not). Once they are,
+the `manage_partitions` job creates the partitions of upcoming periods and enforces
+retention by dropping whole partitions, which is much cheaper than deleting rows. Rows
+that must outlive the retention (like results still used by queries) are moved to the
+default partition before their partition is dropped.
+"""
+import datetime
+import logging
+import re
+
+import pytz
+from dateutil.parser import parse as parse_date
+from sqlalchemy import text
+
+from redash import settings
+from redash.utils import utcnow
+
+from .base import db
+
+logger = logging.getLogger(__name__)
+
+# Partition boundaries are aligned on this date (a Monday), so weekly partitions start
+# on Mondays.
+EPOCH = datetime.datetime(1970, 1, 5, tzinfo=pytz.utc)
+BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class PartitionedTable(object):
+    def __init__(
+        self,
+        name,
+        column,
+        retention,
+        retained_rows=None,
+        reference_column=None,
+        blob_column=None,
+    ):
+        self.name = name
+        # The timestamp column the table is partitioned by
+        self.column = column
+        self._retention = retention
+        # Condition on the rows of a partition (`p`) to keep when it's dropped
+        self.retained_rows = retained_rows
+        # Column referencing another row of the table, which is kept along with the rows
+        # referencing it
+        self.reference_column = reference_column
+        # Column of blob store keys, to delete the blobs of dropped rows
+        self.blob_column = blob_column
+
+    @property
+    def retention(self):
+        """Number of days rows are kept for, 0 meaning forever."""
+        return self._retention()
+
+    @property
+    def default_partition(self):
+        return "{}_default".format(self.name)
+
+    def partition_name(self, start):
+        return "{}_p{:%Y%m%d}".format(self.name, start)
+
+
+PARTITIONED_TABLES = [
+    PartitionedTable(
+        "query_results",
+        "retrieved_at",
+        retention=lambda: settings.QUERY_RESULTS_CLEANUP_MAX_AGE,
+        # Results referenced by the rows of the same partition are only kept when these
+        # are (see `reference_column`)
+        retained_rows=(
+            "EXISTS (SELECT 1 FROM queries q WHERE q.latest_query_data_id = p.id) "
+            "OR EXISTS (SELECT 1 FROM query_results r "
+            "WHERE r.data_result_id = p.id AND r.tableoid <> p.tableoid)"
+        ),
+        reference_column="data_result_id",
+        blob_column="data_blob_key",
+    ),
+    PartitionedTable(
+        "events", "created_at", retention=lambda: settings.EVENTS_RETENTION_MAX_AGE
+    ),
+]
+
+
+def get_partitioned_table(name):
+    for table in PARTITIONED_TABLES:
+        if table.name == name:
+            return table
+    raise ValueError("{} can't be partitioned.".format(name))
+
+
+def _execute(sql, **params):
+    return db.session.execute(text(sql), params)
+
+
+def period_start(value):
+    """Returns the start of the partition period `value` is in."""
+    interval = datetime.timedelta(days=settings.PARTITIONS_INTERVAL_DAYS)
+    return value - (value - EPOCH) % interval
+
+
+def parse_bound(bound):
+    """Returns the (start, end) of a range partition bound expression, or None for the
+    default partition."""
+    match = BOUND_RE.search(bound)
+    if match is None:
+        return None
+    return parse_date(match.group(1)), parse_date(match.group(2))
+
+
+def is_partitioned(table):
+    return bool(
+        _execute(
+            "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:name)",
+            name=table.name,
+        ).scalar()
+    )
+
+
+def partitions(table, parent=None):
+    """Returns the (name, start, end) of the range partitions of `table`, ordered by
+    start."""
+    rows = _execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:name)
+        """,
+        name=parent or table.name,
+    )
+
+    result = []
+    for name, bound in rows:
+        bounds = parse_bound(bound)
+        if bounds is not None:
+            result.append((name,) + bounds)
+
+    return sorted(result, key=lambda partition: partition[1])
+
+
+def create_partitions(table, start, end, parent=None):
+    """Creates the missing partitions of `table` covering `start` to `end`. Returns the
+    names of the created partitions."""
+    parent = parent or table.name
+    existing = partitions(table, parent)
+    interval = datetime.timedelta(days=settings.PARTITIONS_INTERVAL_DAYS)
+
+    created = []
+    period = period_start(start)
+    while period < end:
+        period_end = period + interval
+        # Skip periods already covered, like when the interval changed
+        if not any(s < period_end and period < e for _, s, e in existing):
+            name = table.partition_name(period)
+            _execute(
+                "CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (:start) TO (:end)".format(
+                    name, parent
+                ),
+                start=period,
+                end=period_end,
+            )
+            created.append(name)
+        period = period_end
+
+    return created
+
+
+def _retained_rows_query(table, partition):
+    """Returns the query of the ids of the rows of `partition` to retain: those matching
+    the condition of the table, and the rows they reference (recursively)."""
+    if not table.reference_column:
+        return "SELECT p.id FROM {} p WHERE {}".format(partition, table.retained_rows)
+
+    return """
+        WITH RECURSIVE retained(id, reference) AS (
+            SELECT p.id, p.{reference} FROM {partition} p WHERE {condition}
+            UNION
+            SELECT p.id, p.{reference} FROM {partition} p
+            JOIN retained r ON p.id = r.reference
+        )
+        SELECT id FROM retained
+    """.format(
+        partition=partition,
+        reference=table.reference_column,
+        condition=table.retained_rows,
+    )
+
+
+def drop_partitions(table, before):
+    """Drops the partitions of `table` whose rows are all older than `before`, moving the
+    rows to retain to the default partition first. Returns the names of the dropped
+    partitions and the values of the blob column of their dropped rows."""
+    dropped = []
+    blobs = set()
+
+    for name, _, end in partitions(table):
+        if end > before:
+            continue
+
+        # The rows to retain are found while the partition is attached, as the
+        # conditions on them look for the rows of the table referencing them.
+        retained = "SELECT NULL::bigint AS id WHERE false"
+        if table.retained_rows:
+            _execute(
+                "CREATE TEMPORARY TABLE retained_rows ON COMMIT DROP AS "
+                + _retained_rows_query(table, name)
+            )
+            retained = "SELECT id FROM retained_rows"
+
+        # Once detached, the rows of the partition aren't in the table anymore, so
+        # inserting them again puts them in the default partition.
+        _execute("ALTER TABLE {} DETACH PARTITION {}".format(table.name, name))
+        if table.retained_rows:
+            _execute(
+                "INSERT INTO {} SELECT * FROM {} WHERE id IN ({})".format(
+                    table.name, name, retained
+                )
+            )
+        if table.blob_column:
+            blobs.update(
+                key
+                for key, in _execute(
+                    "SELECT DISTINCT {0} FROM {1} "
+                    "WHERE {0} IS NOT NULL AND id NOT IN ({2})".format(
+                        table.blob_column, name, retained
+                    )
+                )
+            )
+        _execute("DROP TABLE {}".format(name))
+        db.session.commit()
+
+        dropped.append(name)
+
+    return dropped, blobs
+
+
+def convert_table(table, batch_size=10000, log=logger.info):
+    """
+    Converts `table` to a table partitioned by its time column, while it's being used.
+
+    The rows are copied in batches to a new partitioned table, then the tables are
+    swapped while the original one is locked, after copying the rows added in the
+    meantime. Rows updated during the copy keep their values from when they were copied.
+    The original table is kept as `<table>_unpartitioned`.
+
+    Partitioned tables can't have unique indexes (or be referenced by foreign keys)
+    without the partitioning column, so unique indexes are replaced by regular ones and
+    foreign keys referencing the table are dropped.
+    """
+    if int(_execute("SHOW server_version_num").scalar()) < 110000:
+        raise Exception("Partitioning requires PostgreSQL 11 or newer.")
+    if is_partitioned(table):
+        raise Exception("{} is already partitioned.".format(table.name))
+
+    new = "{}_partitioned".format(table.name)
+    old = "{}_unpartitioned".format(table.name)
+
+    _execute(
+        "CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE ({})".format(new, table.name, table.column)
+    )
+    for indexdef, in _execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = :name", name=table.name
+    ).fetchall():
+        _execute("CREATE INDEX ON {} {}".format(new, indexdef[indexdef.index("USING") :]))
+    for definition, in _execute(
+        """
+        SELECT pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(:name) AND contype = 'f' AND confrelid != conrelid
+        """,
+        name=table.name,
+    ).fetchall():
+        _execute("ALTER TABLE {} ADD {}".format(new, definition))
+
+    _execute("CREATE TABLE {} PARTITION OF {} DEFAULT".format(table.default_partition, new))
+    now = utcnow()
+    # Partitions past the retention are dropped by the next `manage_partitions` run
+    start = _execute("SELECT min({}) FROM {}".format(table.column, table.name)).scalar()
+    create_partitions(
+        table,
+        start or now,
+        now + datetime.timedelta(days=settings.PARTITIONS_INTERVAL_DAYS * 2),
+        parent=new,
+    )
+    db.session.commit()
+    log("Created {} and its partitions.".format(new))
+
+    max_id = _execute("SELECT max(id) FROM {}".format(table.name)).scalar() or 0
+    copied_id = 0
+    while copied_id < max_id:
+        _execute(
+            "INSERT INTO {} SELECT * FROM {} WHERE id > :start AND id <= :end".format(
+                new, table.name
+            ),
+            start=copied_id,
+            end=copied_id + batch_size,
+        )
+        db.session.commit()
+        copied_id = min(copied_id + batch_size, max_id)
+        log("Copied rows up to id {} of {}.".format(copied_id, max_id))
+
+    sequence = _execute(
+        "SELECT pg_get_serial_sequence(:name, 'id')", name=table.name
+    ).scalar()
+    _execute("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE".format(table.name))
+    _execute(
+        "INSERT INTO {} SELECT * FROM {} WHERE id > :start".format(new, table.name),
+        start=copied_id,
+    )
+    for name, referencing in _execute(
+        """
+        SELECT conname, conrelid::regclass::text FROM pg_constraint
+        WHERE confrelid = to_regclass(:name) AND contype = 'f'
+        """,
+        name=table.name,
+    ).fetchall():
+        _execute('ALTER TABLE {} DROP CONSTRAINT "{}"'.format(referencing, name))
+    _execute("ALTER TABLE {} RENAME TO {}".format(table.name, old))
+    _execute("ALTER TABLE {} RENAME TO {}".format(new, table.name))
+    if sequence:
+        # Otherwise dropping the original table would drop the sequence too
+        _execute("ALTER SEQUENCE {} OWNED BY {}.id".format(sequence, table.name))
+    db.session.commit()
+    log(
+        "{} is now partitioned, the original table was renamed {}.".format(
+            table.name, old
+        )
+    )
@@ -1,13 +1,15 @@
 from __future__ import absolute_import
 import itertools
+import time
 from funcy import flatten
 from sqlalchemy import union_all
 from redash import redis_connection, rq_redis_connection, __version__, settings
 from redash.models import db, DataSource, Query, QueryResult, Dashboard, Widget
-from redash.utils import json_loads
+from redash.utils import json_dumps, json_loads
 from rq import Queue, Worker
 from rq.job import Job
 from rq.registry import StartedJobRegistry
+from rq_scheduler import Scheduler
 
 
 def get_redis_status():
@@ -18,14 +20,38 @@ def get_redis_status():
     }
 
 
+STATUS_SNAPSHOT_KEY = "redash:status_snapshot"
+RQ_STATUS_SNAPSHOT_KEY = "redash:rq_status_snapshot"
+
+# The table and its partitions, if it's partitioned (see `redash.models.partitioning`)
+TABLE_AND_PARTITIONS = """
+    oid = to_regclass(:name)
+    OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:name))
+"""
+
+
+def estimate_count(model):
+    """Returns the number of rows of the table of `model` estimated by Postgres (as of
+    its latest vacuum or analyze), which unlike counting doesn't scan the table."""
+    estimate = db.session.execute(
+        "SELECT coalesce(sum(greatest(reltuples, 0)), 0)::bigint FROM pg_class WHERE "
+        + TABLE_AND_PARTITIONS,
+        {"name": model.__tablename__},
+    ).scalar()
+    # Tables which were never analyzed yet have no estimate, but they're small
+    if not estimate:
+        return model.query.count()
+    return estimate
+
+
 def get_object_counts():
     status = {}
-    status["queries_count"] = Query.query.count()
+    status["queries_count"] = estimate_count(Query)
     if settings.FEATURE_SHOW_QUERY_RESULTS_COUNT:
-        status["query_results_count"] = QueryResult.query.count()
+        status["query_results_count"] = estimate_count(QueryResult)
         status["unused_query_results_count"] = QueryResult.unused().count()
-    status["dashboards_count"] = Dashboard.query.count()
-    status["widgets_count"] = Widget.query.count()
+    status["dashboards_count"] = estimate_count(Dashboard)
+    status["widgets_count"] = estimate_count(Widget)
     return status
 
 
@@ -38,36 +64,68 @@ def get_db_sizes():
     queries = [
         [
             "Query Results Size",
-            "select pg_total_relation_size('query_results') as size from (select 1) as a",
+            "select coalesce(sum(pg_total_relation_size(oid)), 0) as size from pg_class where "
+            + TABLE_AND_PARTITIONS,
         ],
         ["Redash DB Size", "select pg_database_size(current_database()) as size"],
     ]
     for query_name, query in queries:
-        result = db.session.execute(query).first()
+        result = db.session.execute(query, {"name": QueryResult.__tablename__}).first()
         database_metrics.append([query_name, result[0]])
 
     return database_metrics
 
 
-def get_status():
+def _store_snapshot(key, snapshot):
+    snapshot["collected_at"] = time.time()
+    # Snapshots expire, so they're collected again when the collector doesn't run
+    redis_connection.set(key, json_dumps(snapshot), ex=settings.STATUS_SNAPSHOT_MAX_AGE)
+    return snapshot
+
+
+def _get_snapshot(key, collect):
+    snapshot = redis_connection.get(key)
+    snapshot = json_loads(snapshot) if snapshot else collect()
+    snapshot["snapshot_age"] = int(time.time() - snapshot["collected_at"])
+    return snapshot
+
+
+def collect_status():
+    """Collects the parts of the status which are expensive to get (from the database),
+    and stores them for `get_status`."""
     status = {"version": __version__, "workers": []}
-    status.update(get_redis_status())
     status.update(get_object_counts())
+    status["database_metrics"] = {"metrics": get_db_sizes()}
+    return _store_snapshot(STATUS_SNAPSHOT_KEY, status)
+
+
+def get_status():
+    """Returns the latest status collected by `collect_status` (with its age, in
+    seconds) along with the current state of Redis and of the queues."""
+    status = _get_snapshot(STATUS_SNAPSHOT_KEY, collect_status)
+    status.update(get_redis_status())
     status["manager"] = redis_connection.hgetall("redash:status")
     status["manager"]["queues"] = get_queues_status()
-    status["database_metrics"] = {}
-    status["database_metrics"]["metrics"] = get_db_sizes()
 
     return status
 
 
 def rq_job_ids():
+    """Returns the set of ids of the queued, started and deferred jobs, fetched with a
+    single pipeline."""
     queues = Queue.all(connection=redis_connection)
+    now = time.time()
 
-    started_jobs = [StartedJobRegistry(queue=q).get_job_ids() for q in queues]
-    queued_jobs = [q.job_ids for q in queues]
+    pipe = redis_connection.pipeline(transaction=False)
+    for q in queues:
+        pipe.lrange(q.key, 0, -1)
+        # Jobs whose entries expired are dead, even before the registry is cleaned up
+        pipe.zrangebyscore(StartedJobRegistry(queue=q).key, now, "+inf")
+    # Jobs deferred by the workers (see `ConcurrencyLimitingWorker`) are queued again
+    # by the scheduler
+    pipe.zrange(Scheduler.scheduled_jobs_key, 0, -1)
 
-    return flatten(started_jobs + queued_jobs)
+    return set(flatten(pipe.execute()))
 
 
 def fetch_jobs(job_ids):
@@ -90,7 +148,7 @@ def rq_queues():
         q.name: {
             "name": q.name,
             "started": fetch_jobs(StartedJobRegistry(queue=q).get_job_ids()),
-            "queued": len(q.job_ids),
+            "queued": q.count,
         }
         for q in sorted(Queue.all(), key=lambda q: q.name)
     }
@@ -119,5 +177,19 @@ def rq_workers():
     ]
 
 
+def collect_rq_status():
+    """Collects the started jobs and the workers, and stores them for `rq_status`."""
+    return _store_snapshot(
+        RQ_STATUS_SNAPSHOT_KEY, {"queues": rq_queues(), "workers": rq_workers()}
+    )
+
+
 def rq_status():
-    return {"queues": rq_queues(), "workers": rq_workers()}
+    """Returns the latest jobs and workers collected by `collect_rq_status` (with their
+    age, in seconds), along with the current number of queued jobs."""
+    status = _get_snapshot(RQ_STATUS_SNAPSHOT_KEY, collect_rq_status)
+    for name, queue in get_queues_status().items():
+        status["queues"].setdefault(name, {"name": name, "started": []})
+        status["queues"][name]["queued"] = queue["size"]
+
+    return status
@@ -1,6 +1,6 @@
 import logging
 
-from contextlib import ExitStack
+from contextlib import ExitStack, nullcontext
 from dateutil import parser
 from functools import wraps
 import socket
@@ -121,6 +121,12 @@ class BaseQueryRunner(object):
     noop_query = None
     limit_query = " LIMIT 1000"
     limit_keywords = [ "LIMIT", "OFFSET"]
+    # Connections can't be reused while the runner's host/port point at a per-execution SSH tunnel.
+    allow_connection_pooling = True
+    # Set by the query executor to receive the progress reported by `report_progress`.
+    progress_callback = None
+    # Set by the query executor to time the stages of the execution (see `timed`).
+    stage_timer = None
 
     def __init__(self, configuration):
         self.syntax = "sql"
@@ -194,6 +200,43 @@ class BaseQueryRunner(object):
     def configuration_schema(cls):
         return {}
 
+    def report_progress(
+        self, rows_fetched=None, bytes_processed=None, percent=None, state=None
+    ):
+        """Reports the progress of the running query, from the statistics of the engine
+        (like the rows and bytes it processed so far). Runners can call it as often as
+        they want, the executor throttles the updates."""
+        if self.progress_callback is None:
+            return
+
+        progress = {
+            "rows_fetched": rows_fetched,
+            "bytes_processed": bytes_processed,
+            "percent": percent,
+            "state": state,
+        }
+        try:
+            self.progress_callback(
+                {key: value for key, value in progress.items() if value is not None}
+            )
+        except Exception:
+            # Reporting progress must never fail the query
+            logger.warning("Failed reporting query progress.", exc_info=True)
+
+    def timed(self, stage):
+        """Returns a context manager timing a stage of the execution of a query (like
+        "connect", "execute", "fetch" or "serialize"), reported along with the stages
+        of the executor."""
+        if self.stage_timer is None:
+            return nullcontext()
+        return self.stage_timer.stage(stage)
+
+    @property
+    def uses_connection_pool(self):
+        """Whether this runner should keep its connections in a pool shared across executions
+        (see `redash.query_runner.pooling`) instead of opening a new one per query."""
+        return settings.QUERY_RUNNER_CONNECTION_POOLING and self.allow_connection_pooling
+
     def annotate_query(self, query, metadata):
         if not self.should_annotate_query:
             return query
@@ -516,5 +559,6 @@ def with_ssh_tunnel(query_runner, details):
         return wrapper
 
     query_runner.run_query = tunnel(query_runner.run_query)
+    query_runner.allow_connection_pooling = False
 
     return query_runner
@@ -3,6 +3,7 @@ import logging
 import sys
 import time
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
 
 import httplib2
 import requests
@@ -46,6 +47,44 @@ def transform_cell(field_type, cell_value):
     return cell_value
 
 
+cell_converters = {
+    "INTEGER": int,
+    "FLOAT": float,
+    "BOOLEAN": lambda value: value.lower() == "true",
+    "TIMESTAMP": lambda value: datetime.datetime.fromtimestamp(float(value)),
+}
+
+
+def _nullable(convert):
+    if convert is None:
+        return lambda value: value
+
+    return lambda value: None if value is None else convert(value)
+
+
+def build_field_converter(field):
+    """Returns a function converting a raw cell value of `field` into its Python value.
+    Equivalent to `transform_cell`, but resolves the field type once instead of per cell."""
+    convert = _nullable(cell_converters.get(field["type"]))
+
+    if field.get("mode") == "REPEATED":
+        return lambda value: [convert(item["v"]) for item in value]
+
+    return convert
+
+
+def build_row_transformer(fields):
+    converters = [(field["name"], build_field_converter(field)) for field in fields]
+
+    def transform(row):
+        return {
+            name: convert(cell["v"])
+            for (name, convert), cell in zip(converters, row["f"])
+        }
+
+    return transform
+
+
 def transform_row(row, fields):
     row_data = {}
 
@@ -71,14 +110,39 @@ def _load_key(filename):
         f.close()
 
 
-def _get_query_results(jobs, project_id, location, job_id, start_index):
-    query_reply = jobs.getQueryResults(
-        projectId=project_id, location=location, jobId=job_id, startIndex=start_index
-    ).execute()
+def _get_query_results(
+    jobs,
+    project_id,
+    location,
+    job_id,
+    start_index,
+    max_results=None,
+    report_progress=None,
+):
+    request = {
+        "projectId": project_id,
+        "location": location,
+        "jobId": job_id,
+        "startIndex": start_index,
+    }
+    if max_results:
+        request["maxResults"] = max_results
+
+    query_reply = jobs.getQueryResults(**request).execute()
     logging.debug("query_reply %s", query_reply)
     if not query_reply["jobComplete"]:
+        if report_progress is not None:
+            report_progress(state="RUNNING")
         time.sleep(10)
-        return _get_query_results(jobs, project_id, location, job_id, start_index)
+        return _get_query_results(
+            jobs,
+            project_id,
+            location,
+            job_id,
+            start_index,
+            max_results,
+            report_progress,
+        )
 
     return query_reply
 
@@ -123,6 +187,22 @@ class BigQuery(BaseQueryRunner):
                     "type": "number",
                     "title": "Maximum Billing Tier",
                 },
+                "useBatchedFetch": {
+                    "type": "boolean",
+                    "title": "Fetch large pages and prefetch the next page while decoding",
+                },
+                "resultPageSize": {
+                    "type": "number",
+                    "title": "Result Page Size (rows, batched fetch only)",
+                },
+                "maximumResultRows": {
+                    "type": "number",
+                    "title": "Maximum Result Rows (batched fetch only)",
+                },
+                "maximumResultMBytes": {
+                    "type": "number",
+                    "title": "Maximum Result Size in MB (batched fetch only)",
+                },
             },
             "required": ["jsonKeyFile", "projectId"],
             "order": [
@@ -134,6 +214,10 @@ class BigQuery(BaseQueryRunner):
                 "totalMBytesProcessedLimit",
                 "maximumBillingTier",
                 "userDefinedFunctionResourceUri",
+                "useBatchedFetch",
+                "resultPageSize",
+                "maximumResultRows",
+                "maximumResultMBytes",
             ],
             "secret": ["jsonKeyFile"],
         }
@@ -194,11 +278,16 @@ class BigQuery(BaseQueryRunner):
 
         return job_data
 
-    def _get_query_result(self, jobs, query):
-        project_id = self._get_project_id()
+    def _insert_job(self, jobs, query):
         job_data = self._get_job_data(query)
-        insert_response = jobs.insert(projectId=project_id, body=job_data).execute()
+        insert_response = jobs.insert(
+            projectId=self._get_project_id(), body=job_data
+        ).execute()
         self.current_job_id = insert_response["jobReference"]["jobId"]
+
+    def _get_query_result(self, jobs, query):
+        project_id = self._get_project_id()
+        self._insert_job(jobs, query)
         current_row = 0
         query_reply = _get_query_results(
             jobs,
@@ -206,6 +295,7 @@ class BigQuery(BaseQueryRunner):
             location=self._get_location(),
             job_id=self.current_job_id,
             start_index=current_row,
+            report_progress=self.report_progress,
         )
 
         logger.debug("bigquery replied: %s", query_reply)
@@ -217,6 +307,7 @@ class BigQuery(BaseQueryRunner):
                 rows.append(transform_row(row, query_reply["schema"]["fields"]))
 
             current_row += len(query_reply["rows"])
+            self._report_fetch_progress(query_reply, current_row)
 
             query_result_request = {
                 "projectId": project_id,
@@ -248,6 +339,133 @@ class BigQuery(BaseQueryRunner):
 
         return data
 
+    def _report_fetch_progress(self, query_reply, fetched_rows):
+        total_rows = int(query_reply.get("totalRows", 0))
+        self.report_progress(
+            rows_fetched=fetched_rows,
+            bytes_processed=_get_total_bytes_processed_for_resp(query_reply),
+            percent=100.0 * fetched_rows / max(total_rows, 1),
+            state="FETCHING",
+        )
+
+    def _get_query_result_batched(self, jobs, query):
+        """Fetches the results of `query` in large pages, requesting the next page in the
+        background while the current one is decoded, and returns them already serialized.
+
+        Rows are converted with per-field converters built once from the schema and each
+        page is encoded as soon as it's decoded, so the full result never exists as a list
+        of Python dicts. Fetching stops early (and the result is flagged as truncated) once
+        `maximumResultRows` or (with up to one page of slack) `maximumResultMBytes` is reached.
+        """
+        project_id = self._get_project_id()
+        location = self._get_location()
+        page_size = int(
+            self.configuration.get("resultPageSize")
+            or settings.BIGQUERY_RESULTS_PAGE_SIZE
+        )
+        max_rows = int(self.configuration.get("maximumResultRows") or 0)
+        max_bytes = int(self.configuration.get("maximumResultMBytes") or 0) * 1000 * 1000
+
+        self._insert_job(jobs, query)
+        query_reply = _get_query_results(
+            jobs,
+            project_id=project_id,
+            location=location,
+            job_id=self.current_job_id,
+            start_index=0,
+            max_results=page_size,
+            report_progress=self.report_progress,
+        )
+
+        logger.debug("bigquery replied: %s", query_reply)
+
+        fields = query_reply["schema"]["fields"]
+        total_rows = int(query_reply["totalRows"])
+        data_scanned = _get_total_bytes_processed_for_resp(query_reply)
+        transform = build_row_transformer(fields)
+
+        def fetch_page(start_index):
+            query_result_request = {
+                "projectId": project_id,
+                "jobId": self.current_job_id,
+                "startIndex": start_index,
+                "maxResults": page_size,
+            }
+            if location:
+                query_result_request["location"] = location
+
+            return jobs.getQueryResults(**query_result_request).execute()
+
+        encoded_pages = []
+        fetched_rows = 0
+        encoded_bytes = 0
+        truncated = False
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while query_reply is not None and "rows" in query_reply:
+                if max_bytes and encoded_bytes >= max_bytes:
+                    truncated = True
+                    break
+
+                page = query_reply["rows"]
+                if max_rows and fetched_rows + len(page) >= max_rows:
+                    page = page[: max_rows - fetched_rows]
+                    truncated = total_rows > max_rows
+                fetched_rows += len(page)
+                self.report_progress(
+                    rows_fetched=fetched_rows,
+                    bytes_processed=data_scanned,
+                    percent=100.0 * fetched_rows / max(total_rows, 1),
+                    state="FETCHING",
+                )
+
+                # Only one request is in flight at a time, so the (non thread-safe)
+                # HTTP client is never used concurrently.
+                next_page = None
+                if fetched_rows < total_rows and not truncated:
+                    next_page = executor.submit(fetch_page, fetched_rows)
+
+                if page:
+                    encoded_page = json_dumps([transform(row) for row in page])[1:-1]
+                    encoded_pages.append(encoded_page)
+                    encoded_bytes += len(encoded_page)
+
+                query_reply = next_page.result() if next_page is not None else None
+
+        if truncated:
+            logger.warning(
+                "BigQuery result for job %s truncated at %d rows (%d total).",
+                self.current_job_id,
+                fetched_rows,
+                total_rows,
+            )
+
+        columns = [
+            {
+                "name": f["name"],
+                "friendly_name": f["name"],
+                "type": "string"
+                if f.get("mode") == "REPEATED"
+                else types_map.get(f["type"], "string"),
+            }
+            for f in fields
+        ]
+        metadata = {"data_scanned": data_scanned}
+        if truncated:
+            metadata["truncated"] = True
+
+        return "".join(
+            [
+                '{"columns": ',
+                json_dumps(columns),
+                ', "rows": [',
+                ", ".join(encoded_pages),
+                '], "metadata": ',
+                json_dumps(metadata),
+                "}",
+            ]
+        )
+
     def _get_columns_schema(self, table_data):
         columns = []
         for column in table_data.get("schema", {}).get("fields", []):
@@ -335,10 +553,12 @@ class BigQuery(BaseQueryRunner):
                         % (limitMB, processedMB),
                     )
 
-            data = self._get_query_result(jobs, query)
+            if self.configuration.get("useBatchedFetch", False):
+                json_data = self._get_query_result_batched(jobs, query)
+            else:
+                data = self._get_query_result(jobs, query)
+                json_data = json_dumps(data, ignore_nan=True)
             error = None
-
-            json_data = json_dumps(data, ignore_nan=True)
         except apiclient.errors.HttpError as e:
             json_data = None
             if e.resp.status == 400:
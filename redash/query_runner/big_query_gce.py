@@ -55,6 +55,22 @@ class BigQueryGCE(BigQuery):
                     "default": "US",
                 },
                 "loadSchema": {"type": "boolean", "title": "Load Schema"},
+                "useBatchedFetch": {
+                    "type": "boolean",
+                    "title": "Fetch large pages and prefetch the next page while decoding",
+                },
+                "resultPageSize": {
+                    "type": "number",
+                    "title": "Result Page Size (rows, batched fetch only)",
+                },
+                "maximumResultRows": {
+                    "type": "number",
+                    "title": "Maximum Result Rows (batched fetch only)",
+                },
+                "maximumResultMBytes": {
+                    "type": "number",
+                    "title": "Maximum Result Size in MB (batched fetch only)",
+                },
             },
         }
 
@@ -1,5 +1,6 @@
 import logging
 import re
+import threading
 from urllib.parse import urlparse
 from uuid import uuid4
 
@@ -11,11 +12,65 @@ from redash.utils import json_dumps, json_loads
 
 logger = logging.getLogger(__name__)
 
+try:
+    import pyarrow
+    import pyarrow.ipc
+
+    arrow_enabled = True
+except ImportError:
+    arrow_enabled = False
+
+TRANSPORT_JSON = "JSON"
+TRANSPORT_JSON_COMPACT = "JSONCompact"
+TRANSPORT_ARROW = "ArrowStream"
+
+# Streaming formats are requested with their row-oriented variant, so the response can be
+# decoded line by line (JSONCompact) or record batch by record batch (Arrow).
+STREAMING_FORMATS = {
+    TRANSPORT_JSON_COMPACT: "JSONCompactEachRowWithNamesAndTypes",
+    TRANSPORT_ARROW: "ArrowStream",
+}
+
+# Neither streaming format carries the totals of `WITH TOTALS` queries, so these are
+# requested as a single JSONCompact document, which has them in its "totals" section.
+WITH_TOTALS_RE = re.compile(r"\bWITH\s+TOTALS\b", re.IGNORECASE)
+TOTALS_FORMAT = "JSONCompact"
+INT64_TYPES = ("Int64", "UInt64", "Nullable(Int64)", "Nullable(UInt64)")
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
 
 def split_multi_query(query):
     return [st for st in split_sql_statements(query) if st != ""]
 
 
+def _get_session(key):
+    """Returns a `requests.Session` shared by all queries sent with the same connection
+    details, so that consecutive statements reuse pooled (keep-alive) connections."""
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = requests.Session()
+
+        return session
+
+
+def _arrow_column_type(arrow_type):
+    if pyarrow.types.is_integer(arrow_type):
+        return TYPE_INTEGER
+    elif pyarrow.types.is_floating(arrow_type) or pyarrow.types.is_decimal(arrow_type):
+        return TYPE_FLOAT
+    elif pyarrow.types.is_boolean(arrow_type):
+        return TYPE_BOOLEAN
+    elif pyarrow.types.is_timestamp(arrow_type):
+        return TYPE_DATETIME
+    elif pyarrow.types.is_date(arrow_type):
+        return TYPE_DATE
+    else:
+        return TYPE_STRING
+
+
 class ClickHouse(BaseSQLQueryRunner):
     noop_query = "SELECT 1"
 
@@ -38,10 +93,22 @@ class ClickHouse(BaseSQLQueryRunner):
                     "title": "Verify SSL certificate",
                     "default": True,
                 },
+                "transport": {
+                    "type": "string",
+                    "title": "Result Transport Format",
+                    "enum": [TRANSPORT_JSON, TRANSPORT_JSON_COMPACT]
+                    + ([TRANSPORT_ARROW] if arrow_enabled else []),
+                    "default": TRANSPORT_JSON,
+                },
+                "compression": {
+                    "type": "boolean",
+                    "title": "Use HTTP compression (JSONCompact/ArrowStream only)",
+                    "default": False,
+                },
             },
             "order": ["url", "user", "password", "dbname"],
             "required": ["dbname"],
-            "extra_options": ["timeout", "verify"],
+            "extra_options": ["timeout", "verify", "transport", "compression"],
             "secret": ["password"],
         }
 
@@ -93,10 +160,15 @@ class ClickHouse(BaseSQLQueryRunner):
 
         return list(schema.values())
 
-    def _send_query(self, data, session_id=None, session_check=None):
-        url = self.configuration.get("url", "http://127.0.0.1:8123")
-        timeout = self.configuration.get("timeout", 30)
+    @property
+    def _transport(self):
+        transport = self.configuration.get("transport") or TRANSPORT_JSON
+        if transport == TRANSPORT_ARROW and not arrow_enabled:
+            raise Exception("ArrowStream transport requires pyarrow to be installed.")
+
+        return transport
 
+    def _query_params(self, session_id=None, session_check=None):
         params = {
             "user": self.configuration.get("user", "default"),
             "password": self.configuration.get("password", ""),
@@ -107,7 +179,24 @@ class ClickHouse(BaseSQLQueryRunner):
         if session_id:
             params["session_id"] = session_id
             params["session_check"] = "1" if session_check else "0"
-            params["session_timeout"] = timeout
+            params["session_timeout"] = self.configuration.get("timeout", 30)
+
+        return params
+
+    @staticmethod
+    def _connection_error(url, e):
+        if e.response:
+            details = "({}, Status Code: {})".format(
+                e.__class__.__name__, e.response.status_code
+            )
+        else:
+            details = "({})".format(e.__class__.__name__)
+        return Exception("Connection error to: {} {}.".format(url, details))
+
+    def _send_query(self, data, session_id=None, session_check=None):
+        url = self.configuration.get("url", "http://127.0.0.1:8123")
+        timeout = self.configuration.get("timeout", 30)
+        params = self._query_params(session_id, session_check)
 
         try:
             verify = self.configuration.get("verify", True)
@@ -130,13 +219,42 @@ class ClickHouse(BaseSQLQueryRunner):
 
             return r.json()
         except requests.RequestException as e:
-            if e.response:
-                details = "({}, Status Code: {})".format(
-                    e.__class__.__name__, e.response.status_code
-                )
-            else:
-                details = "({})".format(e.__class__.__name__)
-            raise Exception("Connection error to: {} {}.".format(url, details))
+            raise self._connection_error(url, e)
+
+    def _stream_query(self, data, session_id=None, session_check=None):
+        """Sends `data` through the pooled session of this data source and returns the
+        (not yet consumed) streaming response."""
+        url = self.configuration.get("url", "http://127.0.0.1:8123")
+        timeout = self.configuration.get("timeout", 30)
+        verify = self.configuration.get("verify", True)
+        params = self._query_params(session_id, session_check)
+        params["output_format_json_quote_64bit_integers"] = "0"
+        params["output_format_arrow_string_as_string"] = "1"
+
+        headers = {}
+        if self.configuration.get("compression", False):
+            params["enable_http_compression"] = "1"
+            headers["Accept-Encoding"] = "gzip, deflate"
+
+        session = _get_session((url, params["user"], verify))
+
+        try:
+            r = session.post(
+                url,
+                data=data.encode("utf-8", "ignore"),
+                stream=True,
+                timeout=timeout,
+                params=params,
+                headers=headers,
+                verify=verify,
+            )
+
+            if r.status_code != 200:
+                raise Exception(r.text)
+
+            return r
+        except requests.RequestException as e:
+            raise self._connection_error(url, e)
 
     @staticmethod
     def _define_column_type(column):
@@ -155,9 +273,142 @@ class ClickHouse(BaseSQLQueryRunner):
         else:
             return TYPE_STRING
 
+    @classmethod
+    def _column_converter(cls, column_type):
+        redash_type = cls._define_column_type(column_type)
+
+        if redash_type == TYPE_INTEGER:
+            convert = int
+        elif redash_type == TYPE_FLOAT:
+            convert = float
+        else:
+            return lambda value: value
+
+        return lambda value: None if value is None else convert(value)
+
+    def _decode_json_compact(self, response):
+        lines = response.iter_lines()
+
+        names = json_loads(next(lines, b"[]"))
+        types = json_loads(next(lines, b"[]"))
+        converters = [self._column_converter(t) for t in types]
+
+        columns = [
+            {
+                "name": name,
+                "friendly_name": name,
+                "type": self._define_column_type(column_type),
+            }
+            for name, column_type in zip(names, types)
+        ]
+
+        rows = []
+        for line in lines:
+            if not line:
+                continue
+
+            values = json_loads(line)
+            rows.append(
+                {
+                    name: convert(value)
+                    for name, convert, value in zip(names, converters, values)
+                }
+            )
+
+        return {"columns": columns, "rows": rows}
+
+    def _decode_json_compact_totals(self, response):
+        response = json_loads(response.content)
+
+        meta = response.get("meta", [])
+        names = [column["name"] for column in meta]
+        converters = [self._column_converter(column["type"]) for column in meta]
+
+        columns = [
+            {
+                "name": column["name"],
+                "friendly_name": column["name"],
+                "type": self._define_column_type(column["type"]),
+            }
+            for column in meta
+        ]
+
+        rows = [
+            {
+                name: convert(value)
+                for name, convert, value in zip(names, converters, values)
+            }
+            for values in response.get("data", [])
+        ]
+
+        if "totals" in response:
+            # Labelled the same way as the totals of the JSON transport
+            totals = {}
+            for column, convert, value in zip(meta, converters, response["totals"]):
+                if column["type"] in INT64_TYPES:
+                    totals[column["name"]] = convert(value)
+                elif self._define_column_type(column["type"]) == TYPE_STRING:
+                    totals[column["name"]] = "Total"
+                else:
+                    totals[column["name"]] = None
+            rows.append(totals)
+
+        return {"columns": columns, "rows": rows}
+
+    def _decode_arrow(self, response):
+        # Let urllib3 undo any HTTP compression while pyarrow reads from the raw stream.
+        response.raw.decode_content = True
+
+        try:
+            reader = pyarrow.ipc.open_stream(response.raw)
+        except pyarrow.ArrowInvalid:
+            # Statements without a result set (e.g. CREATE TEMPORARY TABLE) have an empty body.
+            return {"columns": [], "rows": []}
+
+        names = reader.schema.names
+        columns = [
+            {
+                "name": field.name,
+                "friendly_name": field.name,
+                "type": _arrow_column_type(field.type),
+            }
+            for field in reader.schema
+        ]
+
+        rows = []
+        for batch in reader:
+            values = [column.to_pylist() for column in batch.columns]
+            rows.extend(dict(zip(names, row)) for row in zip(*values))
+
+        return {"columns": columns, "rows": rows}
+
+    def _clickhouse_streaming_query(
+        self, query, transport, session_id=None, session_check=None
+    ):
+        with_totals = WITH_TOTALS_RE.search(query) is not None
+        query_format = TOTALS_FORMAT if with_totals else STREAMING_FORMATS[transport]
+        query += "\nFORMAT {}".format(query_format)
+
+        response = self._stream_query(query, session_id, session_check)
+        try:
+            if with_totals:
+                return self._decode_json_compact_totals(response)
+            if transport == TRANSPORT_ARROW:
+                return self._decode_arrow(response)
+
+            return self._decode_json_compact(response)
+        finally:
+            response.close()
+
     def _clickhouse_query(self, query, session_id=None, session_check=None):
         logger.debug("Clickhouse is about to execute query: %s", query)
 
+        transport = self._transport
+        if transport != TRANSPORT_JSON:
+            return self._clickhouse_streaming_query(
+                query, transport, session_id, session_check
+            )
+
         query += "\nFORMAT JSON"
 
         response = self._send_query(query, session_id, session_check)
@@ -171,7 +422,7 @@ class ClickHouse(BaseSQLQueryRunner):
             column_name = r["name"]
             column_type = self._define_column_type(r["type"])
 
-            if r["type"] in ("Int64", "UInt64", "Nullable(Int64)", "Nullable(UInt64)"):
+            if r["type"] in INT64_TYPES:
                 columns_int64.append(column_name)
             else:
                 columns_totals[column_name] = (
@@ -13,6 +13,7 @@ from redash.query_runner import (
     JobTimeoutException,
     register,
 )
+from redash.query_runner.pooling import get_connection_pool
 from redash.settings import parse_boolean
 from redash.utils import json_dumps, json_loads
 
@@ -49,6 +50,14 @@ class Result(object):
         pass
 
 
+def _is_healthy(connection):
+    try:
+        connection.ping()
+        return True
+    except MySQLdb.Error:
+        return False
+
+
 class Mysql(BaseSQLQueryRunner):
     noop_query = "SELECT 1"
 
@@ -125,6 +134,16 @@ class Mysql(BaseSQLQueryRunner):
 
         return connection
 
+    def _get_connection_pool(self):
+        return get_connection_pool(
+            self,
+            connect=self._connection,
+            close=lambda connection: connection.close(),
+            is_healthy=_is_healthy,
+            # Undo any `USE other_db` issued by the previous query.
+            reset=lambda connection: connection.select_db(self.configuration["db"]),
+        )
+
     def _get_tables(self, schema):
         query = """
         SELECT col.table_schema as table_schema,
@@ -159,25 +178,30 @@ class Mysql(BaseSQLQueryRunner):
         ev = threading.Event()
         thread_id = ""
         r = Result()
+        r.discard_connection = False
         t = None
+        pool = self._get_connection_pool()
 
         try:
-            connection = self._connection()
+            connection = pool.acquire() if pool is not None else self._connection()
             thread_id = connection.thread_id()
             t = threading.Thread(
-                target=self._run_query, args=(query, user, connection, r, ev)
+                target=self._run_query, args=(query, user, connection, r, ev, pool)
             )
             t.start()
             while not ev.wait(1):
                 pass
         except (KeyboardInterrupt, InterruptException, JobTimeoutException):
+            # The killed connection is discarded once the query thread notices.
+            r.discard_connection = True
             self._cancel(thread_id)
             t.join()
             raise
 
         return r.json_data, r.error
 
-    def _run_query(self, query, user, connection, r, ev):
+    def _run_query(self, query, user, connection, r, ev, pool=None):
+        cursor = None
         try:
             cursor = connection.cursor()
             logger.debug("MySQL running query: %s", query)
@@ -214,9 +238,13 @@ class Mysql(BaseSQLQueryRunner):
                 cursor.close()
             r.json_data = None
             r.error = e.args[1]
+            if isinstance(e, MySQLdb.OperationalError):
+                r.discard_connection = True
         finally:
             ev.set()
-            if connection:
+            if connection and pool is not None:
+                pool.release(connection, discard=r.discard_connection)
+            elif connection:
                 connection.close()
 
     def _get_ssl_parameters(self):
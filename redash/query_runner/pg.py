@@ -10,6 +10,12 @@ import psycopg2
 from psycopg2.extras import Range
 
 from redash.query_runner import *
+from redash.query_runner.pooling import (
+    configuration_key,
+    get_cached_credentials,
+    get_cached_file,
+    get_connection_pool,
+)
 from redash.utils import JSONEncoder, json_dumps, json_loads
 
 logger = logging.getLogger(__name__)
@@ -111,11 +117,16 @@ def build_schema(query_result, schema):
         schema[table_name]["columns"].append(column)
 
 
-def _create_cert_file(configuration, key, ssl_config):
+def _create_cert_file(configuration, key, ssl_config, cached=False):
     file_key = key + "File"
     if file_key in configuration:
+        cert_bytes = b64decode(configuration[file_key])
+
+        if cached:
+            ssl_config[key] = get_cached_file(cert_bytes)
+            return
+
         with NamedTemporaryFile(mode="w", delete=False) as cert_file:
-            cert_bytes = b64decode(configuration[file_key])
             cert_file.write(cert_bytes.decode("utf-8"))
 
         ssl_config[key] = cert_file.name
@@ -127,18 +138,31 @@ def _cleanup_ssl_certs(ssl_config):
             os.remove(v)
 
 
-def _get_ssl_config(configuration):
+def _get_ssl_config(configuration, cached=False):
+    """Writes the configured certificates to files and returns the matching connection
+    parameters. With `cached`, the files are shared and kept until the process exits."""
     ssl_config = {"sslmode": configuration.get("sslmode", "prefer")}
 
-    _create_cert_file(configuration, "sslrootcert", ssl_config)
-    _create_cert_file(configuration, "sslcert", ssl_config)
-    _create_cert_file(configuration, "sslkey", ssl_config)
+    _create_cert_file(configuration, "sslrootcert", ssl_config, cached)
+    _create_cert_file(configuration, "sslcert", ssl_config, cached)
+    _create_cert_file(configuration, "sslkey", ssl_config, cached)
 
     return ssl_config
 
 
+def _is_healthy(connection):
+    return (
+        connection.closed == 0
+        and connection.get_transaction_status()
+        == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    )
+
+
 class PostgreSQL(BaseSQLQueryRunner):
     noop_query = "SELECT 1"
+    # Run before returning a connection to the pool, so session state set by one query
+    # (search_path, temporary tables, ...) doesn't leak into the next one.
+    pool_reset_query = "DISCARD ALL"
 
     @classmethod
     def configuration_schema(cls):
@@ -237,7 +261,9 @@ class PostgreSQL(BaseSQLQueryRunner):
         return list(schema.values())
 
     def _get_connection(self):
-        self.ssl_config = _get_ssl_config(self.configuration)
+        self.ssl_config = _get_ssl_config(
+            self.configuration, cached=self.uses_connection_pool
+        )
         connection = psycopg2.connect(
             user=self.configuration.get("user"),
             password=self.configuration.get("password"),
@@ -250,48 +276,86 @@ class PostgreSQL(BaseSQLQueryRunner):
 
         return connection
 
-    def run_query(self, query, user):
+    def _connect(self):
         connection = self._get_connection()
         _wait(connection, timeout=10)
+        return connection
+
+    def _reset_connection(self, connection):
+        if self.pool_reset_query:
+            connection.cursor().execute(self.pool_reset_query)
+            _wait(connection, timeout=10)
+
+    def _get_connection_pool(self):
+        return get_connection_pool(
+            self,
+            connect=self._connect,
+            close=lambda connection: connection.close(),
+            is_healthy=_is_healthy,
+            reset=self._reset_connection,
+        )
+
+    def run_query(self, query, user):
+        pool = self._get_connection_pool()
+        with self.timed("connect"):
+            if pool is not None:
+                connection = pool.acquire()
+            else:
+                connection = self._connect()
+        discard_connection = False
 
         cursor = connection.cursor()
 
         try:
-            cursor.execute(query)
-            _wait(connection)
+            with self.timed("execute"):
+                cursor.execute(query)
+                _wait(connection)
 
             if cursor.description is not None:
-                columns = self.fetch_columns(
-                    [(i[0], types_map.get(i[1], None)) for i in cursor.description]
-                )
-                rows = [
-                    dict(zip((column["name"] for column in columns), row))
-                    for row in cursor
-                ]
+                with self.timed("fetch"):
+                    columns = self.fetch_columns(
+                        [(i[0], types_map.get(i[1], None)) for i in cursor.description]
+                    )
+                    rows = [
+                        dict(zip((column["name"] for column in columns), row))
+                        for row in cursor
+                    ]
 
                 data = {"columns": columns, "rows": rows}
                 error = None
-                json_data = json_dumps(data, ignore_nan=True, cls=PostgreSQLJSONEncoder)
+                with self.timed("serialize"):
+                    json_data = json_dumps(
+                        data, ignore_nan=True, cls=PostgreSQLJSONEncoder
+                    )
             else:
                 error = "Query completed but it returned no data."
                 json_data = None
         except (select.error, OSError) as e:
             error = "Query interrupted. Please retry."
             json_data = None
+            discard_connection = True
         except psycopg2.DatabaseError as e:
             error = str(e)
             json_data = None
         except (KeyboardInterrupt, InterruptException, JobTimeoutException):
             connection.cancel()
+            discard_connection = True
             raise
         finally:
-            connection.close()
-            _cleanup_ssl_certs(self.ssl_config)
+            if pool is not None:
+                pool.release(connection, discard=discard_connection)
+            else:
+                connection.close()
+                _cleanup_ssl_certs(self.ssl_config)
 
         return json_data, error
 
 
 class Redshift(PostgreSQL):
+    # Redshift supports neither DISCARD ALL nor RESET ALL. The only session state Redash
+    # itself sets (query_group) is set again before every query.
+    pool_reset_query = None
+
     @classmethod
     def type(cls):
         return "redshift"
@@ -479,12 +543,7 @@ class RedshiftIAM(Redshift):
             "secret": ["aws_secret_access_key"],
         }
 
-    def _get_connection(self):
-
-        sslrootcert_path = os.path.join(
-            os.path.dirname(__file__), "./files/redshift-ca-bundle.crt"
-        )
-
+    def _get_cluster_credentials(self):
         login_method = self._login_method_selection()
 
         if login_method == "KEYS":
@@ -528,6 +587,20 @@ class RedshiftIAM(Redshift):
             DbName=self.configuration.get("dbname"),
             ClusterIdentifier=self.configuration.get("clusterid"),
         )
+        return credentials, credentials["Expiration"].timestamp()
+
+    def _get_connection(self):
+        self.ssl_config = {}
+
+        sslrootcert_path = os.path.join(
+            os.path.dirname(__file__), "./files/redshift-ca-bundle.crt"
+        )
+
+        # Temporary cluster credentials are valid for 15 minutes by default, so there is
+        # no need to go through STS/Redshift again for every query.
+        credentials = get_cached_credentials(
+            configuration_key(self), self._get_cluster_credentials
+        )
         db_user = credentials["DbUser"]
         db_password = credentials["DbPassword"]
         connection = psycopg2.connect(
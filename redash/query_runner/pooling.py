@@ -0,0 +1,227 @@
+"""
+Long-lived connection state for query runners.
+
+By default every execution opens (and closes) its own connection, which is the only
+sensible thing to do when each job runs in a freshly forked work horse. When jobs run in
+long-lived processes, query runners can instead reuse connections, temporary credentials
+and SSL certificate files between executions. Connection pooling is enabled with
+`settings.QUERY_RUNNER_CONNECTION_POOLING`.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from tempfile import NamedTemporaryFile
+
+from redash import settings
+from redash.utils import json_dumps
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool(object):
+    """A bounded pool of connections to a single data source.
+
+    At most `max_size` connections are checked out at the same time. Idle connections are
+    health checked before being handed out again and dropped once they've been idle for
+    more than `max_idle_time` seconds.
+    """
+
+    def __init__(
+        self,
+        connect,
+        close,
+        is_healthy=None,
+        reset=None,
+        max_size=None,
+        max_idle_time=None,
+        acquire_timeout=None,
+    ):
+        self._connect = connect
+        self._close = close
+        self._is_healthy = is_healthy or (lambda connection: True)
+        self._reset = reset
+        self.max_size = max_size or settings.QUERY_RUNNER_POOL_SIZE
+        self.max_idle_time = (
+            max_idle_time
+            if max_idle_time is not None
+            else settings.QUERY_RUNNER_POOL_MAX_IDLE_TIME
+        )
+        self.acquire_timeout = (
+            acquire_timeout
+            if acquire_timeout is not None
+            else settings.QUERY_RUNNER_POOL_TIMEOUT
+        )
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    def _discard(self, connection):
+        try:
+            self._close(connection)
+        except Exception:
+            logger.debug("Failed closing pooled connection.", exc_info=1)
+
+    def _pop_idle(self):
+        with self._lock:
+            return self._idle.pop() if self._idle else (None, None)
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PoolTimeoutError(
+                "Timed out waiting for one of {} pooled connections.".format(
+                    self.max_size
+                )
+            )
+
+        try:
+            connection, released_at = self._pop_idle()
+            while connection is not None:
+                expired = time.time() - released_at > self.max_idle_time
+                if not expired and self._is_healthy(connection):
+                    return connection
+
+                self._discard(connection)
+                connection, released_at = self._pop_idle()
+
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        try:
+            if not discard and self._reset is not None:
+                try:
+                    self._reset(connection)
+                except Exception:
+                    logger.debug("Failed resetting pooled connection.", exc_info=1)
+                    discard = True
+
+            if discard:
+                self._discard(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.time()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, discard=True)
+            raise
+        else:
+            self.release(connection)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for connection, _ in idle:
+            self._discard(connection)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def configuration_key(query_runner):
+    """Returns a key identifying the data source `query_runner` connects to. Any change to
+    the data source's configuration results in a different key (and so, a different pool)."""
+    configuration = query_runner.configuration
+    if hasattr(configuration, "to_dict"):
+        configuration = configuration.to_dict()
+
+    fingerprint = json_dumps([query_runner.type(), configuration], sort_keys=True)
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def get_connection_pool(query_runner, connect, close, **kwargs):
+    """Returns the pool shared by all runners configured like `query_runner`, or None when
+    connection pooling is disabled for it."""
+    if not query_runner.uses_connection_pool:
+        return None
+
+    key = configuration_key(query_runner)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, close, **kwargs)
+
+        return pool
+
+
+def close_connection_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        pool.close()
+
+
+_credentials = {}
+_credentials_lock = threading.Lock()
+
+
+def get_cached_credentials(key, fetch, expiry_margin=60):
+    """Returns the credentials cached under `key`, calling `fetch` to obtain new ones when
+    there are none or they expire within `expiry_margin` seconds. `fetch` returns a tuple
+    of the credentials and their expiration as a UNIX timestamp."""
+    with _credentials_lock:
+        cached = _credentials.get(key)
+
+    if cached is not None and cached[1] - expiry_margin > time.time():
+        return cached[0]
+
+    credentials, expires_at = fetch()
+
+    with _credentials_lock:
+        _credentials[key] = (credentials, expires_at)
+
+    return credentials
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def get_cached_file(content):
+    """Writes `content` (bytes) to a private temporary file once per process and returns
+    its path. Files are removed when the process exits."""
+    key = hashlib.sha256(content).hexdigest()
+
+    with _files_lock:
+        path = _files.get(key)
+        if path is None or not os.path.exists(path):
+            with NamedTemporaryFile(mode="wb", delete=False) as f:
+                f.write(content)
+            os.chmod(f.name, 0o600)
+            path = _files[key] = f.name
+
+        return path
+
+
+@atexit.register
+def _remove_cached_files():
+    for path in _files.values():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -107,6 +107,13 @@ class Presto(BaseQueryRunner):
 
         try:
             cursor.execute(query)
+            # Each poll waits for the next batch of the statement (and buffers its rows),
+            # returning None once it's finished.
+            status = cursor.poll()
+            while status is not None:
+                self._report_stats(status.get("stats") or {})
+                status = cursor.poll()
+
             column_tuples = [
                 (i[0], PRESTO_TYPES_MAPPING.get(i[1], None)) for i in cursor.description
             ]
@@ -134,5 +141,18 @@ class Presto(BaseQueryRunner):
 
         return json_data, error
 
+    def _report_stats(self, stats):
+        total_splits = stats.get("totalSplits")
+        percent = None
+        if total_splits:
+            percent = 100.0 * stats.get("completedSplits", 0) / total_splits
+
+        self.report_progress(
+            rows_fetched=stats.get("processedRows"),
+            bytes_processed=stats.get("processedBytes"),
+            percent=percent,
+            state=stats.get("state"),
+        )
+
 
 register(Presto)
@@ -41,6 +41,8 @@ TRINO_TYPES_MAPPING = {
 class Trino(BaseQueryRunner):
     noop_query = "SELECT 1"
     should_annotate_query = False
+    # Rows fetched between progress reports
+    PROGRESS_BATCH_SIZE = 1000
 
     @classmethod
     def configuration_schema(cls):
@@ -121,7 +123,16 @@ class Trino(BaseQueryRunner):
 
         try:
             cursor.execute(query)
-            results = cursor.fetchall()
+            # The client fetches the rows page by page, each page updating the statistics
+            # of the query.
+            results = []
+            self._report_stats(cursor.stats or {})
+            rows = cursor.fetchmany(self.PROGRESS_BATCH_SIZE)
+            while rows:
+                results.extend(rows)
+                self._report_stats(cursor.stats or {})
+                rows = cursor.fetchmany(self.PROGRESS_BATCH_SIZE)
+
             description = cursor.description
             columns = self.fetch_columns([
                 (c[0], TRINO_TYPES_MAPPING.get(c[1], None)) for c in description
@@ -150,5 +161,18 @@ class Trino(BaseQueryRunner):
 
         return json_data, error
 
+    def _report_stats(self, stats):
+        total_splits = stats.get("totalSplits")
+        percent = None
+        if total_splits:
+            percent = 100.0 * stats.get("completedSplits", 0) / total_splits
+
+        self.report_progress(
+            rows_fetched=stats.get("processedRows"),
+            bytes_processed=stats.get("processedBytes"),
+            percent=percent,
+            state=stats.get("state"),
+        )
+
 
 register(Trino)
@@ -18,6 +18,7 @@ from redash.models.parameterized_query import ParameterizedQuery
 from .query_result import (
     serialize_query_result,
     serialize_query_result_to_dsv,
+    serialize_query_result_to_json,
     serialize_query_result_to_xlsx,
 )
 
@@ -314,7 +315,7 @@ def serialize_job(job):
         updated_at = 0
 
     status = STATUSES[job_status]
-    result = query_result_id = None
+    query_result_id = None
 
     if job.is_cancelled:
         error = "Query cancelled by user."
@@ -327,15 +328,27 @@ def serialize_job(job):
         status = 4
     else:
         error = ""
-        result = query_result_id = job.result
+        query_result_id = job.result
 
+    # The progress last reported by the query runner, while the query is running
+    progress = job.get_field("progress") if status == 2 else None
+
+    return serialize_job_status(
+        job.id, status, updated_at, error, query_result_id, progress
+    )
+
+
+def serialize_job_status(
+    job_id, status, updated_at=0, error="", query_result_id=None, progress=None
+):
     return {
         "job": {
-            "id": job.id,
+            "id": job_id,
             "updated_at": updated_at,
             "status": status,
             "error": error,
-            "result": result,
+            "result": query_result_id,
             "query_result_id": query_result_id,
+            "progress": progress,
         }
     }
@@ -3,7 +3,7 @@ import csv
 import xlsxwriter
 from funcy import rpartial, project
 from dateutil.parser import isoparse as parse_date
-from redash.utils import json_loads, UnicodeWriter
+from redash.utils import json_dumps, json_loads, UnicodeWriter
 from redash.query_runner import TYPE_BOOLEAN, TYPE_DATE, TYPE_DATETIME
 from redash.authentication.org_resolving import current_org
 
@@ -79,6 +79,27 @@ def serialize_query_result(query_result, is_api_user):
         return query_result.to_dict()
 
 
+def serialize_query_result_to_json(query_result, chunk_size=64 * 1024):
+    """Returns `{"query_result": query_result.to_dict()}` encoded as JSON, as an iterable
+    of bytes chunks. The stored data is already JSON, so it's spliced in as is instead of
+    being decoded and encoded again."""
+    if not hasattr(query_result, "iter_raw_data"):
+        return [json_dumps({"query_result": query_result.to_dict()}).encode("utf-8")]
+
+    envelope = json_dumps(query_result.to_dict(include_data=False))
+    prefix = '{{"query_result": {}, "data": '.format(envelope[:-1])
+    # Everything is read from the result now: the chunks are only consumed once the
+    # response is sent, when the result might be detached from its session.
+    raw_chunks = query_result.iter_raw_data(chunk_size)
+
+    def chunks():
+        yield prefix.encode("utf-8")
+        yield from raw_chunks
+        yield b"}}"
+
+    return chunks()
+
+
 def serialize_query_result_to_dsv(query_result, delimiter):
     s = io.StringIO()
 
@@ -10,6 +10,7 @@ from .helpers import (
     parse_boolean,
     int_or_none,
     set_from_string,
+    int_dict_from_string,
     add_decode_responses_to_redis_url,
     cast_int_or_default
 )
@@ -55,6 +56,75 @@ QUERY_RESULTS_CLEANUP_COUNT = int(
 QUERY_RESULTS_CLEANUP_MAX_AGE = int(
     os.environ.get("REDASH_QUERY_RESULTS_CLEANUP_MAX_AGE", "7")
 )
+# Each run of the clean up job deletes unused results in chunks, for at most the time
+# budget (seconds). Chunks are resized to take about the chunk duration (seconds) each,
+# starting from QUERY_RESULTS_CLEANUP_COUNT results, and the job pauses between chunks
+# when they take much longer than that.
+QUERY_RESULTS_CLEANUP_TIME_BUDGET = float(
+    os.environ.get("REDASH_QUERY_RESULTS_CLEANUP_TIME_BUDGET", "60")
+)
+QUERY_RESULTS_CLEANUP_CHUNK_DURATION = float(
+    os.environ.get("REDASH_QUERY_RESULTS_CLEANUP_CHUNK_DURATION", "1")
+)
+QUERY_RESULTS_CLEANUP_MAX_CHUNK_SIZE = int(
+    os.environ.get("REDASH_QUERY_RESULTS_CLEANUP_MAX_CHUNK_SIZE", "10000")
+)
+
+# Gzipped JSON responses of query results are kept in Redis for this many seconds (0 means
+# responses aren't gzipped by Redash), as long as they're smaller than the max size (bytes).
+QUERY_RESULTS_GZIP_CACHE_TTL = int(
+    os.environ.get("REDASH_QUERY_RESULTS_GZIP_CACHE_TTL", "0")
+)
+QUERY_RESULTS_GZIP_CACHE_MAX_SIZE = int(
+    os.environ.get("REDASH_QUERY_RESULTS_GZIP_CACHE_MAX_SIZE", 10 * 1024 * 1024)
+)
+
+# Decoded query results each process keeps in memory to serve the rows API, up to this
+# (estimated) size in bytes, with up to this many sort orders and filtered columns each.
+QUERY_RESULTS_COLUMNAR_CACHE_MAX_SIZE = int(
+    os.environ.get("REDASH_QUERY_RESULTS_COLUMNAR_CACHE_MAX_SIZE", 256 * 1024 * 1024)
+)
+QUERY_RESULTS_COLUMNAR_CACHE_MAX_ORDERS = int(
+    os.environ.get("REDASH_QUERY_RESULTS_COLUMNAR_CACHE_MAX_ORDERS", "10")
+)
+
+# How long (in seconds) results downsampled for a chart are cached.
+QUERY_RESULTS_DOWNSAMPLING_CACHE_TTL = int(
+    os.environ.get("REDASH_QUERY_RESULTS_DOWNSAMPLING_CACHE_TTL", 60 * 60 * 24)
+)
+
+# Length (in days) of the periods of partitions of partitioned tables (see
+# `redash partitions convert`), and how long events are kept for (0 means forever, only
+# enforced when the events table is partitioned).
+PARTITIONS_INTERVAL_DAYS = int(os.environ.get("REDASH_PARTITIONS_INTERVAL_DAYS", "7"))
+EVENTS_RETENTION_MAX_AGE = int(os.environ.get("REDASH_EVENTS_RETENTION_MAX_AGE", "0"))
+
+# Where to store the data of query results instead of the database: a directory (or
+# file:// URL), or an S3 URL (s3://bucket/prefix). The endpoint URL allows using a
+# service compatible with S3's API. Results already stored in the database stay
+# available after enabling it.
+QUERY_RESULTS_BLOB_STORE = os.environ.get("REDASH_QUERY_RESULTS_BLOB_STORE", "")
+QUERY_RESULTS_BLOB_STORE_S3_ENDPOINT_URL = os.environ.get(
+    "REDASH_QUERY_RESULTS_BLOB_STORE_S3_ENDPOINT_URL"
+)
+# Unreferenced blobs stored (again) less than this many seconds ago aren't deleted, as
+# they might be the data of results not committed yet.
+QUERY_RESULTS_BLOB_DELETION_GRACE_PERIOD = int(
+    os.environ.get("REDASH_QUERY_RESULTS_BLOB_DELETION_GRACE_PERIOD", "3600")
+)
+
+# Results of executions returning the same data as the previous execution of the query
+# reference its data instead of storing it again.
+QUERY_RESULTS_DEDUPLICATION_ENABLED = parse_boolean(
+    os.environ.get("REDASH_QUERY_RESULTS_DEDUPLICATION_ENABLED", "true")
+)
+
+# Compute per column stats (null count, min/max, distinct count, top values) of query
+# results in a background job after they're stored. The job decodes every result again,
+# so otherwise the stats are only computed for the results they're requested for.
+QUERY_RESULTS_COLUMN_STATS_ENABLED = parse_boolean(
+    os.environ.get("REDASH_QUERY_RESULTS_COLUMN_STATS_ENABLED", "false")
+)
 
 SCHEMAS_REFRESH_SCHEDULE = int(os.environ.get("REDASH_SCHEMAS_REFRESH_SCHEDULE", 30))
 
@@ -252,6 +322,50 @@ SCHEDULED_QUERY_TIME_LIMIT = int(
     os.environ.get("REDASH_SCHEDULED_QUERY_TIME_LIMIT", -1)
 )
 
+# Spread the executions of scheduled queries over a window of SCHEDULE_JITTER_FRACTION of
+# their interval (at most SCHEDULE_JITTER_MAX seconds, 0 disables it), so queries with
+# the same schedule (like every hour, or daily at 00:00) don't all run at once.
+SCHEDULE_JITTER_FRACTION = float(
+    os.environ.get("REDASH_SCHEDULE_JITTER_FRACTION", "0.1")
+)
+SCHEDULE_JITTER_MAX = float(os.environ.get("REDASH_SCHEDULE_JITTER_MAX", "0"))
+# Maximum number of scheduled queries of a data source enqueued by each run of
+# `refresh_queries` (every 30 seconds, 0 means no limit). The rest are enqueued by the
+# next runs, longest overdue first.
+SCHEDULED_QUERIES_PER_TICK_LIMIT = int(
+    os.environ.get("REDASH_SCHEDULED_QUERIES_PER_TICK_LIMIT", "0")
+)
+
+# Execute the most popular queries of dashboards (with their most used parameters in the
+# last CACHE_WARMING_LOOKBACK_DAYS days) before each of the peak times (UTC, e.g.
+# "08:00,13:00"), starting CACHE_WARMING_LEAD_TIME seconds before them. At most
+# CACHE_WARMING_DATA_SOURCE_BUDGET queries per data source are executed for each peak,
+# on CACHE_WARMING_QUEUE.
+CACHE_WARMING_ENABLED = parse_boolean(
+    os.environ.get("REDASH_CACHE_WARMING_ENABLED", "false")
+)
+CACHE_WARMING_PEAK_TIMES = array_from_string(
+    os.environ.get("REDASH_CACHE_WARMING_PEAK_TIMES", "08:00")
+)
+CACHE_WARMING_LEAD_TIME = int(os.environ.get("REDASH_CACHE_WARMING_LEAD_TIME", "1800"))
+CACHE_WARMING_LOOKBACK_DAYS = int(
+    os.environ.get("REDASH_CACHE_WARMING_LOOKBACK_DAYS", "7")
+)
+CACHE_WARMING_MAX_QUERIES = int(os.environ.get("REDASH_CACHE_WARMING_MAX_QUERIES", "100"))
+CACHE_WARMING_DATA_SOURCE_BUDGET = int(
+    os.environ.get("REDASH_CACHE_WARMING_DATA_SOURCE_BUDGET", "10")
+)
+CACHE_WARMING_QUEUE = os.environ.get("REDASH_CACHE_WARMING_QUEUE", "warming_queries")
+
+# The system status (/status.json and the admin pages) is collected every
+# STATUS_COLLECTION_INTERVAL seconds and served from Redis. Snapshots older than
+# STATUS_SNAPSHOT_MAX_AGE seconds (e.g. when the scheduler is down) are collected again
+# when requested.
+STATUS_COLLECTION_INTERVAL = int(
+    os.environ.get("REDASH_STATUS_COLLECTION_INTERVAL", "60")
+)
+STATUS_SNAPSHOT_MAX_AGE = int(os.environ.get("REDASH_STATUS_SNAPSHOT_MAX_AGE", "600"))
+
 # Time limit (in seconds) for adhoc queries. Set this to -1 to execute without a time limit.
 ADHOC_QUERY_TIME_LIMIT = int(os.environ.get("REDASH_ADHOC_QUERY_TIME_LIMIT", -1))
 
@@ -260,6 +374,14 @@ JOB_DEFAULT_FAILURE_TTL = int(
     os.environ.get("REDASH_JOB_DEFAULT_FAILURE_TTL", 7 * 24 * 60 * 60)
 )
 
+# How long (in seconds) clients can wait for changes of jobs with a single long polling
+# request of /api/jobs. Each waiting client holds a whole web server worker, so keep it
+# short unless the web server runs gevent workers (0 disables long polling).
+JOB_STATUS_MAX_WAIT = int(os.environ.get("REDASH_JOB_STATUS_MAX_WAIT", "2"))
+# Minimum interval (in seconds) between the progress updates of a running query saved in
+# its job's meta and published to the clients waiting for it.
+QUERY_PROGRESS_INTERVAL = float(os.environ.get("REDASH_QUERY_PROGRESS_INTERVAL", "2"))
+
 LOG_LEVEL = os.environ.get("REDASH_LOG_LEVEL", "INFO")
 LOG_STDOUT = parse_boolean(os.environ.get("REDASH_LOG_STDOUT", "false"))
 LOG_PREFIX = os.environ.get("REDASH_LOG_PREFIX", "")
@@ -276,6 +398,65 @@ RQ_WORKER_JOB_LOG_FORMAT = os.environ.get(
     ),
 )
 
+# Route interactive queries by their runtime history: queries whose 95th percentile
+# runtime is at most QUERY_RUNTIME_FAST_LANE_MAX seconds go to the fast lane queue of
+# their data source's queue (e.g. "queries_fast"), other known queries to the slow lane
+# ("queries_slow"), and queries without history to the queue itself. Only queries of the
+# QUERY_RUNTIME_LANES_QUEUES queues are routed, so workers must listen to both lane
+# queues of each of them (queries of other queues, like custom ones, stay in their queue).
+QUERY_RUNTIME_LANES_ENABLED = parse_boolean(
+    os.environ.get("REDASH_QUERY_RUNTIME_LANES_ENABLED", "false")
+)
+QUERY_RUNTIME_LANES_QUEUES = array_from_string(
+    os.environ.get("REDASH_QUERY_RUNTIME_LANES_QUEUES", "queries")
+)
+QUERY_RUNTIME_FAST_LANE_MAX = float(
+    os.environ.get("REDASH_QUERY_RUNTIME_FAST_LANE_MAX", "10")
+)
+# How many of the latest runtimes of each query are kept, for how long (in seconds), and
+# the weight of the latest one in their moving average.
+QUERY_RUNTIME_HISTORY_SIZE = int(os.environ.get("REDASH_QUERY_RUNTIME_HISTORY_SIZE", "50"))
+QUERY_RUNTIME_HISTORY_TTL = int(
+    os.environ.get("REDASH_QUERY_RUNTIME_HISTORY_TTL", str(30 * 24 * 3600))
+)
+QUERY_RUNTIME_EWMA_ALPHA = float(os.environ.get("REDASH_QUERY_RUNTIME_EWMA_ALPHA", "0.3"))
+
+# Size of the pool of long-lived work horses `rq worker --pooled` forks for every queue.
+# Per queue sizes are set as a comma separated list, e.g. "queries:4,scheduled_queries:2".
+RQ_WORKER_POOL_SIZE = int(os.environ.get("REDASH_RQ_WORKER_POOL_SIZE", 1))
+RQ_WORKER_POOL_SIZES = int_dict_from_string(
+    os.environ.get("REDASH_RQ_WORKER_POOL_SIZES", "")
+)
+
+# Maximum number of queries executing at the same time per data source (0 means no limit).
+# Per data source limits are set as a comma separated list of <data source id>:<limit>.
+# Queries over the limit are deferred for QUERY_DEFERRAL_DELAY seconds.
+DATA_SOURCE_CONCURRENCY_LIMIT = int(
+    os.environ.get("REDASH_DATA_SOURCE_CONCURRENCY_LIMIT", 0)
+)
+DATA_SOURCE_CONCURRENCY_LIMITS = int_dict_from_string(
+    os.environ.get("REDASH_DATA_SOURCE_CONCURRENCY_LIMITS", "")
+)
+# Maximum number of adhoc queries executing at the same time per user (0 means no limit).
+USER_QUERY_CONCURRENCY_LIMIT = int(
+    os.environ.get("REDASH_USER_QUERY_CONCURRENCY_LIMIT", 0)
+)
+QUERY_DEFERRAL_DELAY = int(os.environ.get("REDASH_QUERY_DEFERRAL_DELAY", 5))
+# Workers take the query job whose data source (and then user) has the fewest queries
+# running out of the oldest one and the QUERY_FAIR_DEQUEUE_WINDOW jobs waiting behind it
+# (0 keeps the queues first in, first out). The running queries of each data
+# source are divided by its weight, set as a comma separated list of
+# <data source id>:<weight> (1 by default).
+QUERY_FAIR_DEQUEUE_WINDOW = int(os.environ.get("REDASH_QUERY_FAIR_DEQUEUE_WINDOW", 0))
+DATA_SOURCE_WEIGHTS = int_dict_from_string(
+    os.environ.get("REDASH_DATA_SOURCE_WEIGHTS", "")
+)
+
+# Encode JSON with orjson, when it's installed.
+JSON_FAST_ENCODER_ENABLED = parse_boolean(
+    os.environ.get("REDASH_JSON_FAST_ENCODER_ENABLED", "true")
+)
+
 # Mail settings:
 MAIL_SERVER = os.environ.get("REDASH_MAIL_SERVER", "localhost")
 MAIL_PORT = int(os.environ.get("REDASH_MAIL_PORT", 25))
@@ -495,8 +676,27 @@ FEATURE_EXTENDED_ALERT_OPTIONS = parse_boolean(
     os.environ.get("REDASH_FEATURE_EXTENDED_ALERT_OPTIONS", "false")
 )
 
+# Keep query runner connections (and temporary credentials) around between executions.
+# This only pays off when queries are executed by long-lived worker processes, as
+# forked work horses discard their pools when they exit.
+QUERY_RUNNER_CONNECTION_POOLING = parse_boolean(
+    os.environ.get("REDASH_QUERY_RUNNER_CONNECTION_POOLING", "false")
+)
+# Maximum number of connections open at the same time to each data source, per process.
+QUERY_RUNNER_POOL_SIZE = int(os.environ.get("REDASH_QUERY_RUNNER_POOL_SIZE", "5"))
+# Pooled connections idle for longer than this (in seconds) are closed instead of reused.
+QUERY_RUNNER_POOL_MAX_IDLE_TIME = int(
+    os.environ.get("REDASH_QUERY_RUNNER_POOL_MAX_IDLE_TIME", "300")
+)
+# How long (in seconds) to wait for a connection when all of a pool's connections are in use.
+QUERY_RUNNER_POOL_TIMEOUT = int(os.environ.get("REDASH_QUERY_RUNNER_POOL_TIMEOUT", "30"))
+
 # BigQuery
 BIGQUERY_HTTP_TIMEOUT = int(os.environ.get("REDASH_BIGQUERY_HTTP_TIMEOUT", "600"))
+# Rows requested per `getQueryResults` call when a data source uses batched fetch.
+BIGQUERY_RESULTS_PAGE_SIZE = int(
+    os.environ.get("REDASH_BIGQUERY_RESULTS_PAGE_SIZE", "50000")
+)
 
 # Allow Parameters in Embeds
 # WARNING: Deprecated!
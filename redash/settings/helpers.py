@@ -19,6 +19,14 @@ def set_from_string(s):
     return set(array_from_string(s))
 
 
+def int_dict_from_string(s):
+    """Takes a string like "a:1,b:2" and returns the equivalent dict of integers."""
+    return {
+        key.strip(): int(value)
+        for key, value in (item.split(":", 1) for item in array_from_string(s))
+    }
+
+
 def parse_boolean(s):
     """Takes a string and returns the equivalent as a boolean value."""
     s = s.strip().lower()
@@ -1,6 +1,7 @@
 from .general import (
     record_event,
     version_check,
+    collect_status,
     send_mail,
     sync_user_details,
 )
@@ -12,8 +13,11 @@ from .queries import (
     cleanup_query_results,
     empty_schedules,
     remove_ghost_locks,
+    manage_partitions,
+    warm_dashboard_caches,
 )
 from .alerts import check_alerts_for_query
+from .query_results import store_column_stats
 from .failure_report import send_aggregated_errors
 from .worker import Worker, Queue, Job
 from .schedule import rq_scheduler, schedule_periodic_jobs, periodic_job_definitions
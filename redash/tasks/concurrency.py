@@ -0,0 +1,134 @@
+"""
+Redis backed semaphores limiting how many queries execute at the same time against a
+single data source (and, for adhoc queries, on behalf of a single user).
+
+A semaphore is a sorted set of the ids of the jobs holding it, scored by the time their
+hold expires. Expired holds (of work horses that were killed before they could release
+them) are dropped whenever the semaphore is acquired. Semaphores without a limit are
+still held, as their counts of running jobs tell which data sources and users are using
+more than their fair share of the workers.
+"""
+import time
+
+from redash import settings
+
+ACQUIRE_SCRIPT = """
+redis.call("zremrangebyscore", KEYS[1], "-inf", ARGV[1])
+if redis.call("zscore", KEYS[1], ARGV[4]) or tonumber(ARGV[2]) < 0 or
+        redis.call("zcard", KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call("zadd", KEYS[1], ARGV[3], ARGV[4])
+    redis.call("expire", KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+"""
+
+
+class Semaphore(object):
+    """A semaphore held by at most `limit` jobs at the same time (or any number of them
+    when `limit` is None)."""
+
+    def __init__(self, connection, key, limit=None):
+        self.connection = connection
+        self.key = key
+        self.limit = limit
+
+    def acquire(self, token, ttl):
+        now = time.time()
+        limit = -1 if self.limit is None else self.limit
+        return bool(
+            self.connection.eval(
+                ACQUIRE_SCRIPT, 1, self.key, now, limit, now + ttl, token, int(ttl)
+            )
+        )
+
+    def release(self, token):
+        self.connection.zrem(self.key, token)
+
+    def count(self):
+        return self.connection.zcount(self.key, time.time(), "+inf")
+
+
+def data_source_limit(data_source_id):
+    return settings.DATA_SOURCE_CONCURRENCY_LIMITS.get(
+        str(data_source_id), settings.DATA_SOURCE_CONCURRENCY_LIMIT
+    )
+
+
+def data_source_weight(data_source_id):
+    return settings.DATA_SOURCE_WEIGHTS.get(str(data_source_id), 1)
+
+
+def data_source_semaphore(connection, data_source_id):
+    limit = data_source_limit(data_source_id)
+    return Semaphore(
+        connection,
+        "ds:{}:running_jobs".format(data_source_id),
+        limit if limit > 0 else None,
+    )
+
+
+def user_semaphore(connection, job):
+    """Returns the semaphore of the user of `job`, if it's an adhoc query."""
+    user_id = job.meta.get("user_id")
+    if user_id is None or job.meta.get("scheduled"):
+        return None
+
+    limit = settings.USER_QUERY_CONCURRENCY_LIMIT
+    return Semaphore(
+        connection, "user:{}:running_jobs".format(user_id), limit if limit > 0 else None
+    )
+
+
+def job_semaphores(connection, job):
+    """Returns the semaphores `job` has to hold while it executes."""
+    data_source_id = job.meta.get("data_source_id")
+    if data_source_id is None:
+        return []
+
+    semaphores = [data_source_semaphore(connection, data_source_id)]
+    semaphore = user_semaphore(connection, job)
+    if semaphore is not None:
+        semaphores.append(semaphore)
+
+    return semaphores
+
+
+def job_usage(connection, job, counts):
+    """Returns how much of their fair share of the workers the data source of `job` and
+    its user are using: the count of running queries of the data source divided by its
+    weight, then the count of running adhoc queries of the user. Returns None for jobs
+    which aren't queries. `counts` caches the counts of running queries by semaphore."""
+    data_source_id = job.meta.get("data_source_id")
+    if data_source_id is None:
+        return None
+
+    def count(semaphore):
+        if semaphore is None:
+            return 0
+        if semaphore.key not in counts:
+            counts[semaphore.key] = semaphore.count()
+        return counts[semaphore.key]
+
+    return (
+        count(data_source_semaphore(connection, data_source_id))
+        / data_source_weight(data_source_id),
+        count(user_semaphore(connection, job)),
+    )
+
+
+def acquire_semaphores(semaphores, token, ttl):
+    """Acquires all of `semaphores` or none of them."""
+    acquired = []
+    for semaphore in semaphores:
+        if not semaphore.acquire(token, ttl):
+            release_semaphores(acquired, token)
+            return False
+        acquired.append(semaphore)
+
+    return True
+
+
+def release_semaphores(semaphores, token):
+    for semaphore in semaphores:
+        semaphore.release(token)
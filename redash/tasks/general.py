@@ -2,7 +2,7 @@ import requests
 from datetime import datetime
 
 from flask_mail import Message
-from redash import mail, models, settings
+from redash import mail, models, monitor, settings
 from redash.models import users
 from redash.version_check import run_version_check
 from redash.worker import job, get_job_logger
@@ -35,6 +35,11 @@ def version_check():
     run_version_check()
 
 
+def collect_status():
+    monitor.collect_status()
+    monitor.collect_rq_status()
+
+
 @job("default")
 def subscribe(form):
     logger.info(
@@ -0,0 +1,57 @@
+"""
+Status changes of query jobs are published to Redis, so clients waiting for jobs (see
+`JobListResource` and `JobEventsResource`) are notified of them instead of polling.
+"""
+import time
+from contextlib import contextmanager
+
+from redash import redis_connection
+from redash.utils import json_dumps, json_loads
+
+# The statuses returned by `serialize_job`
+QUEUED = 1
+STARTED = 2
+FINISHED = 3
+FAILED = 4
+
+
+def is_done(job):
+    """Whether `job`, as serialized by `serialize_job`, won't change anymore."""
+    return job["job"]["status"] in (FINISHED, FAILED)
+
+
+def _channel(job_id):
+    return "job_status:{}".format(job_id)
+
+
+def publish_job_status(job_id, status, **kwargs):
+    # Imported here, as the serializers depend on the tasks
+    from redash.serializers import serialize_job_status
+
+    redis_connection.publish(
+        _channel(job_id), json_dumps(serialize_job_status(job_id, status, **kwargs))
+    )
+
+
+@contextmanager
+def subscribe(job_ids):
+    pubsub = redis_connection.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(*[_channel(job_id) for job_id in job_ids])
+    try:
+        yield pubsub
+    finally:
+        pubsub.close()
+
+
+def wait_for_status(pubsub, timeout):
+    """Returns the next status published on the channels of `pubsub`, or None if there's
+    none within `timeout` seconds."""
+    deadline = time.time() + timeout
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+
+        message = pubsub.get_message(timeout=remaining)
+        if message is not None:
+            return json_loads(message["data"])
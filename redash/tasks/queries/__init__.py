@@ -4,5 +4,7 @@ from .maintenance import (
     cleanup_query_results,
     empty_schedules,
     remove_ghost_locks,
+    manage_partitions,
 )
 from .execution import execute_query, enqueue_query
+from .cache_warming import warm_dashboard_caches
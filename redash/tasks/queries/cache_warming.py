@@ -0,0 +1,173 @@
+"""
+Warms the results cache of dashboards ahead of their peak usage.
+
+Dashboard widgets execute their queries with the parameters the dashboard is opened
+with, so most of the first loads of the day miss the cache. The executions of the last
+days (the `execute_query` events) tell which parameter values of the queries of
+dashboards are the most used: shortly before each peak time these are executed on a low
+priority queue, so the dashboards loaded then find their results cached.
+"""
+import datetime
+from collections import Counter
+
+from sqlalchemy.orm import joinedload
+
+from redash import models, redis_connection, settings, statsd_client
+from redash.models.parameterized_query import (
+    InvalidParameterError,
+    QueryDetachedFromDataSourceError,
+)
+from redash.utils import gen_query_hash, json_dumps, json_loads, utcnow
+from redash.worker import get_job_logger
+
+from .execution import _job_lock_id, enqueue_query
+from .maintenance import _apply_auto_limit, _should_refresh_query
+
+logger = get_job_logger(__name__)
+
+WARMED_PEAK_KEY = "cache_warming:peak:{}"
+
+
+def upcoming_peak(now):
+    """Returns the peak time (of settings.CACHE_WARMING_PEAK_TIMES) starting within
+    settings.CACHE_WARMING_LEAD_TIME seconds of `now`, if any."""
+    lead_time = datetime.timedelta(seconds=settings.CACHE_WARMING_LEAD_TIME)
+    for peak_time in settings.CACHE_WARMING_PEAK_TIMES:
+        hour, minute = [int(part) for part in peak_time.split(":")]
+        peak = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        # The peak of tomorrow is upcoming when it's early in the day
+        for day in (0, 1):
+            start = peak + datetime.timedelta(days=day)
+            if start - lead_time <= now < start:
+                return start
+    return None
+
+
+def popular_executions(since, limit):
+    """Returns the `limit` most executed (query id, parameters) of the queries of
+    dashboards since `since`, most executed first."""
+    counts = Counter()
+    events = (
+        models.db.session.query(models.Event.additional_properties)
+        .filter(
+            models.Event.action == "execute_query",
+            models.Event.created_at >= since,
+        )
+        .yield_per(1000)
+    )
+    for properties, in events:
+        properties = properties or {}
+        query_id = str(properties.get("query_id") or "")
+        # Adhoc queries can't be executed again
+        if not query_id.isdigit():
+            continue
+
+        parameters = json_dumps(properties.get("parameters") or {}, sort_keys=True)
+        counts[(int(query_id), parameters)] += 1
+
+    dashboard_query_ids = set(
+        query_id
+        for query_id, in models.db.session.query(models.Visualization.query_id)
+        .join(models.Widget, models.Widget.visualization_id == models.Visualization.id)
+        .join(models.Dashboard, models.Dashboard.id == models.Widget.dashboard_id)
+        .filter(
+            models.Dashboard.is_archived.is_(False),
+            models.Visualization.query_id.in_(set(q for q, _ in counts)),
+        )
+        .distinct()
+    )
+
+    return [
+        (query_id, json_loads(parameters))
+        for (query_id, parameters), _ in counts.most_common()
+        if query_id in dashboard_query_ids
+    ][:limit]
+
+
+def _query_text(query, parameters):
+    # The parameters were valid when they were used, but the query might have changed
+    try:
+        parameterized = query.parameterized.apply(parameters)
+    except (InvalidParameterError, QueryDetachedFromDataSourceError):
+        return None
+    if parameterized.missing_params:
+        return None
+
+    return _apply_auto_limit(parameterized.text, query)
+
+
+def warm_dashboard_caches():
+    """Executes the most popular queries of dashboards (with their most popular
+    parameters) once before each peak time, up to
+    settings.CACHE_WARMING_DATA_SOURCE_BUDGET queries per data source."""
+    peak = upcoming_peak(utcnow())
+    if peak is None:
+        return
+
+    # Only once per peak, though this runs several times before it
+    key = WARMED_PEAK_KEY.format(peak.isoformat())
+    if not redis_connection.set(key, 1, nx=True, ex=settings.CACHE_WARMING_LEAD_TIME * 2):
+        return
+
+    since = utcnow() - datetime.timedelta(days=settings.CACHE_WARMING_LOOKBACK_DAYS)
+    executions = popular_executions(since, settings.CACHE_WARMING_MAX_QUERIES)
+    queries = {
+        query.id: query
+        for query in models.Query.query.options(
+            joinedload(models.Query.org), joinedload(models.Query.data_source)
+        ).filter(
+            models.Query.id.in_(set(query_id for query_id, _ in executions)),
+            models.Query.is_archived.is_(False),
+        )
+    }
+    pause_reasons = models.DataSource.pause_reasons(
+        set(query.data_source for query in queries.values() if query.data_source)
+    )
+
+    enqueued = Counter()
+    skipped = 0
+    for query_id, parameters in executions:
+        query = queries.get(query_id)
+        if query is None or not _should_refresh_query(query, pause_reasons):
+            continue
+
+        query_text = _query_text(query, parameters)
+        if query_text is None:
+            continue
+
+        # Already fresh enough, e.g. executed by its schedule
+        if models.QueryResult.get_latest(
+            query.data_source, query_text, settings.CACHE_WARMING_LEAD_TIME
+        ):
+            continue
+
+        # Already being executed, e.g. by a user who opened the dashboard early
+        if redis_connection.exists(
+            _job_lock_id(gen_query_hash(query_text), query.data_source_id)
+        ):
+            continue
+
+        if enqueued[query.data_source_id] >= settings.CACHE_WARMING_DATA_SOURCE_BUDGET:
+            skipped += 1
+            continue
+
+        try:
+            enqueue_query(
+                query_text,
+                query.data_source,
+                query.user_id,
+                metadata={"query_id": query.id, "Username": "Cache Warming"},
+                queue_name=settings.CACHE_WARMING_QUEUE,
+            )
+            enqueued[query.data_source_id] += 1
+        except Exception:
+            logger.exception("Could not warm the cache of query %d.", query.id)
+
+    statsd_client.incr("cache_warming.enqueued", sum(enqueued.values()))
+    statsd_client.incr("cache_warming.over_budget", skipped)
+    logger.info(
+        "Warmed the cache of %d queries before %s (%d over budget).",
+        sum(enqueued.values()),
+        peak,
+        skipped,
+    )
@@ -7,12 +7,16 @@ from rq.job import JobStatus
 from rq.timeouts import JobTimeoutException
 from rq.exceptions import NoSuchJobError
 
-from redash import models, redis_connection, settings
+from redash import models, redis_connection, settings, statsd_client
 from redash.query_runner import InterruptException
 from redash.tasks.worker import Queue, Job
 from redash.tasks.alerts import check_alerts_for_query
+from redash.tasks.job_status import FAILED, FINISHED, QUEUED, STARTED, publish_job_status
+from redash.tasks.query_results import store_column_stats
+from redash.tasks.queries import runtimes
 from redash.tasks.failure_report import track_failure
-from redash.utils import gen_query_hash, json_dumps, utcnow
+from redash.utils import gen_query_hash, incremental, json_dumps, json_loads, utcnow
+from redash.utils.timing import StageTimer
 from redash.worker import get_job_logger
 
 logger = get_job_logger(__name__)
@@ -28,7 +32,13 @@ def _unlock(query_hash, data_source_id):
 
 
 def enqueue_query(
-    query, data_source, user_id, is_api_key=False, scheduled_query=None, metadata={}
+    query,
+    data_source,
+    user_id,
+    is_api_key=False,
+    scheduled_query=None,
+    metadata={},
+    queue_name=None,
 ):
     query_hash = gen_query_hash(query)
     logger.info("Inserting job for %s with metadata=%s", query_hash, metadata)
@@ -68,23 +78,45 @@ def enqueue_query(
                     logger.info("[%s] %s, removing lock", query_hash, message)
                     redis_connection.delete(_job_lock_id(query_hash, data_source.id))
                     job = None
+                elif (
+                    queue_name is None
+                    and scheduled_query is None
+                    and job.origin == settings.CACHE_WARMING_QUEUE
+                    and Queue(job.origin, connection=job.connection).remove(job)
+                ):
+                    # Interactive queries don't wait for a job of the low priority cache
+                    # warming queue: it's replaced by a new one, unless it has started
+                    # already (and then isn't in the queue anymore).
+                    logger.info("[%s] replacing cache warming job", query_hash)
+                    job.cancel()
+                    job = None
 
             if not job:
                 pipe.multi()
 
-                if scheduled_query:
-                    queue_name = data_source.scheduled_queue_name
-                    scheduled_query_id = scheduled_query.id
+                prediction = None
+                lane = None
+                scheduled_query_id = scheduled_query.id if scheduled_query else None
+                if queue_name:
+                    job_queue_name = queue_name
+                elif scheduled_query:
+                    job_queue_name = data_source.scheduled_queue_name
                 else:
-                    queue_name = data_source.queue_name
-                    scheduled_query_id = None
+                    job_queue_name = data_source.queue_name
+                    if (
+                        settings.QUERY_RUNTIME_LANES_ENABLED
+                        and job_queue_name in settings.QUERY_RUNTIME_LANES_QUEUES
+                    ):
+                        prediction = runtimes.predict_runtime(data_source.id, query_hash)
+                        lane = runtimes.choose_lane(prediction)
+                        job_queue_name = runtimes.lane_queue_name(job_queue_name, lane)
 
                 time_limit = settings.dynamic_settings.query_time_limit(
                     scheduled_query, user_id, data_source.org_id
                 )
-                metadata["Queue"] = queue_name
+                metadata["Queue"] = job_queue_name
 
-                queue = Queue(queue_name)
+                queue = Queue(job_queue_name)
                 enqueue_kwargs = {
                     "user_id": user_id,
                     "scheduled_query_id": scheduled_query_id,
@@ -97,6 +129,8 @@ def enqueue_query(
                         "scheduled": scheduled_query_id is not None,
                         "query_id": metadata.get("query_id"),
                         "user_id": user_id,
+                        "predicted_runtime": prediction[0] if prediction else None,
+                        "lane": lane,
                     },
                 }
 
@@ -108,6 +142,7 @@ def enqueue_query(
                 )
 
                 logger.info("[%s] Created new job: %s", query_hash, job.id)
+                publish_job_status(job.id, QUEUED)
                 pipe.set(
                     _job_lock_id(query_hash, data_source.id),
                     job.id,
@@ -133,6 +168,33 @@ class QueryExecutionError(Exception):
     pass
 
 
+class ProgressReporter(object):
+    """Saves the progress reported by a query runner in its job (see `serialize_job`)
+    and publishes it, at most once per QUERY_PROGRESS_INTERVAL."""
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = (
+            settings.QUERY_PROGRESS_INTERVAL if interval is None else interval
+        )
+        self.reported_at = None
+
+    def __call__(self, progress):
+        now = time.time()
+        if self.reported_at is not None and now - self.reported_at < self.interval:
+            return
+
+        self.reported_at = now
+        progress = dict(progress, updated_at=now)
+        self.job.save_field("progress", progress)
+        publish_job_status(
+            self.job.id,
+            STARTED,
+            updated_at=self.job.started_at or 0,
+            progress=progress,
+        )
+
+
 def _resolve_user(user_id, is_api_key, query_id):
     if user_id is not None:
         if is_api_key:
@@ -154,17 +216,26 @@ class QueryExecutor(object):
         self, query, data_source_id, user_id, is_api_key, metadata, is_scheduled_query
     ):
         self.job = get_current_job()
+        self.timer = StageTimer()
+        if self.job.enqueued_at and self.job.started_at:
+            self.timer.add(
+                "queue_wait",
+                (self.job.started_at - self.job.enqueued_at).total_seconds(),
+            )
         self.query = query
         self.data_source_id = data_source_id
         self.metadata = metadata
-        self.data_source = self._load_data_source()
+        with self.timer.stage("load_data_source"):
+            self.data_source = self._load_data_source()
         self.query_id = metadata.get("query_id")
-        self.user = _resolve_user(user_id, is_api_key, metadata.get("query_id"))
-        self.query_model = (
-            models.Query.query.get(self.query_id)
-            if self.query_id and self.query_id != "adhoc"
-            else None
-        )
+        with self.timer.stage("resolve_user"):
+            self.user = _resolve_user(user_id, is_api_key, metadata.get("query_id"))
+        with self.timer.stage("load_query"):
+            self.query_model = (
+                models.Query.query.get(self.query_id)
+                if self.query_id and self.query_id != "adhoc"
+                else None
+            )
 
         # Close DB connection to prevent holding a connection for a long time while the query is executing.
         models.db.session.close()
@@ -175,17 +246,28 @@ class QueryExecutor(object):
             models.scheduled_queries_executions.update(self.query_model.id)
 
     def run(self):
+        try:
+            return self._run()
+        finally:
+            self._record_timings()
+
+    def _run(self):
         signal.signal(signal.SIGINT, signal_handler)
         started_at = time.time()
 
         logger.debug("Executing query:\n%s", self.query)
         self._log_progress("executing_query")
+        publish_job_status(self.job.id, STARTED, updated_at=self.job.started_at or 0)
 
         query_runner = self.data_source.query_runner
         annotated_query = self._annotate_query(query_runner)
+        query_runner.progress_callback = ProgressReporter(self.job)
+        # The runner times its own stages (like connecting and fetching) within this one
+        query_runner.stage_timer = self.timer
 
         try:
-            data, error = query_runner.run_query(annotated_query, self.user)
+            with self.timer.stage("run_query"):
+                data, error = query_runner.run_query(annotated_query, self.user)
         except Exception as e:
             if isinstance(e, JobTimeoutException):
                 error = TIMEOUT_MESSAGE
@@ -194,6 +276,9 @@ class QueryExecutor(object):
 
             data = None
             logger.warning("Unexpected error while running query:", exc_info=1)
+        finally:
+            query_runner.progress_callback = None
+            query_runner.stage_timer = None
 
         run_time = time.time() - started_at
 
@@ -212,6 +297,7 @@ class QueryExecutor(object):
             if self.is_scheduled_query:
                 self.query_model = models.db.session.merge(self.query_model, load=False)
                 track_failure(self.query_model, error)
+            publish_job_status(self.job.id, FAILED, error=str(error))
             raise result
         else:
             if self.query_model and self.query_model.schedule_failures > 0:
@@ -220,28 +306,85 @@ class QueryExecutor(object):
                 self.query_model.skip_updated_at = True
                 models.db.session.add(self.query_model)
 
-            query_result = models.QueryResult.store_result(
-                self.data_source.org_id,
-                self.data_source,
-                self.query_hash,
-                self.query,
-                data,
-                run_time,
-                utcnow(),
-            )
+            query_hash, query_text = self.query_hash, self.query
+            if "incremental_base_id" in self.metadata and self.query_model:
+                with self.timer.stage("merge_incremental"):
+                    data = self._merge_incremental_result(data)
+                # The text changes with every watermark: the merged result is stored as
+                # a result of the query itself, so it becomes its latest result.
+                query_hash = self.query_model.query_hash
+                query_text = self.query_model.query_text
+
+            with self.timer.stage("store_result"):
+                query_result = models.QueryResult.store_result(
+                    self.data_source.org_id,
+                    self.data_source,
+                    query_hash,
+                    query_text,
+                    data,
+                    run_time,
+                    utcnow(),
+                )
+            # Set before the result is inserted (by the next stage), so the later stages
+            # are only in the meta of the job.
+            query_result.timings = dict(self.timer.durations)
 
-            updated_query_ids = models.Query.update_latest_result(query_result)
+            with self.timer.stage("update_latest_result"):
+                updated_query_ids = models.Query.update_latest_result(query_result)
+            self._record_runtime(query_hash, run_time)
 
-            models.db.session.commit()  # make sure that alert sees the latest query result
+            with self.timer.stage("commit"):
+                models.db.session.commit()  # make sure that alert sees the latest query result
             self._log_progress("checking_alerts")
             for query_id in updated_query_ids:
                 check_alerts_for_query.delay(query_id)
+            # Results with the same data as an earlier one have its stats already
+            if (
+                settings.QUERY_RESULTS_COLUMN_STATS_ENABLED
+                and query_result.data_result_id is None
+            ):
+                store_column_stats.delay(query_result.id)
             self._log_progress("finished")
 
             result = query_result.id
             models.db.session.commit()
+            publish_job_status(self.job.id, FINISHED, query_result_id=result)
             return result
 
+    def _merge_incremental_result(self, data):
+        base_id = self.metadata["incremental_base_id"]
+        base = models.QueryResult.query.get(base_id) if base_id else None
+        if base is None:
+            return data
+
+        options = self.query_model.options.get("incremental") or {}
+        return json_dumps(
+            incremental.merge_results(base.data, json_loads(data), options)
+        )
+
+    def _record_timings(self):
+        """Reports the time spent in each stage of the execution, per data source type
+        and queue, and saves it in the job."""
+        try:
+            for stage, duration in self.timer.durations.items():
+                statsd_client.timing(
+                    "query_execution.{}.{}.{}".format(
+                        stage, self.data_source.type, self.job.origin
+                    ),
+                    duration * 1000,
+                )
+
+            self.job.save_field("timings", self.timer.durations)
+        except Exception:
+            # Like reporting progress, this must never fail the query
+            logger.warning("Failed recording the timings of the query.", exc_info=True)
+
+    def _record_runtime(self, query_hash, run_time):
+        runtimes.record_runtime(self.data_source.id, query_hash, run_time)
+        runtimes.record_prediction_metrics(
+            self.job.meta.get("lane"), self.job.meta.get("predicted_runtime"), run_time
+        )
+
     def _annotate_query(self, query_runner):
         self.metadata["Job ID"] = self.job.id
         self.metadata["Query Hash"] = self.query_hash
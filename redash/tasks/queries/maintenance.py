@@ -1,14 +1,21 @@
+import datetime
 import logging
 import time
+from collections import Counter
 
+from funcy import chunks
 from rq.timeouts import JobTimeoutException
+from sqlalchemy import func
 from redash import models, redis_connection, settings, statsd_client
+from redash.blob_store import get_blob_store
+from redash.models import partitioning
 from redash.models.parameterized_query import (
     InvalidParameterError,
+    ParameterizedQuery,
     QueryDetachedFromDataSourceError,
 )
 from redash.tasks.failure_report import track_failure
-from redash.utils import json_dumps, sentry
+from redash.utils import incremental, json_dumps, sentry, utcnow
 from redash.worker import job, get_job_logger
 from redash.monitor import rq_job_ids
 
@@ -28,7 +35,9 @@ def empty_schedules():
     logger.info("Deleted %d schedules.", len(queries))
 
 
-def _should_refresh_query(query):
+def _should_refresh_query(query, pause_reasons=None):
+    """`pause_reasons` are the pause reasons of data sources returned by
+    `DataSource.pause_reasons`, they're fetched for the query's data source otherwise."""
     if settings.FEATURE_DISABLE_REFRESH_QUERIES:
         logger.info("Disabled refresh queries.")
         return False
@@ -38,23 +47,32 @@ def _should_refresh_query(query):
     elif query.data_source is None:
         logger.debug("Skipping refresh of %s because the datasource is none.", query.id)
         return False
-    elif query.data_source.paused:
+
+    if pause_reasons is None:
+        pause_reasons = models.DataSource.pause_reasons([query.data_source])
+    pause_reason = pause_reasons.get(query.data_source.id)
+    if pause_reason is not None:
         logger.debug(
             "Skipping refresh of %s because datasource - %s is paused (%s).",
             query.id,
             query.data_source.name,
-            query.data_source.pause_reason,
+            pause_reason,
         )
         return False
-    else:
-        return True
+
+    return True
 
 
-def _apply_default_parameters(query):
+def _apply_default_parameters(query, query_text=None):
+    query_text = query.query_text if query_text is None else query_text
     parameters = {p["name"]: p.get("value") for p in query.parameters}
     if any(parameters):
         try:
-            return query.parameterized.apply(parameters).query
+            return (
+                ParameterizedQuery(query_text, query.parameters, query.org)
+                .apply(parameters)
+                .query
+            )
         except InvalidParameterError as e:
             error = u"Skipping refresh of {} because of invalid parameters: {}".format(
                 query.id, str(e)
@@ -69,36 +87,72 @@ def _apply_default_parameters(query):
             track_failure(query, error)
             raise
     else:
+        return query_text
+
+
+def _apply_watermark(query, metadata):
+    """Sets the watermark of incremental queries (see `redash.utils.incremental`) from
+    their latest result, which the new rows are merged into."""
+    options = query.options.get("incremental")
+    if not options:
         return query.query_text
 
+    base = query.latest_query_data
+    value = incremental.watermark(options, base)
+    metadata["incremental_base_id"] = base.id if base else None
+
+    return incremental.apply_watermark(query.query_text, value)
+
 
 class RefreshQueriesError(Exception):
     pass
 
 
-def _apply_auto_limit(query_text, query):
+def _apply_auto_limit(query_text, query, query_runner=None):
     should_apply_auto_limit = query.options.get("apply_auto_limit", False)
-    return query.data_source.query_runner.apply_auto_limit(
-        query_text, should_apply_auto_limit
-    )
+    query_runner = query_runner or query.data_source.query_runner
+    return query_runner.apply_auto_limit(query_text, should_apply_auto_limit)
 
 
 def refresh_queries():
     logger.info("Refreshing queries...")
     enqueued = []
-    for query in models.Query.outdated_queries():
-        if not _should_refresh_query(query):
+    enqueued_per_data_source = Counter()
+    backlog = Counter()
+    limit = settings.SCHEDULED_QUERIES_PER_TICK_LIMIT
+    # The queries come with their orgs and data sources, whose pause flags are fetched
+    # at once and runners created once, so this doesn't take round trips per query.
+    outdated_queries = models.Query.outdated_queries()
+    pause_reasons = models.DataSource.pause_reasons(
+        set(query.data_source for query in outdated_queries if query.data_source)
+    )
+    query_runners = {}
+    for query in outdated_queries:
+        if not _should_refresh_query(query, pause_reasons):
+            continue
+
+        # Still outdated on the next run, which enqueues it before the queries that
+        # became outdated since
+        if limit and enqueued_per_data_source[query.data_source_id] >= limit:
+            backlog[query.data_source_id] += 1
             continue
+        enqueued_per_data_source[query.data_source_id] += 1
 
         try:
-            query_text = _apply_default_parameters(query)
-            query_text = _apply_auto_limit(query_text, query)
+            metadata = {"query_id": query.id, "Username": "Scheduled"}
+            query_text = _apply_watermark(query, metadata)
+            query_text = _apply_default_parameters(query, query_text)
+            if query.data_source_id not in query_runners:
+                query_runners[query.data_source_id] = query.data_source.query_runner
+            query_text = _apply_auto_limit(
+                query_text, query, query_runners[query.data_source_id]
+            )
             enqueue_query(
                 query_text,
                 query.data_source,
                 query.user_id,
                 scheduled_query=query,
-                metadata={"query_id": query.id, "Username": "Scheduled"},
+                metadata=metadata,
             )
             enqueued.append(query)
         except Exception as e:
@@ -107,8 +161,15 @@ def refresh_queries():
             error = RefreshQueriesError(message).with_traceback(e.__traceback__)
             sentry.capture_exception(error)
 
+    statsd_client.gauge("refresh_queries.due_backlog", sum(backlog.values()))
+    for data_source_id, count in backlog.items():
+        statsd_client.gauge(
+            "refresh_queries.due_backlog.data_source_{}".format(data_source_id), count
+        )
+
     status = {
         "outdated_queries_count": len(enqueued),
+        "due_backlog_count": sum(backlog.values()),
         "last_refresh_at": time.time(),
         "query_ids": json_dumps([q.id for q in enqueued]),
     }
@@ -117,49 +178,220 @@ def refresh_queries():
     logger.info("Done refreshing queries: %s" % status)
 
 
+CLEANUP_CURSOR_KEY = "query_results:cleanup:cursor"
+CLEANUP_CHUNK_SIZE_KEY = "query_results:cleanup:chunk_size"
+MIN_CLEANUP_CHUNK_SIZE = 10
+# Counting all the unused results would be as expensive as deleting them
+MAX_CLEANUP_BACKLOG_COUNT = 100000
+
+
+def next_cleanup_chunk_size(chunk_size, duration):
+    """Returns the size of the next chunk of results to delete, so it takes about
+    settings.QUERY_RESULTS_CLEANUP_CHUNK_DURATION. Chunks grow at most twofold at a time."""
+    scale = min(
+        2.0, settings.QUERY_RESULTS_CLEANUP_CHUNK_DURATION / max(duration, 0.001)
+    )
+    return int(
+        max(
+            MIN_CLEANUP_CHUNK_SIZE,
+            min(settings.QUERY_RESULTS_CLEANUP_MAX_CHUNK_SIZE, chunk_size * scale),
+        )
+    )
+
+
+def delete_unused_query_results(after_id, limit):
+    """
+    Deletes the first `limit` unused query results with an id greater than `after_id`.
+    Returns their ids and the keys of their blobs.
+    """
+    unused_ids = (
+        models.QueryResult.unused(settings.QUERY_RESULTS_CLEANUP_MAX_AGE)
+        .filter(models.QueryResult.id > after_id)
+        .order_by(models.QueryResult.id)
+        .limit(limit)
+        .subquery()
+    )
+    unused_query_results = (
+        models.db.session.query(models.QueryResult.id, models.QueryResult.data_blob_key)
+        .filter(models.QueryResult.id.in_(unused_ids))
+        .order_by(models.QueryResult.id)
+        .all()
+    )
+
+    ids = [id for id, _ in unused_query_results]
+    if ids:
+        models.QueryResult.query.filter(models.QueryResult.id.in_(ids)).delete(
+            synchronize_session=False
+        )
+    models.db.session.commit()
+
+    return ids, {key for _, key in unused_query_results if key}
+
+
 def cleanup_query_results():
     """
     Job to cleanup unused query results -- such that no query links to them anymore, and older than
     settings.QUERY_RESULTS_CLEANUP_MAX_AGE (a week by default, so it's less likely to be open in someone's browser and be used).
 
-    Each time the job deletes only settings.QUERY_RESULTS_CLEANUP_COUNT (100 by default) query results so it won't choke
-    the database in case of many such results.
+    Results are deleted in chunks, in the order of their ids, for at most
+    settings.QUERY_RESULTS_CLEANUP_TIME_BUDGET seconds. The next run continues from where this one stopped. Chunks
+    are resized to take about settings.QUERY_RESULTS_CLEANUP_CHUNK_DURATION, and the job pauses when they take much
+    longer, so it deletes as fast as the database allows without choking it.
     """
+    started_at = time.time()
+    after_id = int(redis_connection.get(CLEANUP_CURSOR_KEY) or 0)
+    chunk_size = int(
+        redis_connection.get(CLEANUP_CHUNK_SIZE_KEY)
+        or settings.QUERY_RESULTS_CLEANUP_COUNT
+    )
 
     logger.info(
-        "Running query results clean up (removing maximum of %d unused results, that are %d days old or more)",
-        settings.QUERY_RESULTS_CLEANUP_COUNT,
+        "Running query results clean up (removing unused results, that are %d days old or more, from id %d)",
         settings.QUERY_RESULTS_CLEANUP_MAX_AGE,
+        after_id,
     )
 
-    unused_query_results = models.QueryResult.unused(
-        settings.QUERY_RESULTS_CLEANUP_MAX_AGE
+    deleted_count = 0
+    while time.time() - started_at < settings.QUERY_RESULTS_CLEANUP_TIME_BUDGET:
+        chunk_started_at = time.time()
+        ids, blobs = delete_unused_query_results(after_id, chunk_size)
+        duration = time.time() - chunk_started_at
+
+        deleted_count += len(ids)
+        delete_unreferenced_blobs(blobs)
+
+        if len(ids) < chunk_size:
+            # Went through all the results, the next run starts over
+            after_id = 0
+            break
+
+        after_id = ids[-1]
+        chunk_size = next_cleanup_chunk_size(chunk_size, duration)
+
+        if duration > 2 * settings.QUERY_RESULTS_CLEANUP_CHUNK_DURATION:
+            # The database is slower than usual, give it some slack
+            statsd_client.incr("query_results.cleanup.backoff")
+            remaining = settings.QUERY_RESULTS_CLEANUP_TIME_BUDGET - (
+                time.time() - started_at
+            )
+            time.sleep(max(0, min(duration, remaining)))
+
+    redis_connection.set(CLEANUP_CURSOR_KEY, after_id)
+    redis_connection.set(CLEANUP_CHUNK_SIZE_KEY, chunk_size)
+
+    elapsed = time.time() - started_at
+    backlog = models.db.session.query(func.count()).select_from(
+        models.QueryResult.unused(settings.QUERY_RESULTS_CLEANUP_MAX_AGE)
+        .limit(MAX_CLEANUP_BACKLOG_COUNT)
+        .subquery()
+    ).scalar()
+
+    statsd_client.incr("query_results.cleanup.deleted", deleted_count)
+    statsd_client.gauge("query_results.cleanup.rate", deleted_count / elapsed)
+    statsd_client.gauge("query_results.cleanup.chunk_size", chunk_size)
+    statsd_client.gauge("query_results.cleanup.backlog", backlog)
+    logger.info(
+        "Deleted %d unused query results in %.1fs (%d left, chunks of %d).",
+        deleted_count,
+        elapsed,
+        backlog,
+        chunk_size,
     )
-    deleted_count = models.QueryResult.query.filter(
-        models.QueryResult.id.in_(
-            unused_query_results.limit(settings.QUERY_RESULTS_CLEANUP_COUNT).subquery()
+
+
+def delete_unreferenced_blobs(keys):
+    """
+    Deletes the blobs of `keys` which aren't the data of any query result anymore (blobs
+    are content addressed, so results with the same data share them). Blobs stored within
+    settings.QUERY_RESULTS_BLOB_DELETION_GRACE_PERIOD are kept, as a result referencing
+    them might be about to be committed.
+    """
+    if not keys:
+        return
+
+    referenced = {
+        key
+        for key, in models.db.session.query(models.QueryResult.data_blob_key).filter(
+            models.QueryResult.data_blob_key.in_(keys)
         )
-    ).delete(synchronize_session=False)
-    models.db.session.commit()
-    logger.info("Deleted %d unused query results.", deleted_count)
+    }
 
+    blob_store = get_blob_store()
+    if blob_store is None:
+        logger.warning(
+            "Can't delete %d query results blobs, as no blob store is configured.",
+            len(keys - referenced),
+        )
+        return
 
-def remove_ghost_locks():
+    deleted = 0
+    recent = time.time() - settings.QUERY_RESULTS_BLOB_DELETION_GRACE_PERIOD
+    for key in keys - referenced:
+        modified_at = blob_store.modified_at(key)
+        if modified_at is None or modified_at > recent:
+            continue
+        blob_store.delete(key)
+        deleted += 1
+    logger.info("Deleted %d query results blobs.", deleted)
+
+
+def manage_partitions():
     """
-    Removes query locks that reference a non existing RQ job.
+    Creates the partitions of upcoming periods of partitioned tables, and drops their
+    partitions past the retention (`QUERY_RESULTS_CLEANUP_MAX_AGE` for query results).
     """
-    keys = redis_connection.keys("query_hash_job:*")
-    locks = {k: redis_connection.get(k) for k in keys}
-    jobs = list(rq_job_ids())
+    now = utcnow()
+    interval = datetime.timedelta(days=settings.PARTITIONS_INTERVAL_DAYS)
 
-    count = 0
+    for table in partitioning.PARTITIONED_TABLES:
+        if not partitioning.is_partitioned(table):
+            continue
+
+        created = partitioning.create_partitions(table, now, now + 2 * interval)
+        models.db.session.commit()
+        if created:
+            logger.info("Created partitions %s of %s.", ", ".join(created), table.name)
 
-    for lock, job_id in locks.items():
-        if job_id not in jobs:
-            redis_connection.delete(lock)
-            count += 1
+        if not table.retention:
+            continue
+
+        dropped, blobs = partitioning.drop_partitions(
+            table, now - datetime.timedelta(days=table.retention)
+        )
+        if dropped:
+            logger.info("Dropped partitions %s of %s.", ", ".join(dropped), table.name)
+        delete_unreferenced_blobs(blobs)
 
-    logger.info("Locks found: {}, Locks removed: {}".format(len(locks), count))
+
+GHOST_LOCKS_BATCH_SIZE = 1000
+
+
+def remove_ghost_locks():
+    """
+    Removes query locks that reference a non existing RQ job.
+    """
+    # Locks are read before the jobs, so the jobs of locks added meanwhile are found
+    locks = {}
+    keys = redis_connection.scan_iter(
+        match="query_hash_job:*", count=GHOST_LOCKS_BATCH_SIZE
+    )
+    for batch in chunks(GHOST_LOCKS_BATCH_SIZE, keys):
+        locks.update(zip(batch, redis_connection.mget(batch)))
+    jobs = rq_job_ids()
+
+    ghost_locks = [
+        lock
+        for lock, job_id in locks.items()
+        if job_id is not None and job_id not in jobs
+    ]
+    pipe = redis_connection.pipeline(transaction=False)
+    for batch in chunks(GHOST_LOCKS_BATCH_SIZE, ghost_locks):
+        pipe.delete(*batch)
+    pipe.execute()
+
+    logger.info(
+        "Locks found: {}, Locks removed: {}".format(len(locks), len(ghost_locks))
+    )
 
 
 @job("schemas")
@@ -0,0 +1,113 @@
+"""
+Runtime history of queries, used to predict how long a query will take before it runs.
+
+The runtimes of the latest executions of each query (by data source and query hash) are
+kept in Redis, along with their EWMA and 95th percentile. Interactive queries predicted
+to be fast are queued in a fast lane, and those predicted to be slow in a slow lane, so
+short dashboard queries don't wait behind long extracts. Each lane is a separate queue
+(like `queries_fast` and `queries_slow`), so it gets its own workers (see
+REDASH_RQ_WORKER_POOL_SIZES). Only the queues listed in REDASH_QUERY_RUNTIME_LANES_QUEUES
+are split in lanes, as workers have to listen to the lane queues of each of them.
+"""
+import math
+
+from redash import redis_connection, settings, statsd_client
+
+FAST_LANE = "fast"
+SLOW_LANE = "slow"
+
+
+def _samples_key(data_source_id, query_hash):
+    return "query_runtime:{}:{}:samples".format(data_source_id, query_hash)
+
+
+def _summary_key(data_source_id, query_hash):
+    return "query_runtime:{}:{}".format(data_source_id, query_hash)
+
+
+def ewma(samples, alpha):
+    """Returns the exponentially weighted moving average of `samples`, oldest first."""
+    average = samples[0]
+    for sample in samples[1:]:
+        average = alpha * sample + (1 - alpha) * average
+    return average
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[max(int(math.ceil(fraction * len(ordered))) - 1, 0)]
+
+
+def record_runtime(data_source_id, query_hash, runtime):
+    """Adds `runtime` to the history of the query and updates its summary."""
+    samples_key = _samples_key(data_source_id, query_hash)
+    ttl = settings.QUERY_RUNTIME_HISTORY_TTL
+
+    pipe = redis_connection.pipeline()
+    pipe.lpush(samples_key, runtime)
+    pipe.ltrim(samples_key, 0, settings.QUERY_RUNTIME_HISTORY_SIZE - 1)
+    pipe.expire(samples_key, ttl)
+    pipe.lrange(samples_key, 0, -1)
+    # The newest sample is first
+    samples = [float(sample) for sample in reversed(pipe.execute()[-1])]
+
+    summary = {
+        "ewma": ewma(samples, settings.QUERY_RUNTIME_EWMA_ALPHA),
+        "p95": percentile(samples, 0.95),
+        "count": len(samples),
+    }
+    # Concurrent executions of the same query compute the summary from the same list, so
+    # the last one written is never older than the samples it was computed from.
+    pipe.hmset(_summary_key(data_source_id, query_hash), summary)
+    pipe.expire(_summary_key(data_source_id, query_hash), ttl)
+    pipe.execute()
+
+    return summary
+
+
+def predict_runtime(data_source_id, query_hash):
+    """Returns the (EWMA, p95) of the runtimes of the query, or None when it has no
+    history."""
+    ewma_runtime, p95 = redis_connection.hmget(
+        _summary_key(data_source_id, query_hash), "ewma", "p95"
+    )
+    if ewma_runtime is None or p95 is None:
+        return None
+    return float(ewma_runtime), float(p95)
+
+
+def choose_lane(prediction):
+    """Returns the lane of a query with the `prediction` of `predict_runtime`, or None
+    when it has no history. Queries are only deemed fast when nearly all their
+    executions are, so one which is usually fast but sometimes very slow doesn't hold up
+    the fast lane."""
+    if prediction is None:
+        return None
+
+    _, p95 = prediction
+    if p95 <= settings.QUERY_RUNTIME_FAST_LANE_MAX:
+        return FAST_LANE
+    return SLOW_LANE
+
+
+def lane_queue_name(queue_name, lane):
+    return "{}_{}".format(queue_name, lane) if lane else queue_name
+
+
+def record_prediction_metrics(lane, predicted_runtime, runtime):
+    """Reports the actual runtime of a query next to its predicted one (in milliseconds),
+    to monitor how good the predictions are."""
+    lane = lane or "unknown"
+    statsd_client.timing("query_runtime.actual.{}".format(lane), runtime * 1000)
+    if predicted_runtime is None:
+        return
+
+    statsd_client.timing(
+        "query_runtime.predicted.{}".format(lane), predicted_runtime * 1000
+    )
+    statsd_client.timing(
+        "query_runtime.prediction_error.{}".format(lane),
+        abs(runtime - predicted_runtime) * 1000,
+    )
+    if lane == FAST_LANE and runtime > settings.QUERY_RUNTIME_FAST_LANE_MAX:
+        statsd_client.incr("query_runtime.mispredicted.fast")
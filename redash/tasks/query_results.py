@@ -0,0 +1,20 @@
+from redash import models
+from redash.utils.column_stats import compute_column_stats
+from redash.worker import job, get_job_logger
+
+
+logger = get_job_logger(__name__)
+
+
+@job("default", timeout=600)
+def store_column_stats(query_result_id):
+    query_result = models.QueryResult.query.get(query_result_id)
+    if query_result is None:
+        logger.info("Query result %d was removed before its stats were computed", query_result_id)
+        return
+
+    # Results referencing the data of another one share its stats
+    payload = query_result.payload
+    payload.column_stats = compute_column_stats(payload.data)
+    models.db.session.commit()
+    logger.debug("Stored column stats of query result %d", query_result_id)
@@ -15,8 +15,12 @@ from redash.tasks import (
     empty_schedules,
     refresh_schemas,
     cleanup_query_results,
+    manage_partitions,
+    warm_dashboard_caches,
     version_check,
+    collect_status,
     send_aggregated_errors,
+    execute_query,
     Queue,
 )
 
@@ -77,6 +81,12 @@ def periodic_job_definitions():
             "interval": timedelta(minutes=1),
             "result_ttl": 600,
         },
+        {
+            "func": collect_status,
+            "timeout": 300,
+            "interval": timedelta(seconds=settings.STATUS_COLLECTION_INTERVAL),
+            "result_ttl": 600,
+        },
         {
             "func": send_aggregated_errors,
             "interval": timedelta(minutes=settings.SEND_FAILURE_EMAIL_INTERVAL),
@@ -88,6 +98,18 @@ def periodic_job_definitions():
 
     if settings.QUERY_RESULTS_CLEANUP_ENABLED:
         jobs.append({"func": cleanup_query_results, "interval": timedelta(minutes=5)})
+        jobs.append(
+            {"func": manage_partitions, "timeout": 3600, "interval": timedelta(hours=1)}
+        )
+
+    if settings.CACHE_WARMING_ENABLED:
+        jobs.append(
+            {
+                "func": warm_dashboard_caches,
+                "timeout": 600,
+                "interval": timedelta(minutes=5),
+            }
+        )
 
     # Add your own custom periodic jobs in your dynamic_settings module.
     jobs.extend(settings.dynamic_settings.periodic_jobs() or [])
@@ -102,11 +124,18 @@ def periodic_job_definitions():
 def schedule_periodic_jobs(jobs):
     job_definitions = [prep(job) for job in jobs]
 
-    jobs_to_clean_up = Job.fetch_many(
-        set([job.id for job in rq_scheduler.get_jobs()])
-        - set([job_id(job) for job in job_definitions]),
-        rq_redis_connection,
-    )
+    # Query jobs deferred by the workers wait in the schedule too, until they're queued
+    # again: they aren't periodic jobs to clean up.
+    deferred_func_name = "{}.{}".format(execute_query.__module__, execute_query.__name__)
+    jobs_to_clean_up = [
+        job
+        for job in Job.fetch_many(
+            set([job.id for job in rq_scheduler.get_jobs()])
+            - set([job_id(job) for job in job_definitions]),
+            rq_redis_connection,
+        )
+        if job is not None and job.func_name != deferred_func_name
+    ]
 
     jobs_to_schedule = [
         job for job in job_definitions if job_id(job) not in rq_scheduler
@@ -1,13 +1,28 @@
 import errno
 import os
+import random
 import signal
 import time
-from redash import statsd_client
+from redash import settings, statsd_client
+from redash.models import db
+from redash.utils import json_dumps, json_loads
+from redash.tasks.job_status import FAILED, publish_job_status
+from redash.tasks.concurrency import (
+    acquire_semaphores,
+    job_semaphores,
+    job_usage,
+    release_semaphores,
+)
 from rq import Queue as BaseQueue, get_current_job
 from rq.worker import HerokuWorker # HerokuWorker implements graceful shutdown on SIGTERM
+from rq.worker import SimpleWorker, StopRequested, WorkerStatus
+from rq.defaults import DEFAULT_LOGGING_DATE_FORMAT, DEFAULT_LOGGING_FORMAT
+from rq.exceptions import NoSuchJobError
+from rq.logutils import setup_loghandlers
 from rq.utils import utcnow
 from rq.timeouts import UnixSignalDeathPenalty, HorseMonitorTimeoutException
 from rq.job import Job as BaseJob, JobStatus
+from rq_scheduler import Scheduler
 
 
 class CancellableJob(BaseJob):
@@ -15,12 +30,26 @@ class CancellableJob(BaseJob):
         self.meta["cancelled"] = True
         self.save_meta()
 
+        # Deferred jobs wait in the scheduler until they're queued again
+        self.connection.zrem(Scheduler.scheduled_jobs_key, self.id)
+
         super().cancel(pipeline=pipeline)
+        publish_job_status(self.id, FAILED, error="Query cancelled by user.")
 
     @property
     def is_cancelled(self):
         return self.meta.get("cancelled", False)
 
+    # The work horse keeps what it reports about the job (like the progress of queries)
+    # in fields of the job's hash instead of its meta: saving the meta writes it whole,
+    # overwriting the changes made by the web server meanwhile (like cancelling it).
+    def save_field(self, name, value):
+        self.connection.hset(self.key, name, json_dumps(value))
+
+    def get_field(self, name):
+        value = self.connection.hget(self.key, name)
+        return json_loads(value) if value is not None else None
+
 
 class StatsdRecordingQueue(BaseQueue):
     """
@@ -37,7 +66,57 @@ class CancellableQueue(BaseQueue):
     job_class = CancellableJob
 
 
-class RedashQueue(StatsdRecordingQueue, CancellableQueue):
+class FairDequeueingQueue(BaseQueue):
+    """
+    RQ Queue Mixin that dequeues query jobs fairly across data sources and users: out of
+    the dequeued job and the first `settings.QUERY_FAIR_DEQUEUE_WINDOW` jobs waiting
+    behind it, workers take the one whose data source (weighted by `settings.DATA_SOURCE_WEIGHTS`), and then user,
+    has the fewest queries running. The oldest one wins ties, so the queue stays first in,
+    first out as long as no data source or user is using more than its share.
+    """
+
+    @classmethod
+    def dequeue_any(cls, queues, timeout, connection=None, job_class=None):
+        result = super().dequeue_any(
+            queues, timeout, connection=connection, job_class=job_class
+        )
+        if result is None or settings.QUERY_FAIR_DEQUEUE_WINDOW <= 0:
+            return result
+
+        job, queue = result
+        return queue.fairest_job(job), queue
+
+    def fairest_job(self, job):
+        """Returns the job to execute instead of `job`, which was just dequeued. If it's
+        another waiting job, that one is taken out of the queue and `job` is put back at
+        its front."""
+        counts = {}
+        usage = job_usage(self.connection, job, counts)
+        if usage is None:
+            return job
+
+        waiting_jobs = self.job_class.fetch_many(
+            self.get_job_ids(0, settings.QUERY_FAIR_DEQUEUE_WINDOW),
+            connection=self.connection,
+        )
+        fairest, fairest_usage = job, usage
+        for waiting_job in waiting_jobs:
+            if waiting_job is None:
+                continue
+            waiting_usage = job_usage(self.connection, waiting_job, counts)
+            if waiting_usage is not None and waiting_usage < fairest_usage:
+                fairest, fairest_usage = waiting_job, waiting_usage
+
+        # Another worker may have taken it meanwhile
+        if fairest is job or not self.remove(fairest):
+            return job
+
+        self.push_job_id(job.id, at_front=True)
+        statsd_client.incr("rq.jobs.reordered.{}".format(self.name))
+        return fairest
+
+
+class RedashQueue(StatsdRecordingQueue, FairDequeueingQueue, CancellableQueue):
     pass
 
 
@@ -59,6 +138,55 @@ class StatsdRecordingWorker(HerokuWorker):
                 statsd_client.incr("rq.jobs.failed.{}".format(queue.name))
 
 
+class ConcurrencyLimitingWorker(HerokuWorker):
+    """
+    RQ Worker Mixin that limits how many queries execute at the same time per data source
+    (and per user, for adhoc queries). Rather than holding on to a worker until a slot
+    frees up, jobs over the limit are deferred: handed to the scheduler, which queues them
+    again after `settings.QUERY_DEFERRAL_DELAY` seconds. This leaves the worker free for
+    the jobs of other data sources and users, so a single slow data source can't occupy
+    every worker of a queue. Which of the waiting jobs are taken first is up to the
+    FairDequeueingQueue.
+    """
+
+    def defer_job(self, job, queue):
+        self.connection.zadd(
+            Scheduler.scheduled_jobs_key,
+            {job.id: time.time() + settings.QUERY_DEFERRAL_DELAY},
+        )
+        statsd_client.incr("rq.jobs.deferred.{}".format(queue.name))
+        self.log.info(
+            "Job %s deferred: too many queries are already running for its data source or user.",
+            job.id,
+        )
+
+    def record_wait_time(self, job, queue):
+        wait_time = utcnow() - job.created_at
+        statsd_client.timing(
+            "rq.jobs.wait_time.{}.data_source_{}".format(
+                queue.name, job.meta["data_source_id"]
+            ),
+            wait_time.total_seconds() * 1000,
+        )
+
+    def execute_job(self, job, queue):
+        semaphores = job_semaphores(self.connection, job)
+        time_limit = job.timeout if job.timeout and job.timeout > 0 else None
+        time_limit = time_limit or settings.JOB_EXPIRY_TIME
+
+        if not acquire_semaphores(semaphores, job.id, time_limit + 60):
+            self.defer_job(job, queue)
+            return
+
+        if "data_source_id" in job.meta:
+            self.record_wait_time(job, queue)
+
+        try:
+            super().execute_job(job, queue)
+        finally:
+            release_semaphores(semaphores, job.id)
+
+
 class HardLimitingWorker(HerokuWorker):
     """
     RQ's work horses enforce time limits by setting a timed alarm and stopping jobs
@@ -165,10 +293,242 @@ class HardLimitingWorker(HerokuWorker):
             )
 
 
-class RedashWorker(StatsdRecordingWorker, HardLimitingWorker):
+class RedashWorker(
+    ConcurrencyLimitingWorker, StatsdRecordingWorker, HardLimitingWorker
+):
     queue_class = RedashQueue
 
 
+class LongLivedHorse(ConcurrencyLimitingWorker, StatsdRecordingWorker, SimpleWorker):
+    """
+    A work horse that executes jobs one after the other in its own process, instead of
+    forking a new process per job. Soft time limits are still enforced by the job's timed
+    alarm, while hard time limits and cancellation are enforced by the PreforkingWorker
+    that started it.
+    """
+
+    queue_class = RedashQueue
+    job_class = CancellableJob
+
+    def execute_job(self, job, queue):
+        try:
+            super().execute_job(job, queue)
+        finally:
+            # Jobs run in this process and hold on to whatever they left behind, so make
+            # sure the next job starts with a fresh session and the worker's own SIGINT
+            # handler (QueryExecutor replaces it to get cancelled).
+            db.session.remove()
+            if not self._stop_requested:
+                signal.signal(signal.SIGINT, self.request_stop)
+
+
+class PreforkingWorker(RedashWorker):
+    """
+    Forking a work horse per job (and setting up its database session) is a large share
+    of the latency of short queries. The PreforkingWorker instead forks a pool of
+    long-lived work horses per queue once, after the application has been loaded, and
+    leaves job execution to them.
+
+    The worker itself keeps monitoring its horses the same way HardLimitingWorker
+    monitors its work horse: cancelled jobs get their horse interrupted with SIGINT, and
+    horses still busy with a job after its timeout (+ the grace period) are killed, have
+    their job moved to the FailedJobRegistry and are replaced by a new horse.
+    """
+
+    horse_class = LongLivedHorse
+
+    def __init__(self, queues, pool_sizes=None, default_pool_size=1, **kwargs):
+        super().__init__(queues, **kwargs)
+        self.pool_sizes = pool_sizes or {}
+        self.default_pool_size = default_pool_size
+        self._horses = {}
+        self._spawned_horses = 0
+
+    def pool_size(self, queue_name):
+        return self.pool_sizes.get(queue_name, self.default_pool_size)
+
+    def spawn_horse(self, queue_name):
+        self._spawned_horses += 1
+        horse = self.horse_class(
+            [queue_name],
+            name="{}.{}.{}".format(self.name, queue_name, self._spawned_horses),
+            connection=self.connection,
+            log_job_description=self.log_job_description,
+            job_monitoring_interval=self.job_monitoring_interval,
+            disable_default_exception_handler=self.disable_default_exception_handler,
+        )
+        horse.monitored_job_id = None
+        horse.monitor_started = None
+
+        pid = os.fork()
+        if pid == 0:
+            # Keep terminal signals away from the horses, the worker forwards shutdown
+            # requests to them.
+            os.setpgrp()
+            random.seed()
+            horse.pid = os.getpid()
+            try:
+                horse.work()
+            except BaseException:
+                horse.log.exception("Work horse %s quit unexpectedly.", horse.name)
+                os._exit(1)
+            os._exit(os.EX_OK)
+
+        self._horses[pid] = horse
+        self.log.info("Forked work horse %s (pid %s).", horse.name, pid)
+
+    def kill_horses(self, sig=signal.SIGKILL):
+        for pid in list(self._horses):
+            try:
+                os.kill(pid, sig)
+            except OSError as e:
+                if e.errno != errno.ESRCH:
+                    raise
+
+    def handle_warm_shutdown_request(self):
+        self._stop_requested = True
+        self.log.info("Warm shut down requested, stopping work horses.")
+        self.kill_horses(signal.SIGTERM)
+
+    def request_force_stop(self, signum, frame):
+        self.log.warning("Cold shut down")
+        self._stop_requested = True
+        self.kill_horses()
+        raise SystemExit()
+
+    def stop_executing_job(self, pid, job):
+        os.kill(pid, signal.SIGINT)
+        self.log.warning("Job %s has been cancelled.", job.id)
+
+    def soft_limit_exceeded(self, horse, job):
+        job_has_time_limit = job.timeout != -1
+
+        if job_has_time_limit:
+            seconds_under_monitor = (utcnow() - horse.monitor_started).seconds
+            return seconds_under_monitor > job.timeout + self.grace_period
+        else:
+            return False
+
+    def enforce_hard_limit(self, pid, job):
+        self.log.warning(
+            "Job %s exceeded timeout of %ds (+%ds grace period) but work horse did not terminate it. "
+            "Killing the work horse.",
+            job.id,
+            job.timeout,
+            self.grace_period,
+        )
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+
+    def fetch_job(self, job_id):
+        try:
+            return self.job_class.fetch(job_id, connection=self.connection)
+        except NoSuchJobError:
+            return None
+
+    def retire_horse(self, pid, ret_val):
+        horse = self._horses.pop(pid)
+        job_id = horse.get_current_job_id()
+        job = self.fetch_job(job_id) if job_id else None
+
+        if job is not None and ret_val != os.EX_OK:
+            job_status = job.get_status()
+            if job_status not in [JobStatus.FINISHED, JobStatus.FAILED, None]:
+                if not job.ended_at:
+                    job.ended_at = utcnow()
+
+                self.log.warning(
+                    (
+                        "Moving job to FailedJobRegistry "
+                        "(work-horse terminated unexpectedly; waitpid returned {})"
+                    ).format(ret_val)
+                )
+
+                horse.handle_job_failure(
+                    job,
+                    queue=self.queue_class(
+                        job.origin, connection=self.connection, job_class=self.job_class
+                    ),
+                    exc_string="Work-horse process was terminated unexpectedly "
+                    "(waitpid returned %s)" % ret_val,
+                )
+
+        horse.register_death()
+
+        if not self._stop_requested:
+            self.spawn_horse(horse.queue_names()[0])
+
+    def reap_horses(self, block=False):
+        for pid in list(self._horses):
+            try:
+                retpid, ret_val = os.waitpid(pid, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                retpid, ret_val = pid, 0
+
+            if retpid:
+                self.retire_horse(pid, ret_val)
+
+    def monitor_horses(self):
+        """Makes sure that every horse is still alive and that the jobs they are
+        executing respect their time limits and cancellation."""
+        self.reap_horses()
+
+        for pid, horse in list(self._horses.items()):
+            job_id = horse.get_current_job_id()
+            if job_id != horse.monitored_job_id:
+                horse.monitored_job_id = job_id
+                horse.monitor_started = utcnow()
+
+            job = self.fetch_job(job_id) if job_id else None
+            if job is None:
+                continue
+
+            if job.is_cancelled:
+                self.stop_executing_job(pid, job)
+
+            if self.soft_limit_exceeded(horse, job):
+                self.enforce_hard_limit(pid, job)
+
+    def work(
+        self,
+        burst=False,
+        logging_level="INFO",
+        date_format=DEFAULT_LOGGING_DATE_FORMAT,
+        log_format=DEFAULT_LOGGING_FORMAT,
+        **kwargs
+    ):
+        setup_loghandlers(logging_level, date_format, log_format)
+        self.register_birth()
+        self.log.info("Worker %s: started", self.key)
+        self.set_state(WorkerStatus.STARTED)
+        self._install_signal_handlers()
+
+        # Don't let the horses share the database connections of this process.
+        db.session.remove()
+        db.engine.dispose()
+
+        try:
+            for queue_name in self.queue_names():
+                for _ in range(self.pool_size(queue_name)):
+                    self.spawn_horse(queue_name)
+
+            while not self._stop_requested:
+                self.heartbeat()
+                self.monitor_horses()
+                time.sleep(self.job_monitoring_interval)
+        except StopRequested:
+            pass
+        finally:
+            try:
+                self._stop_requested = True
+                self.reap_horses(block=True)
+            finally:
+                self.register_death()
+
+
 Job = CancellableJob
 Queue = RedashQueue
 Worker = RedashWorker
@@ -3,6 +3,7 @@ import io
 import csv
 import datetime
 import decimal
+import functools
 import hashlib
 import os
 import random
@@ -21,6 +22,13 @@ from sqlalchemy.orm.query import Query
 
 from .human_time import parse_human_time
 
+try:
+    import orjson
+
+    orjson_enabled = True
+except ImportError:
+    orjson_enabled = False
+
 COMMENTS_REGEX = re.compile("/\*.*?\*/")
 WRITER_ENCODING = os.environ.get("REDASH_CSV_WRITER_ENCODING", "utf-8")
 WRITER_ERRORS = os.environ.get("REDASH_CSV_WRITER_ERRORS", "strict")
@@ -109,14 +117,75 @@ def json_loads(data, *args, **kwargs):
     return simplejson.loads(data, *args, **kwargs)
 
 
+def _overrides_encoding(cls):
+    return (
+        cls.encode is not JSONEncoder.encode
+        or cls.iterencode is not JSONEncoder.iterencode
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _fast_encoder_default(cls):
+    """Returns the `default` hook of the JSONEncoder subclass `cls`, adapted for orjson."""
+    encoder = cls()
+    fragments = hasattr(orjson, "Fragment")
+
+    def default(o):
+        # simplejson encodes Decimals as is, without converting them to floats first
+        if fragments and isinstance(o, decimal.Decimal):
+            return orjson.Fragment(str(o)) if o.is_finite() else None
+        return encoder.default(o)
+
+    return default
+
+
+def _fast_json_dumps(data, kwargs):
+    """Encodes `data` with orjson when the requested encoding is one it can reproduce,
+    returning None otherwise."""
+    cls = kwargs.get("cls")
+    indent = kwargs.get("indent")
+    if (
+        not settings.JSON_FAST_ENCODER_ENABLED
+        or set(kwargs) - {"cls", "encoding", "ignore_nan", "sort_keys", "indent"}
+        or not (isinstance(cls, type) and issubclass(cls, JSONEncoder))
+        or _overrides_encoding(cls)
+        or kwargs.get("encoding") is not None
+        or not kwargs.get("ignore_nan")
+        or indent not in (None, 2)
+    ):
+        return None
+
+    # Dates and times are left to the encoder, to keep their formatting.
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if kwargs.get("sort_keys"):
+        option |= orjson.OPT_SORT_KEYS
+    if indent == 2:
+        option |= orjson.OPT_INDENT_2
+
+    try:
+        return orjson.dumps(data, default=_fast_encoder_default(cls), option=option).decode(
+            "utf-8"
+        )
+    except TypeError:
+        # Values orjson can't encode (like integers over 64 bits or namedtuples)
+        return None
+
+
 def json_dumps(data, *args, **kwargs):
     """A custom JSON dumping function which passes all parameters to the
-    simplejson.dumps function."""
+    simplejson.dumps function. When orjson is installed, it's used instead whenever
+    the output it produces is equivalent."""
     kwargs.setdefault("cls", JSONEncoder)
     kwargs.setdefault("encoding", None)
     # Float value nan or inf in Python should be render to None or null in json.
     # Using ignore_nan = False will make Python render nan as NaN, leading to parse error in front-end
     kwargs.setdefault('ignore_nan', True)
+
+    if orjson_enabled and not args:
+        result = _fast_json_dumps(data, kwargs)
+        if result is not None:
+            return result
+
     return simplejson.dumps(data, *args, **kwargs)
 
 
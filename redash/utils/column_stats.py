@@ -0,0 +1,81 @@
+"""
+Per column summaries of query results: null count, min/max, distinct count and most
+common values. They're small enough to be stored next to each result and let filters and
+parameter dropdowns load without fetching the result itself.
+
+Each column is summarized in one vectorized pass over the hashes of its values: counting
+the occurrences of each distinct hash gives both the distinct count and the most common
+values (two different values having the same 64 bits hash is unlikely enough to be
+ignored).
+"""
+import numpy as np
+
+from redash.utils import json_dumps
+
+TOP_VALUES_COUNT = 10
+
+
+def _hashable(value):
+    if isinstance(value, (dict, list)):
+        return json_dumps(value, sort_keys=True)
+    return value
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _numbers_range(numbers):
+    array = np.array(numbers, dtype=float)
+    if np.isnan(array).all():
+        return None, None
+    # The values themselves, as the array has lost their types (like integers)
+    return numbers[int(np.nanargmin(array))], numbers[int(np.nanargmax(array))]
+
+
+def summarize_column(values):
+    """Returns the summary of a column of a query result, given its `values`."""
+    present = [_hashable(value) for value in values if value is not None]
+    summary = {
+        "null_count": len(values) - len(present),
+        "min": None,
+        "max": None,
+        "distinct_count": 0,
+        "top_values": [],
+    }
+    if not present:
+        return summary
+
+    hashes = np.fromiter(
+        (hash(value) for value in present), dtype=np.int64, count=len(present)
+    )
+    _, first_indices, counts = np.unique(hashes, return_index=True, return_counts=True)
+    # The most common first, then the first to appear
+    top = np.lexsort((first_indices, -counts))[:TOP_VALUES_COUNT]
+    summary["distinct_count"] = len(counts)
+    summary["top_values"] = [[present[first_indices[i]], int(counts[i])] for i in top]
+
+    # Mixed columns report the range of their numbers
+    numbers = [value for value in present if _is_number(value)]
+    if numbers:
+        summary["min"], summary["max"] = _numbers_range(numbers)
+    else:
+        strings = [value for value in present if isinstance(value, str)]
+        if strings:
+            summary["min"], summary["max"] = min(strings), max(strings)
+
+    return summary
+
+
+def compute_column_stats(data):
+    """Returns the summaries of the columns of a query result's `data`."""
+    data = data or {}
+    names = [column["name"] for column in data.get("columns") or []]
+    rows = data.get("rows") or []
+
+    return {
+        "row_count": len(rows),
+        "columns": {
+            name: summarize_column([row.get(name) for row in rows]) for name in names
+        },
+    }
@@ -0,0 +1,142 @@
+"""
+Column oriented, in-memory representation of query results.
+
+Decoding a big result is much slower than paging through it, so results served by the
+rows API are decoded once per process and kept in an LRU cache bounded by their estimated
+size, together with the last orderings computed for them.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+from redash import settings
+
+
+def _sort_key(value):
+    # Same as PostgreSQL: nulls come last in ascending order and first in descending order
+    if value is None:
+        return (2, 0)
+    if isinstance(value, (bool, int, float)):
+        return (0, value)
+    return (1, str(value))
+
+
+def _text(value):
+    return "" if value is None else str(value).lower()
+
+
+def _size(values):
+    # Estimated size in bytes of a list of values: the list and the values themselves
+    return sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+
+
+class ColumnarResult(object):
+    def __init__(self, data):
+        data = data or {}
+        self.columns = data.get("columns") or []
+        self.column_names = [column["name"] for column in self.columns]
+
+        rows = data.get("rows") or []
+        self.row_count = len(rows)
+        self.values = {
+            name: [row.get(name) for row in rows] for name in self.column_names
+        }
+        self._values_size = sum(_size(values) for values in self.values.values())
+
+        self._lock = threading.Lock()
+        self._orders = OrderedDict()
+        self._texts = OrderedDict()
+        self._cached_size = 0
+
+    @property
+    def size(self):
+        """Estimated size in bytes of the values and of the cached orderings."""
+        return self._values_size + self._cached_size
+
+    def _get_cached(self, cache, key):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _set_cached(self, cache, key, value, size):
+        with self._lock:
+            if key in cache:
+                return
+            cache[key] = (value, size)
+            self._cached_size += size
+            while len(cache) > settings.QUERY_RESULTS_COLUMNAR_CACHE_MAX_ORDERS:
+                _, (_, evicted_size) = cache.popitem(last=False)
+                self._cached_size -= evicted_size
+
+    def order(self, sort):
+        """Returns the row indices ordered by `sort`, a tuple of (column name, descending)
+        pairs."""
+        cached = self._get_cached(self._orders, sort)
+        if cached is not None:
+            return cached[0]
+
+        order = list(range(self.row_count))
+        # Python's sort is stable, so sorting by each key from the last one to the first
+        # one sorts by all of them.
+        for name, descending in reversed(sort):
+            values = self.values[name]
+            order.sort(key=lambda i: _sort_key(values[i]), reverse=descending)
+
+        self._set_cached(self._orders, sort, order, _size(order))
+        return order
+
+    def texts(self, name):
+        cached = self._get_cached(self._texts, name)
+        if cached is not None:
+            return cached[0]
+
+        texts = [_text(value) for value in self.values[name]]
+        self._set_cached(self._texts, name, texts, _size(texts))
+        return texts
+
+    def rows(self, offset=0, limit=None, sort=(), filters=()):
+        """Returns the total count of rows matching `filters` and `limit` of them, starting
+        at `offset`. `filters` is a list of (column name, text) pairs matching rows whose
+        value contains the text, case insensitively."""
+        order = self.order(tuple(sort)) if sort else range(self.row_count)
+
+        if filters:
+            texts = [(self.texts(name), text.lower()) for name, text in filters]
+            order = [i for i in order if all(text in t[i] for t, text in texts)]
+
+        end = None if limit is None else offset + limit
+        rows = [
+            {name: self.values[name][i] for name in self.column_names}
+            for i in order[offset:end]
+        ]
+        return len(order), rows
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_columnar_result(query_result):
+    """Returns the ColumnarResult of `query_result`, decoding its data only if it isn't
+    cached already."""
+    with _cache_lock:
+        result = _cache.get(query_result.id)
+        if result is not None:
+            _cache.move_to_end(query_result.id)
+            return result
+
+    result = ColumnarResult(query_result.data)
+
+    with _cache_lock:
+        _cache[query_result.id] = result
+        # The orderings of the cached results are only counted when a result is added,
+        # but each result caches a bounded number of them. Results bigger than the whole
+        # cache aren't kept at all.
+        size = sum(cached.size for cached in _cache.values())
+        while size > settings.QUERY_RESULTS_COLUMNAR_CACHE_MAX_SIZE:
+            _, evicted = _cache.popitem(last=False)
+            size -= evicted.size
+
+    return result
@@ -0,0 +1,128 @@
+"""
+Reduces the points of chart series to what can actually be drawn in a given width.
+
+Lines (and scatter plots) are downsampled with Largest-Triangle-Three-Buckets, which
+keeps the visually significant points, while areas keep the minimum and maximum of each
+bucket so their envelope doesn't change.
+"""
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """Returns the indices of the `threshold` points of (x, y) picked by the
+    Largest-Triangle-Three-Buckets algorithm."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # The first and last points are always kept, the rest is split in buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+
+        # The third point of the triangle is the average of the next bucket
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+
+    return selected
+
+
+def min_max(x, y, threshold):
+    """Returns the indices of the first and last points, and of the minimum and maximum
+    of each of `threshold / 2` buckets."""
+    n = len(x)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, threshold // 2 + 1).astype(int)
+    selected = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            bucket = y[start:end]
+            selected.extend((start + int(bucket.argmin()), start + int(bucket.argmax())))
+
+    return np.unique(selected)
+
+
+ALGORITHMS = {"line": lttb, "scatter": lttb, "area": min_max}
+
+
+def _x_values(values):
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        # ISO 8601 dates, as stored by query runners (without the timezone designator)
+        dates = np.array([v[:23] for v in values], dtype="datetime64[ms]")
+        return dates.astype("int64").astype(float)
+    except (TypeError, ValueError):
+        # Evenly spaced categories
+        return np.arange(len(values), dtype=float)
+
+
+def _y_values(values):
+    return np.array(
+        [v if isinstance(v, (int, float)) else np.nan for v in values], dtype=float
+    )
+
+
+def downsample(result, options, width):
+    """Returns the sorted indices of the rows of `result` (a ColumnarResult) needed to draw
+    the chart described by the visualization `options` in `width` pixels, or None when
+    the chart can't (or doesn't need to) be downsampled."""
+    if result.row_count <= width:
+        return None
+
+    mapping = options.get("columnMapping") or {}
+    x_columns = [c for c, role in mapping.items() if role == "x" and c in result.values]
+    y_columns = [c for c, role in mapping.items() if role == "y" and c in result.values]
+    series_columns = [
+        c for c, role in mapping.items() if role == "series" and c in result.values
+    ]
+    if len(x_columns) != 1 or not y_columns:
+        return None
+
+    series_options = options.get("seriesOptions") or {}
+    global_type = options.get("globalSeriesType", "line")
+    algorithms = {}
+    for column in y_columns:
+        series_type = (series_options.get(column) or {}).get("type") or global_type
+        if series_type not in ALGORITHMS:
+            return None
+        algorithms[column] = ALGORITHMS[series_type]
+
+    x = _x_values(result.values[x_columns[0]])
+    order = np.argsort(x, kind="stable")
+
+    if series_columns:
+        keys = np.array([str(v) for v in result.values[series_columns[0]]])[order]
+        groups = [order[keys == key] for key in np.unique(keys)]
+    else:
+        groups = [order]
+
+    selected = []
+    for column, algorithm in algorithms.items():
+        y = _y_values(result.values[column])
+        for group in groups:
+            group = group[~np.isnan(x[group]) & ~np.isnan(y[group])]
+            selected.append(group[algorithm(x[group], y[group], width)])
+
+    return np.unique(np.concatenate(selected))
@@ -0,0 +1,90 @@
+"""
+Incremental refresh of scheduled queries.
+
+Queries with the `incremental` option only fetch the rows added since their previous
+result: their text uses the `{{ _last_watermark }}` parameter, which the scheduler sets
+to the greatest value of the watermark column in the previous result. The rows returned
+are then merged into the previous result, either appended or, when the option has key
+columns, replacing the rows with the same keys.
+
+The option is a dictionary of:
+
+- `watermark_column`: the column whose greatest value is the watermark.
+- `key_columns`: the columns identifying rows, to update rows instead of appending them.
+- `initial_watermark`: the watermark when there's no previous result ("1970-01-01").
+- `max_rows`: the number of (latest) rows to keep, 0 meaning all of them.
+
+Watermarks other than numbers (like text and dates) are written as the content of a SQL
+string literal, with their single quotes doubled, so the parameter has to be quoted in
+the query: `WHERE ts > '{{ _last_watermark }}'`.
+"""
+import re
+
+WATERMARK_PARAMETER = "_last_watermark"
+WATERMARK_RE = re.compile(r"{{\s*" + WATERMARK_PARAMETER + r"\s*}}")
+DEFAULT_INITIAL_WATERMARK = "1970-01-01"
+
+
+def apply_watermark(query_text, watermark):
+    """Replaces the watermark parameter of `query_text`, leaving its other parameters to
+    be applied."""
+    if isinstance(watermark, (int, float)):
+        value = str(watermark)
+    else:
+        value = str(watermark).replace("'", "''")
+    return WATERMARK_RE.sub(lambda _: value, query_text)
+
+
+def watermark(options, query_result=None):
+    """Returns the watermark of the next execution of a query with the incremental
+    `options`, whose latest result is `query_result`."""
+    column = options.get("watermark_column")
+    initial = options.get("initial_watermark", DEFAULT_INITIAL_WATERMARK)
+    if query_result is None:
+        return initial
+
+    # The stats are much cheaper than loading the whole result, when they're available.
+    # Results with the same data as an earlier one share its stats (and data).
+    payload = query_result.payload
+    stats = ((payload.column_stats or {}).get("columns") or {}).get(column)
+    if stats is not None:
+        value = stats.get("max")
+    else:
+        values = [
+            row.get(column)
+            for row in (payload.data or {}).get("rows") or []
+            if row.get(column) is not None
+        ]
+        value = max(values) if values else None
+
+    return initial if value is None else value
+
+
+def merge_results(previous, new, options):
+    """Returns the data of `new` merged into the data of the `previous` result."""
+    if not previous:
+        return new
+
+    columns = list(previous.get("columns") or [])
+    names = set(column["name"] for column in columns)
+    columns.extend(c for c in new.get("columns") or [] if c["name"] not in names)
+
+    new_rows = new.get("rows") or []
+    rows = previous.get("rows") or []
+    key_columns = options.get("key_columns")
+    if key_columns:
+        updated_keys = set(
+            tuple(row.get(column) for column in key_columns) for row in new_rows
+        )
+        rows = [
+            row
+            for row in rows
+            if tuple(row.get(column) for column in key_columns) not in updated_keys
+        ]
+    rows = rows + new_rows
+
+    max_rows = options.get("max_rows")
+    if max_rows:
+        rows = rows[-max_rows:]
+
+    return dict(new, columns=columns, rows=rows)
@@ -0,0 +1,25 @@
+"""
+Timing of the stages of a process, like the execution of a query job.
+"""
+import time
+from contextlib import contextmanager
+
+
+class StageTimer(object):
+    """Adds up the time spent (in seconds) in each stage. Stages can be timed several
+    times (like fetching the rows of a result in batches) and can be nested in
+    others."""
+
+    def __init__(self):
+        self.durations = {}
+
+    @contextmanager
+    def stage(self, name):
+        started_at = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - started_at)
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0) + duration
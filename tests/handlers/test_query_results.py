@@ -1,9 +1,13 @@
+import gzip
+
+from mock import patch
+
 from redash.query_runner import BaseSQLQueryRunner, BaseQueryRunner
-from tests import BaseTestCase
+from tests import BaseTestCase, authenticate_request
 
 from redash.models import db
-from redash.utils import json_dumps
-from redash.handlers.query_results import error_messages
+from redash.utils import json_dumps, json_loads
+from redash.handlers.query_results import error_messages, QueryResultResource
 
 
 class TestQueryResultsCacheHeaders(BaseTestCase):
@@ -23,6 +27,35 @@ class TestQueryResultsCacheHeaders(BaseTestCase):
         rv = self.make_request("get", "/api/queries/{}/results.json".format(query.id))
         self.assertNotIn("Cache-Control", rv.headers)
 
+    def test_returns_not_modified_for_matching_etag(self):
+        query_result = self.factory.create_query_result()
+        query = self.factory.create_query(latest_query_data=query_result)
+        path = "/api/queries/{}/results.json".format(query.id)
+
+        rv = self.make_request("get", path)
+        etag = rv.headers["ETag"]
+
+        authenticate_request(self.client, self.factory.user)
+        rv = self.get_request(path, org=self.factory.org, headers={"If-None-Match": etag})
+        self.assertEqual(304, rv.status_code)
+        self.assertEqual(etag, rv.headers["ETag"])
+        self.assertEqual(b"", rv.data)
+
+    def test_etag_changes_with_result_and_filetype(self):
+        query_result = self.factory.create_query_result()
+        query = self.factory.create_query(latest_query_data=query_result)
+        path = "/api/queries/{}/results.{}"
+
+        json_etag = self.make_request("get", path.format(query.id, "json")).headers["ETag"]
+        csv_etag = self.make_request("get", path.format(query.id, "csv")).headers["ETag"]
+        self.assertNotEqual(json_etag, csv_etag)
+
+        query.latest_query_data = self.factory.create_query_result()
+        db.session.commit()
+
+        new_etag = self.make_request("get", path.format(query.id, "json")).headers["ETag"]
+        self.assertNotEqual(json_etag, new_etag)
+
     def test_returns_404_if_no_cached_result_found(self):
         query = self.factory.create_query(latest_query_data=None)
 
@@ -30,6 +63,197 @@ class TestQueryResultsCacheHeaders(BaseTestCase):
         self.assertEqual(404, rv.status_code)
 
 
+class TestQueryResultsJsonResponse(BaseTestCase):
+    def test_returns_stored_data(self):
+        query_result = self.factory.create_query_result()
+        query = self.factory.create_query(latest_query_data=query_result)
+
+        rv = self.make_request("get", "/api/queries/{}/results.json".format(query.id))
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.json["query_result"]["id"], query_result.id)
+        self.assertEqual(rv.json["query_result"]["data"], query_result.data)
+
+    def test_streams_data_once_the_request_is_done(self):
+        query_result = self.factory.create_query_result()
+        query = self.factory.create_query(latest_query_data=query_result)
+        data = query_result.data
+        path = "/{}/api/queries/{}/results.json".format(self.factory.org.slug, query.id)
+        user_id = self.factory.user.get_id()
+        db.session.commit()
+
+        # The tests' app context keeps the session alive after requests, unlike servers
+        self.app_ctx.pop()
+        try:
+            with self.client.session_transaction() as sess:
+                sess["user_id"] = user_id
+            rv = self.client.get(path)
+            body = rv.json
+        finally:
+            self.app_ctx.push()
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(body["query_result"]["data"], data)
+
+    @patch("redash.settings.QUERY_RESULTS_GZIP_CACHE_TTL", 60)
+    def test_serves_gzipped_response_when_accepted(self):
+        query_result = self.factory.create_query_result()
+
+        with self.app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+            response = QueryResultResource.make_json_response(query_result)
+
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        body = json_loads(gzip.decompress(response.get_data()))
+        self.assertEqual(body["query_result"]["data"], query_result.data)
+
+    @patch("redash.settings.QUERY_RESULTS_GZIP_CACHE_TTL", 60)
+    def test_serves_plain_response_when_gzip_not_accepted(self):
+        query_result = self.factory.create_query_result()
+
+        with self.app.test_request_context():
+            response = QueryResultResource.make_json_response(query_result)
+
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+
+
+class TestQueryResultRowsResource(BaseTestCase):
+    def create_query_result(self):
+        data = {
+            "columns": [{"name": "id", "type": "integer"}, {"name": "name", "type": "string"}],
+            "rows": [{"id": i, "name": "row {}".format(i)} for i in range(50)],
+        }
+        return self.factory.create_query_result(data=json_dumps(data))
+
+    def test_returns_a_page_of_rows(self):
+        query_result = self.create_query_result()
+
+        rv = self.make_request(
+            "get",
+            "/api/query_results/{}/rows?offset=10&limit=5&sort=-id".format(
+                query_result.id
+            ),
+        )
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.json["total"], 50)
+        self.assertEqual([r["id"] for r in rv.json["rows"]], [39, 38, 37, 36, 35])
+
+    def test_filters_rows(self):
+        query_result = self.create_query_result()
+
+        rv = self.make_request(
+            "get", "/api/query_results/{}/rows?filter=name:row%204".format(query_result.id)
+        )
+
+        self.assertEqual(rv.json["total"], 11)
+        self.assertEqual(rv.json["total_rows"], 50)
+
+    def test_rejects_unknown_columns(self):
+        query_result = self.create_query_result()
+
+        rv = self.make_request(
+            "get", "/api/query_results/{}/rows?sort=missing".format(query_result.id)
+        )
+
+        self.assertEqual(rv.status_code, 400)
+
+    def test_has_no_access_to_data_source(self):
+        ds = self.factory.create_data_source(group=self.factory.create_group())
+        query_result = self.factory.create_query_result(data_source=ds)
+
+        rv = self.make_request("get", "/api/query_results/{}/rows".format(query_result.id))
+
+        self.assertEqual(rv.status_code, 403)
+
+
+class TestQueryResultStatsResource(BaseTestCase):
+    def test_returns_stored_stats(self):
+        query_result = self.factory.create_query_result()
+        query_result.column_stats = {"row_count": 1, "columns": {}}
+        db.session.commit()
+
+        rv = self.make_request("get", "/api/query_results/{}/stats".format(query_result.id))
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(
+            rv.json, {"query_result_id": query_result.id, "row_count": 1, "columns": {}}
+        )
+
+    def test_enqueues_job_computing_missing_stats(self):
+        query_result = self.factory.create_query_result()
+        url = "/api/query_results/{}/stats".format(query_result.id)
+
+        with patch("redash.handlers.query_results.store_column_stats") as job:
+            rv = self.make_request("get", url)
+            # Only once, while the job hasn't computed them
+            self.make_request("get", url)
+
+        self.assertEqual(rv.status_code, 202)
+        job.delay.assert_called_once_with(query_result.id)
+        self.assertIsNone(db.session.merge(query_result).column_stats)
+
+    def test_returns_stats_of_the_result_holding_the_data(self):
+        payload = self.factory.create_query_result()
+        payload.column_stats = {"row_count": 1, "columns": {}}
+        query_result = self.factory.create_query_result(data="")
+        query_result.data_result = payload
+        db.session.commit()
+
+        rv = self.make_request("get", "/api/query_results/{}/stats".format(query_result.id))
+
+        self.assertEqual(
+            rv.json, {"query_result_id": query_result.id, "row_count": 1, "columns": {}}
+        )
+
+    def test_has_no_access_to_data_source(self):
+        ds = self.factory.create_data_source(group=self.factory.create_group())
+        query_result = self.factory.create_query_result(data_source=ds)
+
+        rv = self.make_request("get", "/api/query_results/{}/stats".format(query_result.id))
+
+        self.assertEqual(rv.status_code, 403)
+
+
+class TestQueryResultDownsampling(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        data = {
+            "columns": [{"name": "x", "type": "integer"}, {"name": "y", "type": "float"}],
+            "rows": [{"x": i, "y": (i * 7) % 13} for i in range(500)],
+        }
+        self.query_result = self.factory.create_query_result(data=json_dumps(data))
+        self.visualization = self.factory.create_visualization(
+            options=json_dumps(
+                {"globalSeriesType": "line", "columnMapping": {"x": "x", "y": "y"}}
+            )
+        )
+
+    def request(self, width):
+        return self.make_request(
+            "get",
+            "/api/query_results/{}.json?visualization_id={}&width={}".format(
+                self.query_result.id, self.visualization.id, width
+            ),
+        )
+
+    def test_downsamples_to_width(self):
+        rv = self.request(50)
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(len(rv.json["query_result"]["data"]["rows"]), 50)
+        self.assertEqual(rv.json["query_result"]["downsampling"]["row_count"], 500)
+
+    def test_returns_all_rows_when_wider_than_result(self):
+        rv = self.request(1000)
+
+        self.assertEqual(len(rv.json["query_result"]["data"]["rows"]), 500)
+        self.assertNotIn("downsampling", rv.json["query_result"])
+
+    def test_rejects_invalid_width(self):
+        self.assertEqual(self.request(0).status_code, 400)
+
+
 class TestQueryResultsContentDispositionHeaders(BaseTestCase):
     def test_supports_unicode(self):
         query_result = self.factory.create_query_result()
@@ -506,4 +730,41 @@ class TestJobResource(BaseTestCase):
 
         job = self.make_request("get", f"/api/jobs/{job_id}").json["job"]
         self.assertEqual(job["status"], FAILED)
-        self.assertTrue("cancelled" in job["error"])
\ No newline at end of file
+        self.assertTrue("cancelled" in job["error"])
+
+
+class TestJobListResource(BaseTestCase):
+    def create_job(self):
+        query = self.factory.create_query()
+        return self.make_request(
+            "post", f"/api/queries/{query.id}/results", data={"parameters": {}},
+        ).json["job"]["id"]
+
+    def test_returns_several_jobs(self):
+        job_id = self.create_job()
+
+        rv = self.make_request("get", f"/api/jobs?ids={job_id},missing")
+
+        self.assertEqual(rv.status_code, 200)
+        jobs = [job["job"] for job in rv.json["jobs"]]
+        self.assertEqual([job["id"] for job in jobs], [job_id, "missing"])
+        self.assertEqual(jobs[0]["status"], 1)
+        self.assertEqual(jobs[1]["status"], 4)
+
+    def test_requires_ids(self):
+        rv = self.make_request("get", "/api/jobs")
+
+        self.assertEqual(rv.status_code, 400)
+
+    def test_waits_for_changes(self):
+        job_id = self.create_job()
+        change = {"job": {"id": job_id, "status": 3, "query_result_id": 1}}
+
+        with patch(
+            "redash.tasks.job_status.wait_for_status", return_value=change
+        ) as wait_for_status:
+            rv = self.make_request("get", f"/api/jobs?ids={job_id}&wait=10")
+
+        # Capped, as each waiting request holds a web server worker
+        self.assertEqual(wait_for_status.call_args[0][1], 2)
+        self.assertEqual(rv.json["jobs"], [change])
@@ -0,0 +1,113 @@
+import datetime
+from unittest import TestCase
+
+import pytz
+from mock import patch
+
+from tests import BaseTestCase
+from redash import models
+from redash.models import partitioning
+from redash.tasks import manage_partitions
+from redash.utils import utcnow
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=pytz.utc)
+
+
+class TestPeriods(TestCase):
+    def test_weekly_periods_start_on_mondays(self):
+        self.assertEqual(partitioning.period_start(utc(2020, 1, 8, 13, 5)), utc(2020, 1, 6))
+        self.assertEqual(partitioning.period_start(utc(2020, 1, 6)), utc(2020, 1, 6))
+
+    @patch("redash.settings.PARTITIONS_INTERVAL_DAYS", 1)
+    def test_daily_periods(self):
+        self.assertEqual(partitioning.period_start(utc(2020, 1, 8, 13, 5)), utc(2020, 1, 8))
+
+    def test_partition_names(self):
+        table = partitioning.get_partitioned_table("events")
+
+        self.assertEqual(table.partition_name(utc(2020, 1, 6)), "events_p20200106")
+        self.assertEqual(table.default_partition, "events_default")
+
+    def test_parse_bound(self):
+        self.assertEqual(
+            partitioning.parse_bound(
+                "FOR VALUES FROM ('2020-01-06 00:00:00+00') TO ('2020-01-13 00:00:00+00')"
+            ),
+            (utc(2020, 1, 6), utc(2020, 1, 13)),
+        )
+        self.assertIsNone(partitioning.parse_bound("DEFAULT"))
+
+    def test_only_known_tables_can_be_partitioned(self):
+        with self.assertRaises(ValueError):
+            partitioning.get_partitioned_table("users")
+
+
+class TestManagePartitions(BaseTestCase):
+    def test_ignores_tables_that_arent_partitioned(self):
+        for table in partitioning.PARTITIONED_TABLES:
+            self.assertFalse(partitioning.is_partitioned(table))
+
+        with patch.object(partitioning, "create_partitions") as create_partitions:
+            manage_partitions()
+
+        create_partitions.assert_not_called()
+
+
+class TestDropPartitions(BaseTestCase):
+    def setUp(self):
+        super(TestDropPartitions, self).setUp()
+        self.table = partitioning.get_partitioned_table("query_results")
+        # In the same weekly partition, past the retention
+        retrieved_at = partitioning.period_start(
+            utcnow() - datetime.timedelta(days=30)
+        ) + datetime.timedelta(hours=1)
+
+        self.payload = self.factory.create_query_result(retrieved_at=retrieved_at)
+        # The latest result of a query, with the same data as the earlier one
+        self.latest = self.factory.create_query_result(
+            retrieved_at=retrieved_at + datetime.timedelta(hours=1), data=""
+        )
+        self.latest.data_result = self.payload
+        self.factory.create_query(latest_query_data=self.latest)
+        self.unused = self.factory.create_query_result(retrieved_at=retrieved_at)
+        self.ids = (self.payload.id, self.latest.id, self.unused.id)
+        self.data = self.payload.data
+        models.db.session.commit()
+
+    def partition(self):
+        version = int(partitioning._execute("SHOW server_version_num").scalar())
+        if version < 110000:
+            self.skipTest("Partitioning requires PostgreSQL 11 or newer.")
+
+        partitioning.convert_table(self.table, log=lambda message: None)
+        # It references the other tables, which are dropped after each test
+        partitioning._execute("DROP TABLE query_results_unpartitioned")
+        models.db.session.commit()
+
+    def assert_retained_dedup_chain(self):
+        models.db.session.expire_all()
+        payload_id, latest_id, unused_id = self.ids
+        latest = models.QueryResult.query.get(latest_id)
+
+        self.assertIsNotNone(models.QueryResult.query.get(payload_id))
+        self.assertEqual(latest.data_result_id, payload_id)
+        self.assertEqual(latest.data, self.data)
+        self.assertIsNone(models.QueryResult.query.get(unused_id))
+
+    def test_retains_results_referenced_in_the_same_partition(self):
+        self.partition()
+        dropped, _ = partitioning.drop_partitions(
+            self.table, utcnow() - datetime.timedelta(days=7)
+        )
+
+        self.assertTrue(dropped)
+        self.assert_retained_dedup_chain()
+
+    @patch("redash.settings.QUERY_RESULTS_CLEANUP_MAX_AGE", 7)
+    def test_manage_partitions_retains_dedup_chains(self):
+        self.partition()
+        manage_partitions()
+
+        self.assert_retained_dedup_chain()
@@ -1,11 +1,14 @@
 import datetime
+import shutil
+import tempfile
 
 from unittest import TestCase
 from tests import BaseTestCase
 from mock import patch
 
 from redash import models
-from redash.models import DBPersistence
+from redash.blob_store import FileSystemBlobStore, content_key
+from redash.models import BlobStorePersistence, DBPersistence
 from redash.utils import utcnow, json_dumps
 
 
@@ -92,6 +95,31 @@ class QueryResultTest(BaseTestCase):
 
         self.assertEqual(original_updated_at, query.updated_at)
 
+    def store_result(self, query, retrieved_at):
+        query_result = models.QueryResult.store_result(
+            query.org_id,
+            query.data_source,
+            query.query_hash,
+            query.query_text,
+            '{"rows": []}',
+            0,
+            retrieved_at,
+        )
+        models.db.session.flush()
+        return query_result
+
+    def test_store_result_references_data_of_previous_result(self):
+        query = self.factory.create_query()
+        previous = self.store_result(query, utcnow() - datetime.timedelta(days=1))
+
+        self.assertEqual(self.store_result(query, utcnow()).data_result, previous)
+
+    def test_store_result_doesnt_reference_data_about_to_be_cleaned_up(self):
+        query = self.factory.create_query()
+        self.store_result(query, utcnow() - datetime.timedelta(days=6, hours=1))
+
+        self.assertIsNone(self.store_result(query, utcnow()).data_result)
+
 
 class TestDBPersistence(TestCase):
     def test_updating_data_removes_cached_result(self):
@@ -110,3 +138,60 @@ class TestDBPersistence(TestCase):
         a = p.data
         b = p.data
         json_loads_patch.assert_called_once_with(json_data)
+
+
+class TestBlobStorePersistence(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = FileSystemBlobStore(self.root)
+        patcher = patch("redash.models.get_blob_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def persistence(self):
+        p = BlobStorePersistence()
+        p._data = None
+        p.data_blob_key = None
+        p.data_size = None
+        return p
+
+    def test_stores_data_in_blob_store(self):
+        p = self.persistence()
+        p.data = '{"test": "é"}'
+
+        encoded = '{"test": "é"}'.encode("utf-8")
+        self.assertEqual(p.data_blob_key, content_key(encoded))
+        self.assertEqual(p.data_size, len(encoded))
+        self.assertEqual(self.store.get(p.data_blob_key), encoded)
+        self.assertDictEqual(p.data, {"test": "é"})
+        self.assertEqual(b"".join(p.iter_raw_data(4)), encoded)
+
+    def test_reads_data_stored_in_the_database(self):
+        p = self.persistence()
+        p._data = '{"test": 1}'
+
+        self.assertDictEqual(p.data, {"test": 1})
+        self.assertEqual(p.raw_data, '{"test": 1}')
+
+    def test_reads_data_of_the_result_it_references(self):
+        payload = self.persistence()
+        payload.data = '{"test": 1}'
+        p = self.persistence()
+        p._data = ""
+        p.data_result = payload
+
+        self.assertEqual(p.raw_data, '{"test": 1}')
+        self.assertDictEqual(p.data, {"test": 1})
+        self.assertEqual(b"".join(p.iter_raw_data(4)), b'{"test": 1}')
+
+    def test_clearing_data(self):
+        p = self.persistence()
+        p.data = '{"test": 1}'
+        p.data = None
+
+        self.assertIsNone(p.data_blob_key)
+        self.assertIsNone(p.data)
+        self.assertEqual(list(p.iter_raw_data(4)), [b"null"])
@@ -0,0 +1,92 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+from redash.query_runner.big_query import (
+    BigQuery,
+    build_row_transformer,
+    transform_row,
+)
+from redash.utils import json_loads
+
+fields = [
+    {"name": "id", "type": "INTEGER"},
+    {"name": "score", "type": "FLOAT"},
+    {"name": "active", "type": "BOOLEAN"},
+    {"name": "created_at", "type": "TIMESTAMP"},
+    {"name": "tags", "type": "STRING", "mode": "REPEATED"},
+    {"name": "name", "type": "STRING"},
+]
+
+
+def make_row(i):
+    return {
+        "f": [
+            {"v": str(i)},
+            {"v": None if i % 2 else "1.5"},
+            {"v": "true" if i % 2 else "false"},
+            {"v": "1.6E9"},
+            {"v": [{"v": "a"}, {"v": "b"}]},
+            {"v": "row %d" % i},
+        ]
+    }
+
+
+class TestBuildRowTransformer(TestCase):
+    def test_matches_transform_row(self):
+        transform = build_row_transformer(fields)
+
+        for i in range(4):
+            row = make_row(i)
+            self.assertEqual(transform(row), transform_row(row, fields))
+
+
+class TestBatchedFetch(TestCase):
+    def setUp(self):
+        self.rows = [make_row(i) for i in range(10)]
+
+        def get_query_results(**kwargs):
+            start = kwargs["startIndex"]
+            page = self.rows[start : start + kwargs["maxResults"]]
+            reply = {
+                "jobComplete": True,
+                "jobReference": {"jobId": "job-1"},
+                "schema": {"fields": fields},
+                "totalRows": str(len(self.rows)),
+                "totalBytesProcessed": "1000",
+            }
+            if page:
+                reply["rows"] = page
+            return Mock(execute=Mock(return_value=reply))
+
+        self.jobs = Mock()
+        self.jobs.insert.return_value.execute.return_value = {
+            "jobReference": {"jobId": "job-1"}
+        }
+        self.jobs.getQueryResults.side_effect = get_query_results
+
+    def run_batched(self, **configuration):
+        runner = BigQuery(
+            dict(projectId="project", jsonKeyFile="", resultPageSize=3, **configuration)
+        )
+        return json_loads(runner._get_query_result_batched(self.jobs, "SELECT 1"))
+
+    def test_fetches_all_pages(self):
+        data = self.run_batched()
+
+        self.assertEqual(len(data["rows"]), 10)
+        self.assertEqual([r["id"] for r in data["rows"]], list(range(10)))
+        self.assertEqual(data["metadata"], {"data_scanned": 1000})
+        self.assertEqual(self.jobs.getQueryResults.call_count, 4)
+
+    def test_row_cap_truncates_result(self):
+        data = self.run_batched(maximumResultRows=5)
+
+        self.assertEqual(len(data["rows"]), 5)
+        self.assertTrue(data["metadata"]["truncated"])
+        self.assertEqual(self.jobs.getQueryResults.call_count, 2)
+
+    def test_row_cap_above_total_rows_does_not_truncate(self):
+        data = self.run_batched(maximumResultRows=10)
+
+        self.assertEqual(len(data["rows"]), 10)
+        self.assertNotIn("truncated", data["metadata"])
@@ -190,3 +190,112 @@ FORMAT JSON""",
 
         if expected_id:
             self.assertEqual(kwargs["params"]["session_id"], session_id)
+
+
+json_compact_response_lines = [
+    b'["id","name","total"]',
+    b'["UInt64","String","Nullable(Float64)"]',
+    b'[18446744073709551615,"first",1.5]',
+    b'["2","second",null]',
+]
+
+
+class TestClickHouseJSONCompactTransport(TestCase):
+    @patch("redash.query_runner.clickhouse._get_session")
+    def test_decodes_streamed_rows(self, get_session):
+        query_runner = ClickHouse(
+            {
+                "url": "http://clickhouse:8123",
+                "dbname": "system",
+                "timeout": 60,
+                "transport": "JSONCompact",
+                "compression": True,
+            }
+        )
+
+        response = Mock()
+        response.status_code = 200
+        response.iter_lines.return_value = iter(json_compact_response_lines)
+        get_session.return_value.post.return_value = response
+
+        data, error = query_runner.run_query("SELECT id, name, total FROM t", None)
+
+        self.assertIsNone(error)
+        self.assertEqual(
+            json.loads(data),
+            {
+                "columns": [
+                    {"name": "id", "friendly_name": "id", "type": TYPE_INTEGER},
+                    {"name": "name", "friendly_name": "name", "type": "string"},
+                    {"name": "total", "friendly_name": "total", "type": "float"},
+                ],
+                "rows": [
+                    {"id": 18446744073709551615, "name": "first", "total": 1.5},
+                    {"id": 2, "name": "second", "total": None},
+                ],
+            },
+        )
+
+        (url,), kwargs = get_session.return_value.post.call_args
+        self.assertEqual(
+            kwargs["data"],
+            b"SELECT id, name, total FROM t\nFORMAT JSONCompactEachRowWithNamesAndTypes",
+        )
+        self.assertTrue(kwargs["stream"])
+        self.assertEqual(kwargs["params"]["enable_http_compression"], "1")
+        self.assertEqual(kwargs["headers"], {"Accept-Encoding": "gzip, deflate"})
+        response.close.assert_called_once()
+
+    @patch("redash.query_runner.clickhouse._get_session")
+    def test_empty_response(self, get_session):
+        query_runner = ClickHouse(
+            {"url": "http://clickhouse:8123", "dbname": "system", "transport": "JSONCompact"}
+        )
+
+        response = Mock()
+        response.status_code = 200
+        response.iter_lines.return_value = iter([])
+        get_session.return_value.post.return_value = response
+
+        data, error = query_runner.run_query("CREATE TEMPORARY TABLE t AS SELECT 1", None)
+
+        self.assertIsNone(error)
+        self.assertEqual(json.loads(data), {"columns": [], "rows": []})
+
+    @patch("redash.query_runner.clickhouse._get_session")
+    def test_keeps_totals_of_with_totals_queries(self, get_session):
+        query_runner = ClickHouse(
+            {"url": "http://clickhouse:8123", "dbname": "system", "transport": "JSONCompact"}
+        )
+
+        response = Mock()
+        response.status_code = 200
+        response.content = json.dumps(
+            {
+                "meta": [
+                    {"name": "name", "type": "String"},
+                    {"name": "count", "type": "UInt64"},
+                    {"name": "average", "type": "Float64"},
+                ],
+                "data": [["first", 2, 1.5], ["second", 1, 3]],
+                "totals": ["", 3, 2],
+            }
+        ).encode()
+        get_session.return_value.post.return_value = response
+
+        query = "SELECT name, count(), avg(x) FROM t GROUP BY name WITH TOTALS"
+        data, error = query_runner.run_query(query, None)
+
+        self.assertIsNone(error)
+        self.assertEqual(
+            json.loads(data)["rows"],
+            [
+                {"name": "first", "count": 2, "average": 1.5},
+                {"name": "second", "count": 1, "average": 3},
+                {"name": "Total", "count": 3, "average": None},
+            ],
+        )
+
+        (url,), kwargs = get_session.return_value.post.call_args
+        self.assertEqual(kwargs["data"], (query + "\nFORMAT JSONCompact").encode())
+        response.close.assert_called_once()
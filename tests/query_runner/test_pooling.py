@@ -0,0 +1,141 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from redash.query_runner import BaseQueryRunner
+from redash.query_runner.pooling import (
+    ConnectionPool,
+    PoolTimeoutError,
+    configuration_key,
+    get_cached_credentials,
+    get_connection_pool,
+)
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    kwargs.setdefault("max_size", 2)
+    kwargs.setdefault("max_idle_time", 300)
+    kwargs.setdefault("acquire_timeout", 0)
+    return ConnectionPool(
+        connect=FakeConnection,
+        close=lambda connection: connection.close(),
+        is_healthy=lambda connection: connection.healthy,
+        **kwargs
+    )
+
+
+class TestConnectionPool(TestCase):
+    def test_reuses_released_connections(self):
+        pool = make_pool()
+
+        connection = pool.acquire()
+        pool.release(connection)
+
+        self.assertIs(pool.acquire(), connection)
+        self.assertFalse(connection.closed)
+
+    def test_discards_unhealthy_connections(self):
+        pool = make_pool()
+
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.healthy = False
+
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertTrue(connection.closed)
+
+    def test_discards_expired_connections(self):
+        pool = make_pool(max_idle_time=-1)
+
+        connection = pool.acquire()
+        pool.release(connection)
+
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertTrue(connection.closed)
+
+    def test_discards_connections_that_fail_to_reset(self):
+        pool = make_pool(reset=Mock(side_effect=Exception("boom")))
+
+        connection = pool.acquire()
+        pool.release(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.idle_count, 0)
+
+    def test_is_bounded(self):
+        pool = make_pool()
+
+        first = pool.acquire()
+        pool.acquire()
+
+        self.assertRaises(PoolTimeoutError, pool.acquire)
+
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+
+    def test_connection_context_discards_on_error(self):
+        pool = make_pool()
+
+        with self.assertRaises(ValueError):
+            with pool.connection() as connection:
+                raise ValueError()
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.idle_count, 0)
+
+
+class TestGetConnectionPool(TestCase):
+    def test_disabled_by_default(self):
+        runner = BaseQueryRunner({"host": "example.com"})
+
+        self.assertIsNone(get_connection_pool(runner, FakeConnection, Mock()))
+
+    @patch("redash.settings.QUERY_RUNNER_CONNECTION_POOLING", True)
+    def test_shares_pools_between_runners_with_same_configuration(self):
+        first = get_connection_pool(
+            BaseQueryRunner({"host": "a.example.com"}), FakeConnection, Mock()
+        )
+        second = get_connection_pool(
+            BaseQueryRunner({"host": "a.example.com"}), FakeConnection, Mock()
+        )
+        other = get_connection_pool(
+            BaseQueryRunner({"host": "b.example.com"}), FakeConnection, Mock()
+        )
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+    @patch("redash.settings.QUERY_RUNNER_CONNECTION_POOLING", True)
+    def test_disabled_for_ssh_tunnels(self):
+        runner = BaseQueryRunner({"host": "example.com"})
+        runner.allow_connection_pooling = False
+
+        self.assertIsNone(get_connection_pool(runner, FakeConnection, Mock()))
+
+
+class TestGetCachedCredentials(TestCase):
+    def test_fetches_again_when_expiring(self):
+        runner = BaseQueryRunner({"user": "test-credentials"})
+        key = configuration_key(runner)
+
+        fetch = Mock(return_value=("secret", 0))
+        get_cached_credentials(key, fetch)
+        get_cached_credentials(key, fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_reuses_valid_credentials(self):
+        runner = BaseQueryRunner({"user": "test-credentials-valid"})
+        key = configuration_key(runner)
+
+        fetch = Mock(return_value=("secret", 2 ** 40))
+        self.assertEqual(get_cached_credentials(key, fetch), "secret")
+        self.assertEqual(get_cached_credentials(key, fetch), "secret")
+        self.assertEqual(fetch.call_count, 1)
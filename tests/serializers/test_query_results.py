@@ -5,8 +5,12 @@ import io
 from tests import BaseTestCase
 
 from redash import models
-from redash.utils import utcnow, json_dumps
-from redash.serializers import serialize_query_result, serialize_query_result_to_dsv
+from redash.utils import utcnow, json_dumps, json_loads
+from redash.serializers import (
+    serialize_query_result,
+    serialize_query_result_to_dsv,
+    serialize_query_result_to_json,
+)
 
 
 data = {
@@ -37,6 +41,40 @@ class QueryResultSerializationTest(BaseTestCase):
         self.assertSetEqual(set(["data", "retrieved_at"]), set(serialized.keys()))
 
 
+class JsonSerializationTest(BaseTestCase):
+    def test_splices_stored_data_into_envelope(self):
+        query_result = self.factory.create_query_result(data=json_dumps(data))
+
+        serialized = b"".join(serialize_query_result_to_json(query_result, chunk_size=10))
+
+        self.assertEqual(
+            json_loads(serialized),
+            json_loads(json_dumps({"query_result": query_result.to_dict()})),
+        )
+
+    def test_reads_data_before_streaming(self):
+        payload = self.factory.create_query_result(data=json_dumps(data))
+        query_result = self.factory.create_query_result(data="")
+        query_result.data_result = payload
+        models.db.session.commit()
+        query_result = models.QueryResult.get_by_id_and_org_without_data(
+            query_result.id, self.factory.org
+        )
+
+        chunks = serialize_query_result_to_json(query_result)
+        # Like once a streamed response's request is done
+        models.db.session.close()
+
+        self.assertEqual(json_loads(b"".join(chunks))["query_result"]["data"], data)
+
+    def test_serializes_missing_data_as_null(self):
+        query_result = self.factory.create_query_result(data=None)
+
+        serialized = b"".join(serialize_query_result_to_json(query_result))
+
+        self.assertIsNone(json_loads(serialized)["query_result"]["data"])
+
+
 class DsvSerializationTest(BaseTestCase):
     def delimited_content(self, delimiter):
         query_result = self.factory.create_query_result(data=json_dumps(data))
@@ -0,0 +1,115 @@
+import datetime
+from unittest import TestCase
+
+import pytz
+from mock import patch
+
+from tests import BaseTestCase
+from redash import models, redis_connection
+from redash.tasks.queries.cache_warming import (
+    popular_executions,
+    upcoming_peak,
+    warm_dashboard_caches,
+)
+from redash.utils import utcnow
+
+ENQUEUE_QUERY = "redash.tasks.queries.cache_warming.enqueue_query"
+
+
+class TestUpcomingPeak(TestCase):
+    def test_returns_peak_within_lead_time(self):
+        now = datetime.datetime(2020, 1, 1, 7, 45, tzinfo=pytz.utc)
+        with patch("redash.settings.CACHE_WARMING_PEAK_TIMES", ["08:00"]):
+            self.assertEqual(upcoming_peak(now), now.replace(hour=8, minute=0))
+            self.assertIsNone(upcoming_peak(now.replace(hour=7, minute=0)))
+            self.assertIsNone(upcoming_peak(now.replace(hour=8, minute=0)))
+
+    def test_returns_peak_of_next_day(self):
+        now = datetime.datetime(2020, 1, 1, 23, 45, tzinfo=pytz.utc)
+        with patch("redash.settings.CACHE_WARMING_PEAK_TIMES", ["00:10"]):
+            self.assertEqual(
+                upcoming_peak(now), datetime.datetime(2020, 1, 2, 0, 10, tzinfo=pytz.utc)
+            )
+
+
+class TestWarmDashboardCaches(BaseTestCase):
+    def record_executions(self, query, parameters, count=1):
+        for _ in range(count):
+            models.db.session.add(
+                models.Event(
+                    org=self.factory.org,
+                    action="execute_query",
+                    object_type="data_source",
+                    object_id=str(query.data_source_id),
+                    additional_properties={
+                        "query_id": str(query.id),
+                        "parameters": parameters,
+                    },
+                    created_at=utcnow(),
+                )
+            )
+        models.db.session.flush()
+
+    def create_dashboard_query(self, **kwargs):
+        query = self.factory.create_query(**kwargs)
+        self.factory.create_widget(
+            visualization=self.factory.create_visualization(query_rel=query)
+        )
+        return query
+
+    def test_returns_popular_executions_of_dashboard_queries(self):
+        query = self.create_dashboard_query()
+        not_on_dashboard = self.factory.create_query()
+        self.record_executions(query, {"a": 1})
+        self.record_executions(query, {"a": 2}, count=3)
+        self.record_executions(not_on_dashboard, {}, count=5)
+
+        executions = popular_executions(utcnow() - datetime.timedelta(days=1), 10)
+
+        self.assertEqual(executions, [(query.id, {"a": 2}), (query.id, {"a": 1})])
+
+    def test_enqueues_popular_queries_within_budget(self):
+        query1 = self.create_dashboard_query(query_text="SELECT 1")
+        query2 = self.create_dashboard_query(query_text="SELECT 2")
+        self.record_executions(query1, {}, count=2)
+        self.record_executions(query2, {})
+        peak = utcnow() + datetime.timedelta(minutes=5)
+
+        with patch(ENQUEUE_QUERY) as enqueue_query, patch(
+            "redash.tasks.queries.cache_warming.upcoming_peak", return_value=peak
+        ), patch("redash.settings.CACHE_WARMING_DATA_SOURCE_BUDGET", 1):
+            warm_dashboard_caches()
+            # Only once per peak
+            warm_dashboard_caches()
+
+        enqueue_query.assert_called_once()
+        self.assertEqual(enqueue_query.call_args[0][0], "SELECT 1")
+        self.assertEqual(enqueue_query.call_args[1]["queue_name"], "warming_queries")
+
+    def test_skips_queries_with_fresh_results(self):
+        query = self.create_dashboard_query()
+        self.record_executions(query, {})
+        self.factory.create_query_result(
+            query_text=query.query_text, query_hash=query.query_hash
+        )
+
+        with patch(ENQUEUE_QUERY) as enqueue_query, patch(
+            "redash.tasks.queries.cache_warming.upcoming_peak", return_value=utcnow()
+        ):
+            warm_dashboard_caches()
+
+        enqueue_query.assert_not_called()
+
+    def test_skips_queries_being_executed(self):
+        query = self.create_dashboard_query()
+        self.record_executions(query, {})
+        redis_connection.set(
+            "query_hash_job:{}:{}".format(query.data_source_id, query.query_hash), "id"
+        )
+
+        with patch(ENQUEUE_QUERY) as enqueue_query, patch(
+            "redash.tasks.queries.cache_warming.upcoming_peak", return_value=utcnow()
+        ):
+            warm_dashboard_caches()
+
+        enqueue_query.assert_not_called()
@@ -0,0 +1,115 @@
+import datetime
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+from tests import BaseTestCase
+
+from redash import models, redis_connection
+from redash.blob_store import FileSystemBlobStore
+from redash.models import db
+from redash.tasks.queries.maintenance import (
+    CLEANUP_CURSOR_KEY,
+    MIN_CLEANUP_CHUNK_SIZE,
+    cleanup_query_results,
+    delete_unreferenced_blobs,
+    delete_unused_query_results,
+    next_cleanup_chunk_size,
+)
+from redash.utils import utcnow
+
+
+class TestDeleteUnreferencedBlobs(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.store = FileSystemBlobStore(self.root)
+        patcher = patch(
+            "redash.tasks.queries.maintenance.get_blob_store", return_value=self.store
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        super().tearDown()
+
+    @patch("redash.settings.QUERY_RESULTS_BLOB_DELETION_GRACE_PERIOD", 0)
+    def test_deletes_only_unreferenced_blobs(self):
+        self.store.put("referenced", b"1")
+        self.store.put("unreferenced", b"2")
+        query_result = self.factory.create_query_result()
+        query_result.data_blob_key = "referenced"
+        db.session.commit()
+
+        delete_unreferenced_blobs({"referenced", "unreferenced"})
+
+        self.assertEqual(self.store.get("referenced"), b"1")
+        with self.assertRaises(FileNotFoundError):
+            self.store.get("unreferenced")
+
+    def test_keeps_recently_stored_blobs(self):
+        self.store.put("unreferenced", b"1")
+
+        delete_unreferenced_blobs({"unreferenced"})
+
+        self.assertEqual(self.store.get("unreferenced"), b"1")
+
+
+class TestCleanupQueryResults(BaseTestCase):
+    def create_unused_query_results(self, count):
+        two_weeks_ago = utcnow() - datetime.timedelta(days=14)
+        return [
+            self.factory.create_query_result(retrieved_at=two_weeks_ago)
+            for _ in range(count)
+        ]
+
+    @patch("redash.settings.QUERY_RESULTS_CLEANUP_COUNT", 2)
+    def test_deletes_unused_results_in_chunks(self):
+        unused = self.create_unused_query_results(5)
+        used = self.create_unused_query_results(1)[0]
+        self.factory.create_query(latest_query_data=used)
+        recent = self.factory.create_query_result()
+        db.session.commit()
+
+        cleanup_query_results()
+
+        remaining = {qr.id for qr in models.QueryResult.query}
+        self.assertEqual(remaining, {used.id, recent.id})
+        self.assertTrue(all(qr.id not in remaining for qr in unused))
+
+    def test_continues_from_where_the_previous_run_stopped(self):
+        unused = self.create_unused_query_results(4)
+        db.session.commit()
+        redis_connection.set(CLEANUP_CURSOR_KEY, unused[1].id)
+
+        cleanup_query_results()
+
+        remaining = [qr.id for qr in models.QueryResult.query.order_by("id")]
+        self.assertEqual(remaining, [unused[0].id, unused[1].id])
+        # The next run starts over
+        self.assertEqual(int(redis_connection.get(CLEANUP_CURSOR_KEY)), 0)
+
+    def test_deletes_chunks_after_cursor(self):
+        unused = self.create_unused_query_results(4)
+        db.session.commit()
+
+        ids, _ = delete_unused_query_results(unused[0].id, 2)
+
+        self.assertEqual(ids, [unused[1].id, unused[2].id])
+        self.assertEqual(models.QueryResult.query.count(), 2)
+
+
+class TestNextCleanupChunkSize(TestCase):
+    @patch("redash.settings.QUERY_RESULTS_CLEANUP_CHUNK_DURATION", 1)
+    def test_scales_chunks_to_target_duration(self):
+        self.assertEqual(next_cleanup_chunk_size(1000, 2), 500)
+        self.assertEqual(next_cleanup_chunk_size(1000, 0.8), 1250)
+
+    @patch("redash.settings.QUERY_RESULTS_CLEANUP_CHUNK_DURATION", 1)
+    @patch("redash.settings.QUERY_RESULTS_CLEANUP_MAX_CHUNK_SIZE", 1500)
+    def test_bounds_chunk_sizes(self):
+        self.assertEqual(next_cleanup_chunk_size(1000, 0), 1500)
+        self.assertEqual(next_cleanup_chunk_size(100, 0), 200)
+        self.assertEqual(next_cleanup_chunk_size(20, 100), MIN_CLEANUP_CHUNK_SIZE)
@@ -1,4 +1,5 @@
 from unittest import TestCase
+import datetime
 import uuid
 
 from mock import patch, Mock
@@ -8,14 +9,16 @@ from rq.exceptions import NoSuchJobError
 
 from tests import BaseTestCase
 from redash import redis_connection, rq_redis_connection, models
-from redash.utils import json_dumps
+from redash.utils import gen_query_hash, json_dumps
 from redash.query_runner.pg import PostgreSQL
 from redash.tasks.queries.execution import (
+    ProgressReporter,
     QueryExecutionError,
     enqueue_query,
     execute_query,
 )
-from redash.tasks import Job
+from redash.tasks.queries.runtimes import predict_runtime, record_runtime
+from redash.tasks import Job, Queue
 
 
 def fetch_job(*args, **kwargs):
@@ -27,6 +30,10 @@ def fetch_job(*args, **kwargs):
     result = Mock()
     result.id = job_id
     result.is_cancelled = False
+    result.meta = {}
+    result.origin = "queries"
+    result.enqueued_at = None
+    result.started_at = None
 
     return result
 
@@ -69,6 +76,56 @@ class TestEnqueueTask(BaseTestCase):
 
         self.assertEqual(1, enqueue.call_count)
 
+    def test_routes_interactive_queries_by_runtime_history(self, enqueue, _):
+        query = self.factory.create_query()
+        query_hash = gen_query_hash(query.query_text)
+        record_runtime(query.data_source.id, query_hash, 1)
+
+        with patch(
+            "redash.tasks.queries.execution.settings.QUERY_RUNTIME_LANES_ENABLED", True
+        ):
+            enqueue_query(query.query_text, query.data_source, query.user_id)
+
+        metadata = enqueue.call_args[0][3]
+        self.assertEqual(metadata["Queue"], "queries_fast")
+        self.assertEqual(enqueue.call_args[1]["meta"]["lane"], "fast")
+        self.assertEqual(enqueue.call_args[1]["meta"]["predicted_runtime"], 1)
+
+    def test_queues_queries_without_history_in_their_queue(self, enqueue, _):
+        query = self.factory.create_query()
+
+        with patch(
+            "redash.tasks.queries.execution.settings.QUERY_RUNTIME_LANES_ENABLED", True
+        ):
+            enqueue_query(query.query_text, query.data_source, query.user_id)
+
+        self.assertEqual(enqueue.call_args[0][3]["Queue"], "queries")
+        self.assertIsNone(enqueue.call_args[1]["meta"]["lane"])
+
+    def test_keeps_queries_of_queues_without_lanes_in_their_queue(self, enqueue, _):
+        query = self.factory.create_query()
+        query.data_source.queue_name = "custom"
+        record_runtime(query.data_source.id, gen_query_hash(query.query_text), 1)
+
+        with patch(
+            "redash.tasks.queries.execution.settings.QUERY_RUNTIME_LANES_ENABLED", True
+        ):
+            enqueue_query(query.query_text, query.data_source, query.user_id)
+
+        self.assertEqual(enqueue.call_args[0][3]["Queue"], "custom")
+        self.assertIsNone(enqueue.call_args[1]["meta"]["lane"])
+
+    def test_doesnt_predict_runtimes_without_lanes(self, enqueue, _):
+        query = self.factory.create_query()
+
+        with patch(
+            "redash.tasks.queries.execution.runtimes.predict_runtime"
+        ) as predict_runtime:
+            enqueue_query(query.query_text, query.data_source, query.user_id)
+
+        predict_runtime.assert_not_called()
+        self.assertIsNone(enqueue.call_args[1]["meta"]["predicted_runtime"])
+
     def test_multiple_enqueue_of_expired_job(self, enqueue, fetch_job):
         query = self.factory.create_query()
 
@@ -177,6 +234,38 @@ class TestEnqueueTask(BaseTestCase):
         self.assertEqual(3, enqueue.call_count)
 
 
+class TestEnqueueOverCacheWarming(BaseTestCase):
+    def enqueue(self, query, **kwargs):
+        with Connection(rq_redis_connection):
+            return enqueue_query(
+                query.query_text,
+                query.data_source,
+                query.user_id,
+                metadata={"query_id": query.id},
+                **kwargs
+            )
+
+    def test_replaces_queued_cache_warming_job(self):
+        query = self.factory.create_query()
+        warming_job = self.enqueue(query, queue_name="warming_queries")
+
+        job = self.enqueue(query)
+
+        self.assertNotEqual(job.id, warming_job.id)
+        self.assertEqual(job.origin, "queries")
+        warming_job = Job.fetch(warming_job.id, connection=rq_redis_connection)
+        self.assertTrue(warming_job.is_cancelled)
+        self.assertEqual(self.enqueue(query).id, job.id)
+
+    def test_waits_for_started_cache_warming_job(self):
+        query = self.factory.create_query()
+        warming_job = self.enqueue(query, queue_name="warming_queries")
+        # Workers take the jobs they start out of their queue
+        Queue("warming_queries", connection=rq_redis_connection).remove(warming_job)
+
+        self.assertEqual(self.enqueue(query).id, warming_job.id)
+
+
 @patch("redash.tasks.queries.execution.get_current_job", side_effect=fetch_job)
 class QueryExecutorTests(BaseTestCase):
     def test_success(self, _):
@@ -191,6 +280,119 @@ class QueryExecutorTests(BaseTestCase):
             result = models.QueryResult.query.get(result_id)
             self.assertEqual(result.data, query_result_data)
 
+    @patch("redash.settings.QUERY_RESULTS_COLUMN_STATS_ENABLED", True)
+    def test_computes_column_stats_in_a_job(self, _):
+        with patch.object(PostgreSQL, "run_query") as qr, patch(
+            "redash.tasks.queries.execution.store_column_stats"
+        ) as store_column_stats:
+            qr.return_value = (json_dumps({"columns": [], "rows": []}), None)
+            result_id = execute_query("SELECT 1, 2", self.factory.data_source.id, {})
+
+            store_column_stats.delay.assert_called_once_with(result_id)
+
+    def test_publishes_status_changes(self, _):
+        with patch.object(PostgreSQL, "run_query") as qr, patch(
+            "redash.tasks.queries.execution.publish_job_status"
+        ) as publish_job_status:
+            qr.return_value = (json_dumps({"columns": [], "rows": []}), None)
+            result_id = execute_query("SELECT 1, 2", self.factory.data_source.id, {})
+
+        statuses = [c[0][1] for c in publish_job_status.call_args_list]
+        self.assertEqual(statuses, [2, 3])
+        self.assertEqual(
+            publish_job_status.call_args[1], {"query_result_id": result_id}
+        )
+
+    def test_saves_reported_progress_in_job(self, get_current_job):
+        def run_query(runner, query, user):
+            runner.report_progress(rows_fetched=10, percent=50.0, state="RUNNING")
+            return json_dumps({"columns": [], "rows": []}), None
+
+        job = Mock(id="job-id", meta={}, started_at=None)
+        get_current_job.side_effect = lambda: job
+        with patch.object(PostgreSQL, "run_query", autospec=True) as qr, patch(
+            "redash.tasks.queries.execution.publish_job_status"
+        ):
+            qr.side_effect = run_query
+            execute_query("SELECT 1, 2", self.factory.data_source.id, {})
+
+        name, progress = job.save_field.call_args_list[0][0]
+        self.assertEqual(name, "progress")
+        self.assertEqual(progress["rows_fetched"], 10)
+        self.assertEqual(progress["percent"], 50.0)
+        self.assertEqual(progress["state"], "RUNNING")
+
+    def test_records_stage_timings(self, get_current_job):
+        def run_query(runner, query, user):
+            with runner.timed("fetch"):
+                pass
+            return json_dumps({"columns": [], "rows": []}), None
+
+        enqueued_at = datetime.datetime(2020, 1, 1)
+        job = Mock(
+            id="job-id",
+            meta={},
+            origin="queries",
+            enqueued_at=enqueued_at,
+            started_at=enqueued_at + datetime.timedelta(seconds=2),
+        )
+        get_current_job.side_effect = lambda: job
+        with patch.object(PostgreSQL, "run_query", autospec=True) as qr, patch(
+            "redash.tasks.queries.execution.statsd_client"
+        ) as statsd_client:
+            qr.side_effect = run_query
+            result_id = execute_query("SELECT 1, 2", self.factory.data_source.id, {})
+
+        job.save_field.assert_called_once()
+        name, timings = job.save_field.call_args[0]
+        self.assertEqual(name, "timings")
+        self.assertEqual(timings["queue_wait"], 2)
+        for stage in ["load_data_source", "run_query", "fetch", "store_result", "commit"]:
+            self.assertIn(stage, timings)
+        statsd_client.timing.assert_any_call(
+            "query_execution.queue_wait.pg.queries", 2000
+        )
+
+        result = models.QueryResult.query.get(result_id)
+        self.assertIn("run_query", result.timings)
+        self.assertIn("store_result", result.timings)
+        self.assertNotIn("commit", result.timings)
+
+    def test_merges_incremental_results(self, _):
+        query = self.factory.create_query(
+            query_text="SELECT * FROM logs WHERE id > {{ _last_watermark }}",
+            options={"incremental": {"watermark_column": "id"}},
+        )
+        base = self.factory.create_query_result(
+            data=json_dumps({"columns": [{"name": "id"}], "rows": [{"id": 1}]})
+        )
+        with patch.object(PostgreSQL, "run_query") as qr:
+            qr.return_value = (
+                json_dumps({"columns": [{"name": "id"}], "rows": [{"id": 2}]}),
+                None,
+            )
+            result_id = execute_query(
+                "SELECT * FROM logs WHERE id > 1",
+                query.data_source.id,
+                {"query_id": query.id, "incremental_base_id": base.id},
+            )
+
+        result = models.QueryResult.query.get(result_id)
+        self.assertEqual(result.data["rows"], [{"id": 1}, {"id": 2}])
+        self.assertEqual(result.query_hash, query.query_hash)
+        self.assertEqual(result.query_text, query.query_text)
+        self.assertEqual(models.Query.get_by_id(query.id).latest_query_data, result)
+        self.assertIsNotNone(predict_runtime(query.data_source.id, query.query_hash))
+
+    def test_records_runtime(self, _):
+        with patch.object(PostgreSQL, "run_query") as qr:
+            qr.return_value = (json_dumps({"columns": [], "rows": []}), None)
+            execute_query("SELECT 1, 2", self.factory.data_source.id, {})
+
+        self.assertIsNotNone(
+            predict_runtime(self.factory.data_source.id, gen_query_hash("SELECT 1, 2"))
+        )
+
     def test_success_scheduled(self, _):
         """
         Scheduled queries remember their latest results.
@@ -301,3 +503,29 @@ class QueryExecutorTests(BaseTestCase):
             )
             q = models.Query.get_by_id(q.id)
             self.assertEqual(q.schedule_failures, 0)
+
+
+@patch("redash.tasks.queries.execution.publish_job_status")
+class TestProgressReporter(TestCase):
+    def test_throttles_updates(self, publish_job_status):
+        job = Mock(id="job-id", meta={}, started_at=None)
+        reporter = ProgressReporter(job, interval=60)
+
+        reporter({"rows_fetched": 1})
+        reporter({"rows_fetched": 2})
+
+        job.save_field.assert_called_once()
+        name, progress = job.save_field.call_args[0]
+        self.assertEqual((name, progress["rows_fetched"]), ("progress", 1))
+        self.assertEqual(publish_job_status.call_count, 1)
+        self.assertEqual(publish_job_status.call_args[1]["progress"], progress)
+
+    def test_reports_again_after_interval(self, publish_job_status):
+        job = Mock(id="job-id", meta={}, started_at=None)
+        reporter = ProgressReporter(job, interval=0)
+
+        reporter({"rows_fetched": 1})
+        reporter({"rows_fetched": 2})
+
+        self.assertEqual(job.save_field.call_count, 2)
+        self.assertEqual(job.save_field.call_args[0][1]["rows_fetched"], 2)
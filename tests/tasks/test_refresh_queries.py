@@ -1,7 +1,13 @@
+import datetime
+
 from mock import patch, call, ANY
+from sqlalchemy import event
+
 from tests import BaseTestCase
+from redash import models, redis_connection
 from redash.tasks.queries.maintenance import refresh_queries
 from redash.models import Query
+from redash.utils import utcnow
 
 ENQUEUE_QUERY = "redash.tasks.queries.maintenance.enqueue_query"
 
@@ -44,6 +50,96 @@ class TestRefreshQuery(BaseTestCase):
                 any_order=True,
             )
 
+    def test_enqueues_at_most_the_limit_per_data_source(self):
+        query1 = self.factory.create_query()
+        query2 = self.factory.create_query(
+            query_text="select 42;", data_source=query1.data_source
+        )
+        query3 = self.factory.create_query(query_text="select 42;")
+        oq = staticmethod(lambda: [query1, query2, query3])
+        with patch(ENQUEUE_QUERY) as add_job_mock, patch.object(
+            Query, "outdated_queries", oq
+        ), patch(
+            "redash.tasks.queries.maintenance.settings.SCHEDULED_QUERIES_PER_TICK_LIMIT", 1
+        ), patch(
+            "redash.tasks.queries.maintenance.statsd_client"
+        ) as statsd_client:
+            refresh_queries()
+
+        enqueued = [c[1]["scheduled_query"] for c in add_job_mock.call_args_list]
+        self.assertEqual(enqueued, [query1, query3])
+        statsd_client.gauge.assert_any_call("refresh_queries.due_backlog", 1)
+
+    def test_enqueues_incremental_queries_from_their_watermark(self):
+        query = self.factory.create_query(
+            query_text="SELECT * FROM logs WHERE ts > '{{ _last_watermark }}'",
+            options={"incremental": {"watermark_column": "ts"}},
+        )
+        query.latest_query_data = self.factory.create_query_result(
+            data='{"columns": [{"name": "ts"}], "rows": [{"ts": "2020-01-02"}]}'
+        )
+        oq = staticmethod(lambda: [query])
+        with patch(ENQUEUE_QUERY) as add_job_mock, patch.object(
+            Query, "outdated_queries", oq
+        ):
+            refresh_queries()
+
+        add_job_mock.assert_called_once_with(
+            "SELECT * FROM logs WHERE ts > '2020-01-02'",
+            query.data_source,
+            query.user_id,
+            scheduled_query=query,
+            metadata={
+                "query_id": query.id,
+                "Username": "Scheduled",
+                "incremental_base_id": query.latest_query_data.id,
+            },
+        )
+
+    def test_round_trips_dont_depend_on_the_number_of_queries(self):
+        data_sources = [self.factory.create_data_source() for _ in range(3)]
+        for i in range(9):
+            query = self.factory.create_query(
+                query_text="SELECT {}".format(i),
+                data_source=data_sources[i % 3],
+                schedule={
+                    "interval": "60",
+                    "time": None,
+                    "until": None,
+                    "day_of_week": None,
+                },
+            )
+            query.latest_query_data = self.factory.create_query_result(
+                query_text=query.query_text,
+                query_hash=query.query_hash,
+                data_source=query.data_source,
+                retrieved_at=utcnow() - datetime.timedelta(hours=1),
+            )
+        data_sources[0].pause()
+        models.db.session.flush()
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(models.db.engine, "before_cursor_execute", count_statement)
+        try:
+            with patch(ENQUEUE_QUERY) as add_job_mock, patch.object(
+                redis_connection,
+                "execute_command",
+                wraps=redis_connection.execute_command,
+            ) as execute_command:
+                refresh_queries()
+        finally:
+            event.remove(models.db.engine, "before_cursor_execute", count_statement)
+
+        self.assertEqual(add_job_mock.call_count, 6)
+        # Loading the outdated queries with their orgs and data sources
+        self.assertLessEqual(len(statements), 2)
+        # Scheduled executions, pause flags and status
+        self.assertLessEqual(execute_command.call_count, 3)
+
     def test_enqueues_outdated_queries_for_non_sqlquery(self):
         """
         refresh_queries() launches an execution task for each query returned
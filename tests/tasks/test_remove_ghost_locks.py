@@ -0,0 +1,36 @@
+from mock import patch
+from rq_scheduler import Scheduler
+
+from tests import BaseTestCase
+from redash import redis_connection, rq_redis_connection
+from redash.tasks import Queue
+from redash.tasks.queries.maintenance import remove_ghost_locks
+
+
+class TestRemoveGhostLocks(BaseTestCase):
+    def test_removes_locks_of_missing_jobs(self):
+        job = Queue("queries", connection=rq_redis_connection).enqueue(len, [])
+        redis_connection.set("query_hash_job:1:queued", job.id)
+        redis_connection.set("query_hash_job:1:ghost", "missing")
+
+        remove_ghost_locks()
+
+        self.assertTrue(redis_connection.exists("query_hash_job:1:queued"))
+        self.assertFalse(redis_connection.exists("query_hash_job:1:ghost"))
+
+    def test_keeps_locks_of_deferred_jobs(self):
+        redis_connection.zadd(Scheduler.scheduled_jobs_key, {"deferred": 1})
+        redis_connection.set("query_hash_job:1:deferred", "deferred")
+
+        remove_ghost_locks()
+
+        self.assertTrue(redis_connection.exists("query_hash_job:1:deferred"))
+
+    def test_removes_locks_in_batches(self):
+        for i in range(5):
+            redis_connection.set("query_hash_job:{}:ghost".format(i), "missing")
+
+        with patch("redash.tasks.queries.maintenance.GHOST_LOCKS_BATCH_SIZE", 2):
+            remove_ghost_locks()
+
+        self.assertEqual(redis_connection.keys("query_hash_job:*"), [])
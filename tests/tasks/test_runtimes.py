@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from mock import patch
+
+from tests import BaseTestCase
+from redash.tasks.queries.runtimes import (
+    FAST_LANE,
+    SLOW_LANE,
+    choose_lane,
+    ewma,
+    lane_queue_name,
+    percentile,
+    predict_runtime,
+    record_runtime,
+)
+
+
+class TestRuntimeSummaries(TestCase):
+    def test_ewma_weights_recent_samples(self):
+        self.assertEqual(ewma([10.0], 0.5), 10.0)
+        self.assertEqual(ewma([10.0, 20.0], 0.5), 15.0)
+        self.assertEqual(ewma([20.0, 10.0], 0.5), 15.0)
+        self.assertEqual(ewma([10.0, 20.0, 20.0], 0.5), 17.5)
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 0.95), 95)
+        self.assertEqual(percentile([3], 0.95), 3)
+
+    def test_choose_lane(self):
+        with patch("redash.tasks.queries.runtimes.settings.QUERY_RUNTIME_FAST_LANE_MAX", 10):
+            self.assertIsNone(choose_lane(None))
+            self.assertEqual(choose_lane((2, 9)), FAST_LANE)
+            # Usually fast, but too often slow
+            self.assertEqual(choose_lane((2, 60)), SLOW_LANE)
+
+    def test_lane_queue_name(self):
+        self.assertEqual(lane_queue_name("queries", FAST_LANE), "queries_fast")
+        self.assertEqual(lane_queue_name("queries", None), "queries")
+
+
+class TestRuntimeHistory(BaseTestCase):
+    def test_predicts_nothing_without_history(self):
+        self.assertIsNone(predict_runtime(1, "hash"))
+
+    def test_records_runtimes(self):
+        for runtime in (1, 2, 3):
+            record_runtime(1, "hash", runtime)
+
+        ewma_runtime, p95 = predict_runtime(1, "hash")
+        self.assertEqual(p95, 3)
+        self.assertTrue(1 < ewma_runtime < 3)
+        self.assertIsNone(predict_runtime(2, "hash"))
+
+    def test_keeps_latest_runtimes(self):
+        with patch(
+            "redash.tasks.queries.runtimes.settings.QUERY_RUNTIME_HISTORY_SIZE", 2
+        ):
+            for runtime in (100, 1, 2):
+                summary = record_runtime(1, "hash", runtime)
+
+        self.assertEqual(summary["count"], 2)
+        self.assertEqual(predict_runtime(1, "hash")[1], 2)
@@ -1,11 +1,18 @@
+import signal
+
 from mock import patch, call
 from rq import Connection
 from rq.job import JobStatus
-from redash.tasks import Worker
+from rq.registry import FailedJobRegistry
+from rq.utils import utcnow
+from rq_scheduler import Scheduler
+from redash.tasks import Job, Worker
 
 from tests import BaseTestCase
 from redash import rq_redis_connection
-from redash.tasks.worker import Queue
+from redash.tasks.concurrency import Semaphore
+from redash.tasks.schedule import schedule_periodic_jobs
+from redash.tasks.worker import LongLivedHorse, PreforkingWorker, Queue
 from redash.tasks.queries.execution import (
     enqueue_query,
 )
@@ -100,3 +107,192 @@ class TestQueueMetrics(BaseTestCase):
 
         foo.delay()
         incr.assert_called_with("rq.jobs.created.default")
+
+
+@patch("redash.settings.DATA_SOURCE_CONCURRENCY_LIMIT", 1)
+class TestConcurrencyLimits(BaseTestCase):
+    def tearDown(self):
+        rq_redis_connection.delete(Scheduler.scheduled_jobs_key)
+        with Connection(rq_redis_connection):
+            for queue_name in default_queues:
+                Queue(queue_name).empty()
+        super().tearDown()
+
+    def enqueue(self, **kwargs):
+        query = self.factory.create_query(**kwargs)
+
+        with Connection(rq_redis_connection):
+            return enqueue_query(
+                query.query_text,
+                query.data_source,
+                query.user_id,
+                False,
+                None,
+                {"Username": "Patrick", "query_id": query.id},
+            )
+
+    @patch("rq.Worker.execute_job")
+    def test_defers_jobs_of_saturated_data_sources(self, execute_job):
+        job = self.enqueue()
+        semaphore = Semaphore(
+            rq_redis_connection, "ds:{}:running_jobs".format(job.meta["data_source_id"]), 1
+        )
+        semaphore.acquire("another-job", 60)
+
+        with Connection(rq_redis_connection):
+            Worker(["queries"]).work(max_jobs=1)
+
+        execute_job.assert_not_called()
+        self.assertIsNotNone(
+            rq_redis_connection.zscore(Scheduler.scheduled_jobs_key, job.id)
+        )
+        self.assertEqual(job.get_status(), JobStatus.QUEUED)
+
+    @patch("rq.Worker.execute_job")
+    def test_releases_semaphore_after_execution(self, execute_job):
+        job = self.enqueue()
+
+        with Connection(rq_redis_connection):
+            Worker(["queries"]).work(max_jobs=1)
+
+        execute_job.assert_called_once()
+        semaphore = Semaphore(
+            rq_redis_connection, "ds:{}:running_jobs".format(job.meta["data_source_id"]), 1
+        )
+        self.assertEqual(semaphore.count(), 0)
+
+    @patch("rq.Worker.execute_job")
+    def test_keeps_deferred_jobs_when_the_scheduler_restarts(self, execute_job):
+        job = self.enqueue()
+        semaphore = Semaphore(
+            rq_redis_connection, "ds:{}:running_jobs".format(job.meta["data_source_id"]), 1
+        )
+        semaphore.acquire("another-job", 60)
+        with Connection(rq_redis_connection):
+            Worker(["queries"]).work(max_jobs=1)
+
+        schedule_periodic_jobs([])
+
+        self.assertIsNotNone(
+            rq_redis_connection.zscore(Scheduler.scheduled_jobs_key, job.id)
+        )
+        self.assertTrue(Job.exists(job.id, connection=rq_redis_connection))
+
+    @patch("redash.settings.QUERY_FAIR_DEQUEUE_WINDOW", 10)
+    def test_dequeues_jobs_of_less_busy_data_sources_first(self):
+        busy_job = self.enqueue()
+        job = self.enqueue(data_source=self.factory.create_data_source())
+        semaphore = Semaphore(
+            rq_redis_connection,
+            "ds:{}:running_jobs".format(busy_job.meta["data_source_id"]),
+        )
+        semaphore.acquire("another-job", 60)
+
+        with Connection(rq_redis_connection):
+            queue = Queue("queries")
+            dequeued_job, _ = Queue.dequeue_any([queue], None)
+
+            self.assertEqual(dequeued_job.id, job.id)
+            self.assertEqual(queue.job_ids, [busy_job.id])
+
+    def test_dequeues_jobs_in_order_without_fair_dequeue(self):
+        first_job = self.enqueue()
+        self.enqueue(data_source=self.factory.create_data_source())
+        Semaphore(
+            rq_redis_connection,
+            "ds:{}:running_jobs".format(first_job.meta["data_source_id"]),
+        ).acquire("another-job", 60)
+
+        with Connection(rq_redis_connection):
+            dequeued_job, _ = Queue.dequeue_any([Queue("queries")], None)
+
+        self.assertEqual(dequeued_job.id, first_job.id)
+
+    def test_cancelling_removes_deferred_jobs_from_scheduler(self):
+        job = self.enqueue()
+        rq_redis_connection.zadd(Scheduler.scheduled_jobs_key, {job.id: 0})
+
+        job.cancel()
+
+        self.assertIsNone(
+            rq_redis_connection.zscore(Scheduler.scheduled_jobs_key, job.id)
+        )
+
+    def test_saving_fields_keeps_the_job_cancelled(self):
+        job = self.enqueue()
+        # The copy of the job in the work horse
+        horse_job = Job.fetch(job.id, connection=rq_redis_connection)
+
+        job.cancel()
+        horse_job.save_field("progress", {"rows_fetched": 1})
+
+        job = Job.fetch(job.id, connection=rq_redis_connection)
+        self.assertTrue(job.is_cancelled)
+        self.assertEqual(job.get_field("progress"), {"rows_fetched": 1})
+
+
+class TestPreforkingWorker(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.worker = PreforkingWorker(["queries"], connection=rq_redis_connection)
+        self.horse = LongLivedHorse(
+            ["queries"], name="test-horse", connection=rq_redis_connection
+        )
+        self.horse.monitored_job_id = None
+        self.horse.monitor_started = None
+        self.worker._horses[12345] = self.horse
+
+    def tearDown(self):
+        with Connection(rq_redis_connection):
+            for queue_name in default_queues:
+                Queue(queue_name).empty()
+
+    def enqueue_and_start(self):
+        query = self.factory.create_query()
+
+        with Connection(rq_redis_connection):
+            job = enqueue_query(
+                query.query_text,
+                query.data_source,
+                query.user_id,
+                False,
+                None,
+                {"Username": "Patrick", "query_id": query.id},
+            )
+
+        job.set_status(JobStatus.STARTED)
+        self.horse.set_current_job_id(job.id)
+        return job
+
+    @patch("os.kill")
+    @patch.object(PreforkingWorker, "reap_horses")
+    def test_interrupts_horses_executing_cancelled_jobs(self, _, kill):
+        job = self.enqueue_and_start()
+        job.cancel()
+
+        self.worker.monitor_horses()
+
+        kill.assert_called_once_with(12345, signal.SIGINT)
+
+    @patch("os.kill")
+    @patch.object(PreforkingWorker, "reap_horses")
+    def test_kills_horses_exceeding_hard_limit(self, _, kill):
+        self.enqueue_and_start()
+
+        self.worker.monitor_horses()
+        kill.assert_not_called()
+
+        self.horse.monitor_started = utcnow().replace(year=2000)
+        self.worker.monitor_horses()
+        kill.assert_called_once_with(12345, signal.SIGKILL)
+
+    @patch.object(PreforkingWorker, "spawn_horse")
+    def test_replaces_horses_that_died_while_executing_a_job(self, spawn_horse):
+        job = self.enqueue_and_start()
+
+        self.worker.retire_horse(12345, signal.SIGKILL)
+
+        self.assertEqual(job.get_status(), JobStatus.FAILED)
+        self.assertIn(job.id, FailedJobRegistry("queries", connection=rq_redis_connection))
+        spawn_horse.assert_called_once_with("queries")
+        self.assertEqual(self.worker._horses, {})
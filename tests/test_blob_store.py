@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+from redash.blob_store import (
+    FileSystemBlobStore,
+    S3BlobStore,
+    content_key,
+    get_blob_store,
+)
+
+
+class TestFileSystemBlobStore(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = FileSystemBlobStore(self.root)
+        self.data = b'{"rows": [1, 2, 3]}'
+        self.key = content_key(self.data)
+        self.store.put(self.key, self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_get(self):
+        self.assertEqual(self.store.get(self.key), self.data)
+
+    def test_get_range(self):
+        self.assertEqual(self.store.get_range(self.key, 2, 6), b"rows")
+        self.assertEqual(self.store.get_range(self.key, 9), b"[1, 2, 3]}")
+
+    def test_iter_chunks(self):
+        chunks = list(self.store.iter_chunks(self.key, chunk_size=8))
+
+        self.assertEqual(b"".join(chunks), self.data)
+        self.assertEqual(len(chunks), 3)
+
+    def test_empty_blobs(self):
+        key = content_key(b"")
+        self.store.put(key, b"")
+
+        self.assertEqual(self.store.get_range(key, 0), b"")
+        self.assertEqual(list(self.store.iter_chunks(key)), [])
+
+    def test_storing_again_updates_modification_time(self):
+        os.utime(self.store.path(self.key), (0, 0))
+        self.assertEqual(self.store.modified_at(self.key), 0)
+
+        self.store.put(self.key, self.data)
+
+        self.assertGreater(self.store.modified_at(self.key), 0)
+        self.assertEqual(self.store.get(self.key), self.data)
+
+    def test_delete(self):
+        self.store.delete(self.key)
+        self.store.delete(self.key)
+        self.assertIsNone(self.store.modified_at(self.key))
+
+        with self.assertRaises(FileNotFoundError):
+            self.store.get(self.key)
+
+
+class TestGetBlobStore(TestCase):
+    def tearDown(self):
+        get_blob_store.cache_clear()
+
+    def test_returns_none_when_not_configured(self):
+        self.assertIsNone(get_blob_store(""))
+
+    def test_file_system(self):
+        self.assertEqual(get_blob_store("file:///var/results").root, "/var/results")
+        self.assertEqual(get_blob_store("/var/results").root, "/var/results")
+
+    @patch("redash.blob_store.s3_enabled", True)
+    @patch("redash.blob_store.boto3", create=True)
+    @patch("redash.settings.QUERY_RESULTS_BLOB_STORE_S3_ENDPOINT_URL", "http://minio")
+    def test_s3(self, boto3):
+        store = get_blob_store("s3://bucket/results")
+
+        self.assertIsInstance(store, S3BlobStore)
+        self.assertEqual(store.bucket, "bucket")
+        self.assertEqual(store.object_key("abc"), "results/abc")
+        boto3.client.assert_called_once_with("s3", endpoint_url="http://minio")
+
+    def test_rejects_unknown_schemes(self):
+        with self.assertRaises(ValueError):
+            get_blob_store("ftp://host/results")
@@ -4,6 +4,7 @@ from unittest import TestCase
 
 import pytz
 from dateutil.parser import parse as date_parse
+from mock import patch
 
 from tests import BaseTestCase
 
@@ -159,6 +160,50 @@ class ShouldScheduleNextTest(TestCase):
         )
 
 
+    def test_jitter_delays_next_iteration(self):
+        now = utcnow()
+        an_hour_ago = now - datetime.timedelta(hours=1, seconds=30)
+        self.assertTrue(models.should_schedule_next(an_hour_ago, now, "3600"))
+        self.assertFalse(
+            models.should_schedule_next(an_hour_ago, now, "3600", jitter=60)
+        )
+
+
+class ScheduleJitterTest(TestCase):
+    def test_no_jitter_by_default(self):
+        self.assertEqual(models.schedule_jitter(1, "3600"), 0)
+
+    def test_jitter_is_deterministic_and_bounded(self):
+        with patch("redash.models.settings.SCHEDULE_JITTER_MAX", 300):
+            jitters = [models.schedule_jitter(query_id, "3600") for query_id in range(100)]
+            daily_jitters = [
+                models.schedule_jitter(query_id, "86400", "00:00")
+                for query_id in range(100)
+            ]
+
+            self.assertEqual(jitters[1], models.schedule_jitter(1, "3600"))
+
+        # Interval schedules: only earlier, so they're never late
+        self.assertTrue(all(-300 < jitter <= 0 for jitter in jitters))
+        # Time of day schedules: up to the maximum, only later
+        self.assertTrue(all(0 <= jitter < 300 for jitter in daily_jitters))
+        self.assertGreater(len(set(jitters)), 90)
+
+    def test_interval_schedules_stay_within_their_interval(self):
+        retrieved_at = utcnow()
+        with patch("redash.models.settings.SCHEDULE_JITTER_MAX", 300):
+            for query_id in range(20):
+                jitter = models.schedule_jitter(query_id, "3600")
+                previous_iteration = retrieved_at
+                for _ in range(10):
+                    next_iteration = models.next_iteration_at(
+                        previous_iteration, "3600", jitter=jitter
+                    )
+                    staleness = next_iteration - previous_iteration
+                    self.assertLessEqual(staleness, datetime.timedelta(seconds=3600))
+                    previous_iteration = next_iteration
+
+
 class QueryOutdatedQueriesTest(BaseTestCase):
     def schedule(self, **kwargs):
         schedule = {"interval": None, "time": None, "until": None, "day_of_week": None}
@@ -195,6 +240,14 @@ class QueryOutdatedQueriesTest(BaseTestCase):
 
         self.assertIn(query, queries)
 
+    def test_outdated_queries_are_ordered_by_due_time(self):
+        query = self.create_scheduled_query(interval="3600")
+        self.fake_previous_execution(query, hours=2)
+        older_query = self.create_scheduled_query(interval="3600")
+        self.fake_previous_execution(older_query, hours=5)
+
+        self.assertEqual(models.Query.outdated_queries(), [older_query, query])
+
     def test_outdated_queries_works_scheduled_queries_tracker(self):
         query = self.create_scheduled_query(interval="3600")
         self.fake_previous_execution(query, hours=2)
@@ -415,6 +468,16 @@ class TestUnusedQueryResults(BaseTestCase):
         self.assertIn(unused_qr, list(models.QueryResult.unused()))
         self.assertNotIn(new_unused_qr, list(models.QueryResult.unused()))
 
+    def test_doesnt_return_results_holding_the_data_of_others(self):
+        two_weeks_ago = utcnow() - datetime.timedelta(days=14)
+        data_qr = self.factory.create_query_result(retrieved_at=two_weeks_ago)
+        unused_qr = self.factory.create_query_result(retrieved_at=two_weeks_ago)
+        unused_qr.data_result = data_qr
+        db.session.flush()
+
+        self.assertIn(unused_qr, list(models.QueryResult.unused()))
+        self.assertNotIn(data_qr, list(models.QueryResult.unused()))
+
 
 class TestQueryAll(BaseTestCase):
     def test_returns_only_queries_in_given_groups(self):
@@ -553,6 +616,46 @@ class TestQueryResultStoreResult(BaseTestCase):
         self.assertEqual(query_result.query_hash, self.query_hash)
         self.assertEqual(query_result.data_source, self.data_source)
 
+    def store_result(self, data):
+        query_result = models.QueryResult.store_result(
+            self.data_source.org_id,
+            self.data_source,
+            self.query_hash,
+            self.query,
+            data,
+            self.runtime,
+            utcnow(),
+        )
+        db.session.flush()
+        return query_result
+
+    def test_references_the_data_of_the_previous_result_when_same(self):
+        first = self.store_result(self.data)
+        second = self.store_result(self.data)
+        third = self.store_result(self.data)
+
+        self.assertIsNone(first.data_result)
+        self.assertEqual(second.data_result, first)
+        self.assertEqual(third.data_result, first)
+        self.assertEqual(third._data, "")
+        self.assertEqual(third.data, {"a": 1})
+        self.assertEqual(third.raw_data, self.data)
+
+    def test_stores_the_data_when_changed(self):
+        self.store_result(self.data)
+        query_result = self.store_result('{"a": 2}')
+
+        self.assertIsNone(query_result.data_result)
+        self.assertEqual(query_result._data, '{"a": 2}')
+
+    @patch("redash.settings.QUERY_RESULTS_DEDUPLICATION_ENABLED", False)
+    def test_deduplication_can_be_disabled(self):
+        self.store_result(self.data)
+        query_result = self.store_result(self.data)
+
+        self.assertIsNone(query_result.data_result)
+        self.assertEqual(query_result._data, self.data)
+
 
 class TestEvents(BaseTestCase):
     def raw_event(self):
@@ -0,0 +1,71 @@
+from mock import patch
+
+from tests import BaseTestCase
+
+from redash import models, redis_connection
+from redash.monitor import (
+    STATUS_SNAPSHOT_KEY,
+    estimate_count,
+    get_status,
+    rq_status,
+)
+
+
+class TestEstimateCount(BaseTestCase):
+    def test_counts_tables_without_estimates(self):
+        self.factory.create_query()
+        self.factory.create_query()
+        with patch.object(models.db.session, "execute") as execute:
+            execute.return_value.scalar.return_value = 0
+            self.assertEqual(estimate_count(models.Query), 2)
+
+    def test_uses_estimate_of_analyzed_tables(self):
+        self.factory.create_query()
+        with patch.object(models.db.session, "execute") as execute:
+            execute.return_value.scalar.return_value = 1000
+            self.assertEqual(estimate_count(models.Query), 1000)
+
+
+def exact_count(model):
+    return model.query.count()
+
+
+# The estimates depend on when the test database was last analyzed
+@patch("redash.monitor.estimate_count", side_effect=exact_count)
+class TestGetStatus(BaseTestCase):
+    def test_serves_collected_snapshot(self, _):
+        self.factory.create_query()
+        status = get_status()
+        self.assertEqual(status["queries_count"], 1)
+        self.assertIn("snapshot_age", status)
+        self.assertTrue(redis_connection.exists(STATUS_SNAPSHOT_KEY))
+
+        self.factory.create_query()
+        self.assertEqual(get_status()["queries_count"], 1)
+
+    def test_collects_expired_snapshot(self, _):
+        get_status()
+        redis_connection.delete(STATUS_SNAPSHOT_KEY)
+        self.factory.create_query()
+
+        self.assertEqual(get_status()["queries_count"], 1)
+
+    def test_reports_live_queue_sizes(self, _):
+        get_status()
+        with patch(
+            "redash.monitor.get_queues_status", return_value={"queries": {"size": 3}}
+        ):
+            self.assertEqual(get_status()["manager"]["queues"]["queries"]["size"], 3)
+
+
+class TestRQStatus(BaseTestCase):
+    def test_reports_live_queued_counts(self):
+        rq_status()
+        with patch(
+            "redash.monitor.get_queues_status", return_value={"queries": {"size": 3}}
+        ):
+            status = rq_status()
+
+        self.assertEqual(status["queues"]["queries"]["queued"], 3)
+        self.assertEqual(status["queues"]["queries"]["started"], [])
+        self.assertIn("snapshot_age", status)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from redash.utils.column_stats import compute_column_stats
+
+
+class TestComputeColumnStats(TestCase):
+    def compute(self, rows, columns=None):
+        columns = columns or sorted({name for row in rows for name in row})
+        return compute_column_stats(
+            {"columns": [{"name": name} for name in columns], "rows": rows}
+        )
+
+    def test_summarizes_columns(self):
+        rows = [{"n": i % 4, "s": "v{}".format(i % 2)} for i in range(8)]
+        rows.append({"n": None, "s": None})
+
+        stats = self.compute(rows)
+
+        self.assertEqual(stats["row_count"], 9)
+        self.assertEqual(
+            stats["columns"]["n"],
+            {
+                "null_count": 1,
+                "min": 0,
+                "max": 3,
+                "distinct_count": 4,
+                "top_values": [[0, 2], [1, 2], [2, 2], [3, 2]],
+            },
+        )
+        self.assertEqual(stats["columns"]["s"]["min"], "v0")
+        self.assertEqual(stats["columns"]["s"]["max"], "v1")
+
+    def test_missing_values_are_nulls(self):
+        stats = self.compute([{"a": 1}, {}], columns=["a"])
+
+        self.assertEqual(stats["columns"]["a"]["null_count"], 1)
+
+    def test_mixed_columns_report_numbers_range(self):
+        stats = self.compute([{"a": 3}, {"a": "text"}, {"a": 1.5}, {"a": True}])
+
+        self.assertEqual(stats["columns"]["a"]["min"], 1.5)
+        self.assertEqual(stats["columns"]["a"]["max"], 3)
+        self.assertEqual(stats["columns"]["a"]["distinct_count"], 4)
+
+    def test_supports_unhashable_values(self):
+        stats = self.compute([{"a": [1, 2]}, {"a": [1, 2]}, {"a": {"b": 1}}])
+
+        self.assertEqual(stats["columns"]["a"]["distinct_count"], 2)
+        self.assertEqual(stats["columns"]["a"]["top_values"][0], ["[1,2]", 2])
+
+    def test_counts_distinct_values_of_large_columns(self):
+        stats = self.compute([{"a": "value {}".format(i % 20000)} for i in range(50000)])
+
+        self.assertEqual(stats["columns"]["a"]["distinct_count"], 20000)
+        self.assertEqual(len(stats["columns"]["a"]["top_values"]), 10)
+
+    def test_ignores_nan_in_range(self):
+        stats = self.compute([{"a": float("nan")}, {"a": 2}, {"a": 1}])
+
+        self.assertEqual(stats["columns"]["a"]["min"], 1)
+        self.assertEqual(stats["columns"]["a"]["max"], 2)
+
+    def test_empty_result(self):
+        self.assertEqual(compute_column_stats(None), {"row_count": 0, "columns": {}})
@@ -0,0 +1,89 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from redash.utils.columnar import ColumnarResult, get_columnar_result
+
+data = {
+    "columns": [
+        {"name": "id", "friendly_name": "id", "type": "integer"},
+        {"name": "name", "friendly_name": "name", "type": "string"},
+        {"name": "score", "friendly_name": "score", "type": "float"},
+    ],
+    "rows": [
+        {"id": 1, "name": "Banana", "score": 2.5},
+        {"id": 2, "name": "apple", "score": None},
+        {"id": 3, "name": "Cherry", "score": 1.0},
+        {"id": 4, "name": "pineapple", "score": 2.5},
+    ],
+}
+
+
+def ids(rows):
+    return [row["id"] for row in rows]
+
+
+class TestColumnarResult(TestCase):
+    def setUp(self):
+        self.result = ColumnarResult(data)
+
+    def test_pages_rows(self):
+        total, rows = self.result.rows(offset=1, limit=2)
+
+        self.assertEqual(total, 4)
+        self.assertEqual(rows, data["rows"][1:3])
+
+    def test_sorts_with_nulls_last_in_ascending_order(self):
+        _, rows = self.result.rows(sort=[("score", False)])
+        self.assertEqual(ids(rows), [3, 1, 4, 2])
+
+        _, rows = self.result.rows(sort=[("score", True)])
+        self.assertEqual(ids(rows), [2, 1, 4, 3])
+
+    def test_sorts_by_multiple_columns(self):
+        _, rows = self.result.rows(sort=[("score", True), ("id", True)])
+
+        self.assertEqual(ids(rows), [2, 4, 1, 3])
+
+    def test_filters_case_insensitively(self):
+        total, rows = self.result.rows(filters=[("name", "APPLE")], limit=1)
+
+        self.assertEqual(total, 2)
+        self.assertEqual(ids(rows), [2])
+
+    def test_handles_empty_results(self):
+        self.assertEqual(ColumnarResult(None).rows(), (0, []))
+
+    @patch("redash.settings.QUERY_RESULTS_COLUMNAR_CACHE_MAX_ORDERS", 2)
+    def test_caches_last_orderings(self):
+        size = self.result.size
+        first = self.result.order((("id", False),))
+        self.result.order((("name", False),))
+        self.assertIs(self.result.order((("id", False),)), first)
+        self.assertGreater(self.result.size, size)
+
+        self.result.order((("score", False),))
+        self.result.order((("name", True),))
+        self.assertIsNot(self.result.order((("id", False),)), first)
+        self.assertEqual(len(self.result._orders), 2)
+
+
+class TestGetColumnarResult(TestCase):
+    def test_caches_decoded_results(self):
+        first = Mock(id=-1, data=data)
+        second = Mock(id=-2, data=data)
+        size = ColumnarResult(data).size
+
+        with patch("redash.settings.QUERY_RESULTS_COLUMNAR_CACHE_MAX_SIZE", size):
+            result = get_columnar_result(first)
+            self.assertIs(get_columnar_result(first), result)
+
+            get_columnar_result(second)
+            self.assertIsNot(get_columnar_result(first), result)
+
+    @patch("redash.settings.QUERY_RESULTS_COLUMNAR_CACHE_MAX_SIZE", 0)
+    def test_doesnt_cache_results_bigger_than_the_cache(self):
+        query_result = Mock(id=-3, data=data)
+
+        result = get_columnar_result(query_result)
+        self.assertIsNot(get_columnar_result(query_result), result)
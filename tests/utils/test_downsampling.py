@@ -0,0 +1,85 @@
+from unittest import TestCase
+
+import numpy as np
+
+from redash.utils.columnar import ColumnarResult
+from redash.utils.downsampling import downsample, lttb, min_max
+
+
+def make_result(rows):
+    return ColumnarResult(
+        {
+            "columns": [{"name": "time"}, {"name": "value"}, {"name": "kind"}],
+            "rows": rows,
+        }
+    )
+
+
+class TestAlgorithms(TestCase):
+    def setUp(self):
+        self.x = np.arange(10000, dtype=float)
+        self.y = np.sin(self.x / 100)
+        self.y[4321] = 100
+
+    def test_lttb_keeps_threshold_points_including_ends_and_peaks(self):
+        selected = lttb(self.x, self.y, 500)
+
+        self.assertEqual(len(selected), 500)
+        self.assertEqual(selected[0], 0)
+        self.assertEqual(selected[-1], 9999)
+        self.assertIn(4321, selected)
+
+    def test_min_max_keeps_bucket_extremes(self):
+        selected = min_max(self.x, self.y, 500)
+
+        self.assertLessEqual(len(selected), 502)
+        self.assertIn(4321, selected)
+        self.assertIn(int(self.y.argmin()), selected)
+
+    def test_small_series_are_kept_as_is(self):
+        self.assertEqual(list(lttb(self.x[:10], self.y[:10], 50)), list(range(10)))
+
+
+class TestDownsample(TestCase):
+    def setUp(self):
+        self.result = make_result(
+            [
+                {
+                    "time": "2020-01-01T{:02d}:{:02d}:00.000Z".format(i // 60, i % 60),
+                    "value": i % 17,
+                    "kind": "odd" if i % 2 else "even",
+                }
+                for i in range(1000)
+            ]
+        )
+
+    def test_downsamples_each_series(self):
+        options = {
+            "globalSeriesType": "line",
+            "columnMapping": {"time": "x", "value": "y", "kind": "series"},
+        }
+
+        selected = downsample(self.result, options, 50)
+
+        self.assertEqual(len(selected), 100)
+        self.assertEqual(list(selected), sorted(selected))
+
+    def test_uses_series_type_overrides(self):
+        options = {
+            "globalSeriesType": "line",
+            "seriesOptions": {"value": {"type": "area"}},
+            "columnMapping": {"time": "x", "value": "y"},
+        }
+
+        self.assertLessEqual(len(downsample(self.result, options, 50)), 52)
+
+    def test_skips_unsupported_charts(self):
+        options = {"globalSeriesType": "pie", "columnMapping": {"time": "x", "value": "y"}}
+        self.assertIsNone(downsample(self.result, options, 50))
+
+        options = {"globalSeriesType": "line", "columnMapping": {"value": "y"}}
+        self.assertIsNone(downsample(self.result, options, 50))
+
+    def test_skips_results_smaller_than_width(self):
+        options = {"globalSeriesType": "line", "columnMapping": {"time": "x", "value": "y"}}
+        self.assertIsNone(downsample(self.result, options, 1000))
@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from redash.utils.incremental import apply_watermark, merge_results, watermark
+
+PREVIOUS = {
+    "columns": [{"name": "id"}, {"name": "ts"}],
+    "rows": [
+        {"id": 1, "ts": "2020-01-01T00:00:00"},
+        {"id": 2, "ts": "2020-01-02T00:00:00"},
+    ],
+}
+NEW = {
+    "columns": [{"name": "id"}, {"name": "ts"}],
+    "rows": [
+        {"id": 2, "ts": "2020-01-03T00:00:00"},
+        {"id": 3, "ts": "2020-01-03T00:00:00"},
+    ],
+}
+
+
+class TestApplyWatermark(TestCase):
+    def test_replaces_only_the_watermark(self):
+        self.assertEqual(
+            apply_watermark("SELECT * WHERE ts > '{{ _last_watermark }}' AND {{x}}", 5),
+            "SELECT * WHERE ts > '5' AND {{x}}",
+        )
+
+    def test_escapes_quotes_of_text_watermarks(self):
+        self.assertEqual(
+            apply_watermark("SELECT * WHERE name > '{{ _last_watermark }}'", "O'Hara"),
+            "SELECT * WHERE name > 'O''Hara'",
+        )
+
+
+class TestWatermark(TestCase):
+    def test_initial_watermark_without_result(self):
+        self.assertEqual(watermark({"watermark_column": "ts"}), "1970-01-01")
+        self.assertEqual(
+            watermark({"watermark_column": "ts", "initial_watermark": 0}), 0
+        )
+
+    def result(self, **kwargs):
+        result = Mock(**kwargs)
+        result.payload = result
+        return result
+
+    def test_greatest_value_of_result(self):
+        result = self.result(column_stats=None, data=PREVIOUS)
+        self.assertEqual(
+            watermark({"watermark_column": "ts"}, result), "2020-01-02T00:00:00"
+        )
+
+    def test_uses_column_stats(self):
+        result = self.result(column_stats={"columns": {"ts": {"max": "2021-01-01"}}})
+        self.assertEqual(watermark({"watermark_column": "ts"}, result), "2021-01-01")
+
+    def test_uses_column_stats_of_the_result_holding_the_data(self):
+        result = Mock(column_stats=None, data=None)
+        result.payload = self.result(
+            column_stats={"columns": {"ts": {"max": "2021-01-01"}}}
+        )
+        self.assertEqual(watermark({"watermark_column": "ts"}, result), "2021-01-01")
+
+
+class TestMergeResults(TestCase):
+    def test_appends_rows(self):
+        merged = merge_results(PREVIOUS, NEW, {})
+        self.assertEqual([row["id"] for row in merged["rows"]], [1, 2, 2, 3])
+
+    def test_upserts_rows_by_key(self):
+        merged = merge_results(PREVIOUS, NEW, {"key_columns": ["id"]})
+        self.assertEqual(merged["rows"], [PREVIOUS["rows"][0]] + NEW["rows"])
+
+    def test_keeps_latest_rows(self):
+        merged = merge_results(PREVIOUS, NEW, {"max_rows": 3})
+        self.assertEqual([row["id"] for row in merged["rows"]], [2, 2, 3])
+
+    def test_adds_new_columns(self):
+        new = {"columns": [{"name": "id"}, {"name": "extra"}], "rows": []}
+        merged = merge_results(PREVIOUS, new, {})
+        self.assertEqual(
+            [column["name"] for column in merged["columns"]], ["id", "ts", "extra"]
+        )
+
+    def test_returns_new_without_previous(self):
+        self.assertEqual(merge_results(None, NEW, {}), NEW)
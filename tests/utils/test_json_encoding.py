@@ -0,0 +1,103 @@
+import datetime
+import decimal
+import uuid
+from collections import namedtuple
+from unittest import TestCase, skipIf
+
+import pytz
+import simplejson
+from mock import patch
+from psycopg2.extras import NumericRange
+
+from redash.query_runner.pg import PostgreSQLJSONEncoder
+from redash.utils import JSONEncoder, json_dumps, json_loads, orjson_enabled
+
+Point = namedtuple("Point", ["x", "y"])
+
+VALUES = [
+    datetime.datetime(2020, 1, 2, 3, 4, 5, 678901, tzinfo=pytz.utc),
+    datetime.datetime(2020, 1, 2, 3, 4, 5, 678901),
+    datetime.datetime(2020, 1, 2, 3, 4, 5),
+    datetime.date(2020, 1, 2),
+    datetime.time(1, 2, 3, 456789),
+    datetime.timedelta(days=1, seconds=5),
+    decimal.Decimal("1.10"),
+    uuid.UUID(int=5),
+    float("nan"),
+    float("inf"),
+    b"\x00\xff",
+    memoryview(b"test"),
+    "unicode: é中",
+    {1: "integer key", None: "null key", True: "boolean key"},
+    [1, 2.5, None, True, "string"],
+    2 ** 70,
+    Point(1, 2),
+]
+
+
+def simplejson_dumps(data, **kwargs):
+    return simplejson.dumps(data, encoding=None, ignore_nan=True, **kwargs)
+
+
+@skipIf(not orjson_enabled, "orjson isn't installed")
+class TestFastJsonEncoderCompatibility(TestCase):
+    def assertCompatible(self, data, **kwargs):
+        expected = simplejson_dumps(data, **dict({"cls": JSONEncoder}, **kwargs))
+        self.assertEqual(json_loads(json_dumps(data, **kwargs)), json_loads(expected))
+
+    def test_encodes_values_like_simplejson(self):
+        for value in VALUES:
+            with self.subTest(value=value):
+                self.assertCompatible({"value": value})
+
+    def test_keeps_datetime_formatting(self):
+        self.assertEqual(
+            json_dumps(
+                [
+                    datetime.datetime(2020, 1, 2, 3, 4, 5, 678901, tzinfo=pytz.utc),
+                    datetime.time(1, 2, 3, 456789),
+                ]
+            ),
+            '["2020-01-02T03:04:05.678Z","01:02:03.456"]',
+        )
+
+    def test_encodes_nan_as_null(self):
+        self.assertEqual(json_dumps([float("nan"), float("-inf")]), "[null,null]")
+
+    def test_keeps_decimals_precision(self):
+        self.assertEqual(
+            json_dumps(decimal.Decimal("12345678901234567890.123")),
+            "12345678901234567890.123",
+        )
+
+    def test_rejects_timezone_aware_times(self):
+        with self.assertRaises(ValueError):
+            json_dumps(datetime.time(1, tzinfo=pytz.utc))
+
+    def test_supports_runner_encoders(self):
+        self.assertCompatible(
+            {"range": NumericRange(1, 5), "when": datetime.date(2020, 1, 2)},
+            cls=PostgreSQLJSONEncoder,
+        )
+
+    def test_supports_sort_keys_and_indent(self):
+        data = {"b": 1, "a": {"d": 2, "c": 3}}
+
+        self.assertEqual(
+            json_dumps(data, sort_keys=True),
+            simplejson_dumps(data, sort_keys=True, separators=(",", ":")),
+        )
+        self.assertCompatible(data, indent=2)
+
+    def test_falls_back_to_simplejson_for_unsupported_options(self):
+        data = {"a": [1, 2]}
+
+        self.assertEqual(
+            json_dumps(data, separators=(",", ":")),
+            simplejson_dumps(data, cls=JSONEncoder, separators=(",", ":")),
+        )
+        self.assertEqual(json_dumps(data, indent=4), simplejson_dumps(data, indent=4))
+
+    @patch("redash.settings.JSON_FAST_ENCODER_ENABLED", False)
+    def test_can_be_disabled(self):
+        self.assertEqual(json_dumps({"a": 1}), '{"a": 1}')
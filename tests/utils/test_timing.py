@@ -0,0 +1,26 @@
+from unittest import TestCase
+
+from mock import patch
+
+from redash.utils.timing import StageTimer
+
+
+class TestStageTimer(TestCase):
+    def test_adds_up_the_time_of_each_stage(self):
+        timer = StageTimer()
+        with patch("redash.utils.timing.time.time", side_effect=[0, 1, 1, 3, 5, 6]):
+            with timer.stage("execute"):
+                with timer.stage("fetch"):
+                    pass
+            with timer.stage("fetch"):
+                pass
+
+        self.assertEqual(timer.durations, {"fetch": 1, "execute": 3})
+
+    def test_times_failed_stages(self):
+        timer = StageTimer()
+        with self.assertRaises(ValueError):
+            with timer.stage("execute"):
+                raise ValueError()
+
+        self.assertIn("execute", timer.durations)